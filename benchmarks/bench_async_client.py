@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark the asyncio pipelined client against the synchronous downloader
+Both run against a local fake_dtn_server.py instance with injected per-request latency
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dtn_symbol_downloader import DTNCorrectAPIDownloader
+from dtn_async_downloader import AsyncDTNDownloader
+from fake_dtn_server import start_server
+
+
+def run_sync(base_url, output_dir, workers):
+    downloader = DTNCorrectAPIDownloader(output_dir=output_dir, base_url=base_url)
+    if workers > 1:
+        return downloader.download_all_symbols_parallel(workers=workers, partition_by='both')
+    return downloader.download_all_symbols(delay=0)
+
+
+def run_async(base_url, output_dir, connections, partition_by):
+    downloader = AsyncDTNDownloader(output_dir=output_dir, base_url=base_url, max_connections=connections)
+    return asyncio.run(downloader.download_all_symbols(partition_by=partition_by))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sync vs async downloader benchmark')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=200000)
+    parser.add_argument('--latency', type=float, help='Added server latency per request in seconds', default=0.2)
+    parser.add_argument('--workers', type=int, help='Workers / pooled connections for the parallel runs', default=8)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server = start_server(size=args.symbols, latency=args.latency)
+
+    runs = [
+        ("sync, single cursor", lambda out: run_sync(server.base_url, out, 1)),
+        ("async, single cursor", lambda out: run_async(server.base_url, out, args.workers, None)),
+        (f"sync, {args.workers} workers", lambda out: run_sync(server.base_url, out, args.workers)),
+        (f"async, {args.workers} connections", lambda out: run_async(server.base_url, out, args.workers, 'both')),
+    ]
+
+    print(f"{args.symbols:,} symbols, {args.latency * 1000:.0f} ms server latency")
+    print(f"{'Mode':<28} {'Seconds':>8} {'Requests':>9} {'Symbols':>9}")
+    print("-" * 57)
+    for name, run in runs:
+        with tempfile.TemporaryDirectory() as output_dir:
+            requests_before = server.request_count
+            start = time.perf_counter()
+            df = run(output_dir)
+            elapsed = time.perf_counter() - start
+            count = len(df) if df is not None else 0
+            print(f"{name:<28} {elapsed:>8.2f} {server.request_count - requests_before:>9} {count:>9,}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
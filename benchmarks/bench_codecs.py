@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Compression throughput and ratio of the split file codecs and by_exchange.zip methods
+Writes a synthetic universe from fake_dtn_server.py as CSV and times compressing and
+decompressing it with every codec in file_codecs at a few levels. Throughput is in MB of
+uncompressed CSV per second, so rows are comparable across codecs.
+"""
+
+import io
+import os
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import file_codecs
+from fake_dtn_server import generate_universe
+
+FILE_CODECS = ['none', 'gzip:1', 'gzip:6', 'gzip:9', 'zstd:1', 'zstd:3', 'zstd:9', 'zstd:19']
+ARCHIVE_CODECS = ['stored', 'deflate:1', 'deflate:6', 'deflate:9', 'bzip2:9', 'lzma']
+
+
+def best_of(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_file_codec(spec, data, repeat):
+    compress_s, compressed = best_of(lambda: file_codecs.compress(data, spec), repeat)
+    name = file_codecs.parse_codec(spec)[0]
+    decompress_s, restored = best_of(lambda: file_codecs.open_reader(io.BytesIO(compressed), name).read(), repeat)
+    assert restored == data, spec
+    return compress_s, decompress_s, len(compressed)
+
+
+def bench_archive_codec(spec, data, repeat):
+    compression, compresslevel = file_codecs.parse_archive_codec(spec)
+
+    def write():
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression=compression, compresslevel=compresslevel) as archive:
+            archive.writestr("all_symbols.csv", data)
+        return buffer.getvalue()
+
+    def read():
+        with zipfile.ZipFile(io.BytesIO(archived)) as archive:
+            return archive.read("all_symbols.csv")
+
+    compress_s, archived = best_of(write, repeat)
+    decompress_s, restored = best_of(read, repeat)
+    assert restored == data, spec
+    return compress_s, decompress_s, len(archived)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Split file codec and zip method benchmark')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=500000)
+    parser.add_argument('--repeat', type=int, help='Runs per measurement, the best is reported', default=3)
+    args = parser.parse_args()
+
+    data = pd.DataFrame(generate_universe(args.symbols)).to_csv(index=False).encode('utf-8')
+    megabytes = len(data) / 2**20
+
+    rows = []
+    for spec in FILE_CODECS:
+        if spec.startswith('zstd') and file_codecs.zstandard is None:
+            print(f"Skipping {spec}: zstandard is not installed")
+            continue
+        rows.append(('file', spec, *bench_file_codec(spec, data, args.repeat)))
+    for spec in ARCHIVE_CODECS:
+        rows.append(('zip', spec, *bench_archive_codec(spec, data, args.repeat)))
+
+    print(f"{args.symbols:,} synthetic symbols, {megabytes:.1f} MB of CSV")
+    print(f"{'Output':<6} {'Codec':<10} {'Write MB/s':>11} {'Read MB/s':>10} {'Size MB':>8} {'Ratio':>6}")
+    print("-" * 56)
+    for kind, spec, compress_s, decompress_s, size in rows:
+        # 'none' returns the bytes as they are, its throughput is meaningless
+        write = f"{megabytes / compress_s:.1f}" if spec != 'none' else '-'
+        read = f"{megabytes / decompress_s:.1f}" if spec != 'none' else '-'
+        print(f"{kind:<6} {spec:<10} {write:>11} {read:>10} {size / 2**20:>8.2f} {len(data) / size:>6.1f}")
+    print(f"\nDefaults: --codec {file_codecs.DEFAULT_CODEC}, --archive-codec {file_codecs.DEFAULT_ARCHIVE_CODEC}")
+
+
+if __name__ == "__main__":
+    main()
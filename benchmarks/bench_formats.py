@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Load time and file size of all_symbols_latest.csv vs the partitioned Parquet dataset
+Uses a synthetic universe from fake_dtn_server.py written with both writers
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from fake_dtn_server import generate_universe
+from symbol_io import CSV_FILE, PARQUET_DIR, load_symbols, write_parquet_dataset
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='CSV vs Parquet load benchmark')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        df = pd.DataFrame(generate_universe(args.symbols))
+        csv_path = os.path.join(output_dir, CSV_FILE)
+
+        csv_write, _ = timed(lambda: df.to_csv(csv_path, index=False), repeat=1)
+        parquet_write, _ = timed(lambda: write_parquet_dataset(df, output_dir), repeat=1)
+        del df
+
+        queries = [
+            ("full table", {}),
+            ("exchange+securityType only", {"columns": ["exchange", "securityType"]}),
+            ("CME/NYSE symbols", {"columns": ["symbol"], "exchanges": ["CME", "NYSE"]}),
+            ("CME futures", {"exchanges": ["CME"], "security_types": ["FUTURE"]}),
+        ]
+
+        print(f"{args.symbols:,} synthetic symbols")
+        print(f"{'':<36} {'CSV':>10} {'Parquet':>10}")
+        print("-" * 58)
+        print(f"{'Size (MB)':<36} {os.path.getsize(csv_path) / 2**20:>10.1f} "
+              f"{dir_size(os.path.join(output_dir, PARQUET_DIR)) / 2**20:>10.1f}")
+        print(f"{'Write (s)':<36} {csv_write:>10.3f} {parquet_write:>10.3f}")
+        for name, kwargs in queries:
+            csv_time, csv_df = timed(lambda: load_symbols(output_dir, prefer_parquet=False, **kwargs))
+            parquet_time, parquet_df = timed(lambda: load_symbols(output_dir, **kwargs))
+            assert len(csv_df) == len(parquet_df)
+            print(f"{'Load ' + name + ' (s)':<36} {csv_time:>10.3f} {parquet_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
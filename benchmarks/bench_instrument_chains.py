@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Futures curve and option chain lookups: per-row regex scans vs instrument_chains
+Times parse_instruments() and InstrumentChains over a synthetic universe from fake_dtn_server.py,
+then answers "all futures of a root" and "options of a root for one contract month" with a
+str.match scan of the symbol column and with the chain indexes.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import symbol_schema
+from fake_dtn_server import generate_universe
+from instrument_chains import MONTH_CODES, InstrumentChains, parse_instruments
+
+
+def best_of(func, repeat=5):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Instrument chain lookup benchmark')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=1000000)
+    args = parser.parse_args()
+
+    df = symbol_schema.apply_schema(pd.DataFrame(generate_universe(args.symbols)))
+    parse_seconds, instruments = best_of(lambda: parse_instruments(df), repeat=1)
+    build_seconds, chains = best_of(lambda: InstrumentChains.from_dataframe(df, instruments), repeat=1)
+
+    root = chains.roots("future_option")[len(chains.roots("future_option")) // 2]
+    expiry = chains.expiries(root)[0]
+    month = f"{MONTH_CODES[expiry.month - 1]}{expiry.year % 100:02d}"
+    symbols = df['symbol']
+    lookups = [
+        ("futures curve", lambda: symbols[symbols.str.match(rf"^@{root}(?:[{MONTH_CODES}]\d{{2}}|#C?)$")],
+         lambda: chains.futures(root)),
+        ("option chain, one month", lambda: symbols[symbols.str.match(rf"^@{root}{month}[CP]\d")],
+         lambda: chains.options(root, expiry=expiry)),
+    ]
+
+    print(f"{args.symbols:,} synthetic symbols, root {root}")
+    print(f"parse_instruments: {parse_seconds:.2f} s, chain tables: {build_seconds:.2f} s")
+    print(f"{'Lookup':<26} {'Rows':>6} {'Regex scan ms':>14} {'Chains ms':>10}")
+    print("-" * 60)
+    for label, scan, indexed in lookups:
+        scan_seconds, scanned = best_of(scan)
+        indexed_seconds, found = best_of(indexed)
+        assert sorted(scanned) == sorted(found['symbol']), label
+        print(f"{label:<26} {len(found):>6} {scan_seconds * 1000:>14.2f} {indexed_seconds * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Per-page decode + persist micro-benchmark
+Compares the DataFrame-per-page path (response.json(), pd.DataFrame, to_csv) with the page_codec
+path (orjson or json, row tuples, page journal / csv.writer) on one full API page.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import page_codec
+from dtn_symbol_downloader import StreamingSymbolWriter, SymbolHashSet
+from fake_dtn_server import generate_universe
+from page_journal import PageJournal
+
+
+def per_page_ms(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def dataframe_write_page(file, seen, symbols):
+    """StreamingSymbolWriter.write_page as it was, one DataFrame per page"""
+    df = pd.DataFrame(symbols)
+    df = df[seen.add_new(df['symbol'].to_numpy())]
+    df.reindex(columns=list(df.columns)).to_csv(file, index=False, header=False)
+    file.flush()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Per-page decode + persist benchmark')
+    parser.add_argument('--page-size', type=int, help='Symbols per page', default=4998)
+    parser.add_argument('--repeat', type=int, help='Pages per measurement', default=50)
+    args = parser.parse_args()
+
+    # Distinct pages, so the streaming writer's dedup keeps every row as in a real download
+    universe = generate_universe(args.page_size * (args.repeat + 1))
+    raw_pages = [json.dumps({'data': {'symbolList': universe[i:i + args.page_size], 'totalFound': len(universe),
+                                      'hasMore': True, 'nextKey': str(i + args.page_size)}}).encode('utf-8')
+                 for i in range(0, len(universe), args.page_size)]
+    raw = raw_pages[0]
+    orjson_module = page_codec.orjson
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        batch_file = os.path.join(tmp_dir, "batch_1.csv")
+
+        def dataframe_path():
+            page = json.loads(raw)['data']['symbolList']
+            pd.DataFrame(page).to_csv(batch_file, index=False)
+
+        def journal_path():
+            page = page_codec.loads(raw)['data']['symbolList']
+            journal.append(page, batch=2, next_key=None, total_symbols=0, total_reported=0, done=False)
+
+        def streaming_path():
+            page = page_codec.loads(next(pages))['data']['symbolList']
+            writer.write_page(page)
+
+        journal = PageJournal(os.path.join(tmp_dir, "journal.dat"))
+        journal.open(resume=False)
+
+        results = [("json + DataFrame + to_csv batch file", per_page_ms(dataframe_path, args.repeat))]
+        with open(os.path.join(tmp_dir, "dataframe.csv"), 'w', newline='', encoding='utf-8') as f:
+            seen = SymbolHashSet()
+            pages = iter(raw_pages)
+            results.append(("json + DataFrame streaming write_page", per_page_ms(
+                lambda: dataframe_write_page(f, seen, json.loads(next(pages))['data']['symbolList']), args.repeat)))
+        for label, module in (("json", None), ("orjson", orjson_module)):
+            if label == "orjson" and module is None:
+                continue
+            page_codec.orjson = module
+            results.append((f"{label} + rows + journal append", per_page_ms(journal_path, args.repeat)))
+            writer = StreamingSymbolWriter(os.path.join(tmp_dir, f"{label}.csv")).open()
+            pages = iter(raw_pages)
+            results.append((f"{label} + rows + streaming write_page", per_page_ms(streaming_path, args.repeat)))
+            writer.close(complete=False)
+        page_codec.orjson = orjson_module
+        journal.close()
+
+        records = list(PageJournal(journal.path).records())
+        combine_old = per_page_ms(lambda: pd.read_csv(batch_file), args.repeat)
+        state, columns, rows = records[0]
+        combine_new = per_page_ms(lambda: page_codec.rows_frame(columns, rows), args.repeat)
+        journal_bytes = os.path.getsize(journal.path) / len(records)
+        csv_bytes = os.path.getsize(batch_file)
+
+    print(f"{args.page_size:,} symbols per page, orjson {'installed' if orjson_module else 'not installed'}")
+    print(f"{'Decode + persist one page':<40} {'ms/page':>8}")
+    print("-" * 49)
+    for label, ms in results:
+        print(f"{label:<40} {ms:>8.2f}")
+    print(f"\n{'Page back into a DataFrame for combine':<40} {'ms/page':>8}")
+    print("-" * 49)
+    print(f"{'pd.read_csv(batch file)':<40} {combine_old:>8.2f}")
+    print(f"{'journal rows -> DataFrame':<40} {combine_new:>8.2f}")
+    print(f"\nBytes per page: batch CSV {csv_bytes:,}, journal record {journal_bytes:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+process_symbols.py load throughput with 1..N parse/serialise worker processes
+Splits a synthetic universe from fake_dtn_server.py into by_exchange/ files and loads every
+exchange with LOAD_WORKERS = 1 (the single-process loader) and with more worker processes.
+"prepare" only parses and serialises; "load" also writes to Redis over the single connection,
+on a local redis-server when --host is given and fakeredis otherwise (which is slow enough
+to hide most of the parse speedup, so prefer a real server).
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import process_symbols
+from dtn_symbol_downloader import DTNCorrectAPIDownloader
+from fake_dtn_server import generate_universe
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Parallel process_symbols loader benchmark')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=1000000)
+    parser.add_argument('--workers', help='Comma-separated worker counts', default=f"1,2,{os.cpu_count() or 1}")
+    parser.add_argument('--layout', choices=['blob', 'hash', 'both'], default='blob')
+    parser.add_argument('--host', help='Benchmark a real redis-server on this host instead of fakeredis', default=None)
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--db', type=int, help='Redis database to use (it is flushed!)', default=15)
+    args = parser.parse_args()
+
+    if args.host:
+        import redis
+        client = redis.Redis(host=args.host, port=args.port, db=args.db, decode_responses=True)
+        target = f"redis://{args.host}:{args.port}/{args.db}"
+    else:
+        import fakeredis
+        client = fakeredis.FakeRedis(decode_responses=True)
+        target = "fakeredis"
+
+    worker_counts = sorted({int(count) for count in args.workers.split(',')})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        df = pd.DataFrame(generate_universe(args.symbols))
+        exchanges = sorted(df['exchange'].unique())
+        downloader = DTNCorrectAPIDownloader(output_dir=os.path.join(tmp_dir, "dtn_symbols"))
+        downloader.split_symbols_by_exchange_and_type(df)
+        del df
+
+        def prepare(workers):
+            if workers == 1:
+                groups = process_symbols.iter_symbol_groups(tmp_dir, exchanges)
+                return sum(process_symbols.serialize_group(group_df, args.layout)[2] for _, group_df in groups)
+            tasks = process_symbols.split_file_tasks(exchanges, extracted_dir=tmp_dir, layout=args.layout)
+            return sum(payload[2] for _, payload in process_symbols.iter_serialized_groups(tasks, workers))
+
+        def load(workers):
+            client.flushdb()
+            return process_symbols.process_and_store_symbols(tmp_dir, client, exchanges, layout=args.layout, workers=workers)
+
+        results = []
+        for workers in worker_counts:
+            for label, run in (("prepare", prepare), ("load", load)):
+                start = time.perf_counter()
+                count = run(workers)
+                results.append((label, workers, time.perf_counter() - start, count))
+        client.flushdb()
+
+    print(f"\n{args.symbols:,} synthetic symbols, {len(exchanges)} exchanges, layout {args.layout}, "
+          f"{target}, {os.cpu_count()} CPUs")
+    print(f"{'Run':<8} {'Workers':>7} {'Seconds':>8} {'Symbols/s':>12} {'Speedup':>8}")
+    print("-" * 48)
+    baseline = {label: seconds for label, workers, seconds, _ in results if workers == worker_counts[0]}
+    for label, workers, seconds, count in results:
+        print(f"{label:<8} {workers:>7} {seconds:>8.2f} {count / seconds:>12,.0f} {baseline[label] / seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Redis loader benchmark: one blocking SET per group vs pipelined/atomic loads
+Runs against a local redis-server when --host is given, otherwise against fakeredis
+(which has no network round trips, so it understates the gain of pipelining)
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from fake_dtn_server import generate_universe
+from process_symbols import store_symbol_groups
+
+
+def legacy_store(redis_client, groups):
+    """The original loader: one blocking SET per exchange/secType group"""
+    count = 0
+    for (exchange_name, sec_type), group_df in groups:
+        redis_client.set(f"symbols:{exchange_name}:{sec_type}", group_df.to_json(orient='records'))
+        count += len(group_df)
+    return count
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Redis loader benchmark')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=200000)
+    parser.add_argument('--host', help='Benchmark a real redis-server on this host instead of fakeredis', default=None)
+    parser.add_argument('--port', type=int, default=6379)
+    parser.add_argument('--db', type=int, help='Redis database to use (it is flushed!)', default=15)
+    args = parser.parse_args()
+
+    if args.host:
+        import redis
+        client = redis.Redis(host=args.host, port=args.port, db=args.db, decode_responses=True)
+        target = f"redis://{args.host}:{args.port}/{args.db}"
+    else:
+        import fakeredis
+        client = fakeredis.FakeRedis(decode_responses=True)
+        target = "fakeredis"
+
+    df = pd.DataFrame(generate_universe(args.symbols))
+    groups = list(df.groupby(['exchange', 'securityType']))
+
+    runs = [("legacy SET per group", lambda: legacy_store(client, groups))]
+    for chunk_size in (100, 1000, 5000):
+        runs.append((f"blob, pipeline {chunk_size}", lambda c=chunk_size: store_symbol_groups(client, groups, layout="blob", chunk_size=c)))
+    for chunk_size in (100, 1000, 5000):
+        runs.append((f"hash, pipeline {chunk_size}", lambda c=chunk_size: store_symbol_groups(client, groups, layout="hash", chunk_size=c)))
+
+    print(f"{args.symbols:,} synthetic symbols in {len(groups)} groups, {target}")
+    print(f"{'Loader':<26} {'Seconds':>8} {'Symbols/s':>12}")
+    print("-" * 48)
+    for name, run in runs:
+        client.flushdb()
+        start = time.perf_counter()
+        count = run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<26} {elapsed:>8.2f} {count / elapsed:>12,.0f}")
+    client.flushdb()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Memory footprint and load time of all_symbols_latest.csv with inferred vs declared dtypes
+Loads a synthetic universe from fake_dtn_server.py with plain pd.read_csv, with pd.read_csv on
+object columns (pandas < 3 inference) and with symbol_schema.read_csv. Exits with status 1 when
+the schema load takes more than --max-ratio of the object-column footprint.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import symbol_schema
+from fake_dtn_server import generate_universe
+
+
+def timed_load(func, repeat=3):
+    best, df = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, df
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Inferred vs declared dtypes benchmark')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=1000000)
+    parser.add_argument('--max-ratio', type=float, help='Largest allowed schema/object memory ratio', default=0.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "all_symbols_latest.csv")
+        pd.DataFrame(generate_universe(args.symbols)).to_csv(csv_path, index=False)
+
+        loads = [
+            ("pd.read_csv, object columns", lambda: pd.read_csv(csv_path, keep_default_na=False, dtype=object)),
+            ("pd.read_csv, inferred", lambda: pd.read_csv(csv_path, keep_default_na=False)),
+            ("symbol_schema.read_csv", lambda: symbol_schema.read_csv(csv_path)),
+        ]
+        results = []
+        for label, load in loads:
+            seconds, df = timed_load(load)
+            results.append((label, seconds, symbol_schema.memory_bytes(df), df.dtypes))
+            del df
+
+    print(f"{args.symbols:,} synthetic symbols, pandas {pd.__version__}")
+    print(f"{'Load':<32} {'Seconds':>8} {'Memory MB':>10}")
+    print("-" * 52)
+    for label, seconds, memory, _ in results:
+        print(f"{label:<32} {seconds:>8.2f} {memory / 2**20:>10.1f}")
+    print("\nDeclared dtypes:")
+    for column, dtype in results[-1][3].items():
+        print(f"  {column:<16} {dtype}")
+
+    ratio = results[-1][2] / results[0][2]
+    print(f"\nSchema footprint: {ratio:.2f} of object columns (limit {args.max_ratio:.2f})")
+    if ratio > args.max_ratio:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
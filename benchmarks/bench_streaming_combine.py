@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Peak RSS of the in-memory combine vs the streaming writer
+Each mode runs in a fresh subprocess against a local fake_dtn_server.py instance and reports
+its own high-water mark (VmHWM on Linux; ru_maxrss elsewhere, which on Linux would carry over
+the parent's peak across exec), so the numbers are not polluted by the parent or earlier runs
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from fake_dtn_server import start_server
+
+CHILD = """
+import json, logging, os, resource, sys, time
+sys.path.insert(0, {repo!r})
+logging.disable(logging.CRITICAL)
+from dtn_symbol_downloader import DTNCorrectAPIDownloader
+
+def peak_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+baseline = peak_kb()
+downloader = DTNCorrectAPIDownloader(output_dir={output_dir!r}, base_url={base_url!r})
+start = time.perf_counter()
+downloader.download_all_symbols(delay=0, streaming={streaming!r})
+elapsed = time.perf_counter() - start
+peak = peak_kb()
+size = os.path.getsize(os.path.join({output_dir!r}, "all_symbols_latest.csv"))
+print(json.dumps({{"baseline_kb": baseline, "peak_kb": peak, "seconds": elapsed, "output_bytes": size}}))
+"""
+
+
+def run_mode(base_url, streaming):
+    with tempfile.TemporaryDirectory() as output_dir:
+        code = CHILD.format(repo=REPO_DIR, output_dir=output_dir, base_url=base_url, streaming=streaming)
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Peak memory of in-memory vs streaming combine')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=500000)
+    args = parser.parse_args()
+
+    server = start_server(size=args.symbols)
+    print(f"{args.symbols:,} synthetic symbols")
+    print(f"{'Mode':<12} {'Output MB':>10} {'Peak RSS MB':>12} {'Above import MB':>16} {'Seconds':>8}")
+    print("-" * 62)
+    for name, streaming in (("in-memory", False), ("streaming", True)):
+        result = run_mode(server.base_url, streaming)
+        peak_mb = result["peak_kb"] / 1024
+        above_mb = (result["peak_kb"] - result["baseline_kb"]) / 1024
+        print(f"{name:<12} {result['output_bytes'] / 2**20:>10.1f} {peak_mb:>12.1f} {above_mb:>16.1f} {result['seconds']:>8.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+SQLite store vs CSV: write time, and ad-hoc queries against each
+Writes a synthetic universe from fake_dtn_server.py as all_symbols_latest.csv and loads it into
+symbol_db, then answers the same questions with read_csv plus a pandas filter (what a one-off
+script does today) and with SymbolDB queries on an already built database.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import symbol_db
+import symbol_schema
+from fake_dtn_server import generate_universe
+
+
+def best_of(func, repeat=5):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='SQLite symbol store benchmark')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=1000000)
+    args = parser.parse_args()
+
+    df = symbol_schema.apply_schema(pd.DataFrame(generate_universe(args.symbols)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "all_symbols_latest.csv")
+        db_path = os.path.join(tmp_dir, symbol_db.DB_FILE)
+        csv_seconds, _ = best_of(lambda: df.to_csv(csv_path, index=False), repeat=1)
+        db_seconds, _ = best_of(lambda: symbol_db.build(df, db_path), repeat=1)
+
+        symbol = df['symbol'].iloc[len(df) // 2]
+        word = df['description'].iloc[len(df) // 3].split()[0]
+        # The last query stops at 20 matches, which need not be the same 20 in both
+        lookups = [
+            (f"symbol {symbol}", lambda d: d[d['symbol'] == symbol],
+             lambda db: db.sql("SELECT * FROM symbols WHERE symbol = ?", [symbol])),
+            ("CME futures", lambda d: d[(d['exchange'] == "CME") & (d['securityType'] == "FUTURE")],
+             lambda db: db.select(exchange="CME", security_type="FUTURE")),
+            (f"description has '{word}'", lambda d: d[d['description'].str.contains(rf"\b{word}\b", case=False)],
+             lambda db: db.search(word, limit=None)),
+            ("description has 'holdings', 20", lambda d: d[d['description'].str.contains(r"\bholdings\b",
+                                                                                          case=False)].head(20),
+             lambda db: db.search("holdings", limit=20)),
+        ]
+
+        print(f"{args.symbols:,} synthetic symbols")
+        print(f"write: to_csv {csv_seconds:.2f} s, symbol_db.build {db_seconds:.2f} s "
+              f"({os.path.getsize(csv_path) / (1024 * 1024):.0f} MB CSV, "
+              f"{os.path.getsize(db_path) / (1024 * 1024):.0f} MB database)")
+        print(f"{'Query':<36} {'Rows':>7} {'read_csv + filter ms':>21} {'SymbolDB ms':>12}")
+        print("-" * 80)
+        with symbol_db.SymbolDB(db_path) as db:
+            for label, scan, query in lookups:
+                scan_seconds, scanned = best_of(lambda: scan(symbol_schema.read_csv(csv_path)), repeat=1)
+                query_seconds, found = best_of(lambda: query(db))
+                if label != lookups[-1][0]:
+                    assert sorted(scanned['symbol']) == sorted(found['symbol']), label
+                print(f"{label:<36} {len(found):>7} {scan_seconds * 1000:>21.0f} {query_seconds * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Symbol index benchmark: startup cost (mmap load vs CSV parse) and per-lookup latency
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from fake_dtn_server import generate_universe
+from symbol_index import SymbolIndex
+
+
+def per_call_us(func, queries):
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Symbol index benchmark')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=1000000)
+    parser.add_argument('--queries', type=int, help='Lookups per measurement', default=20000)
+    args = parser.parse_args()
+
+    df = pd.DataFrame(generate_universe(args.symbols))
+    rng = random.Random(1)
+    symbols = rng.sample(df['symbol'].tolist(), min(args.queries, len(df)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "all_symbols_latest.csv")
+        df.to_csv(csv_path, index=False)
+        index_dir = os.path.join(tmp_dir, "symbol_index")
+
+        start = time.perf_counter()
+        SymbolIndex.from_dataframe(pd.read_csv(csv_path, keep_default_na=False)).save(index_dir)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pd.read_csv(csv_path, keep_default_na=False)
+        csv_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = SymbolIndex.load(index_dir)
+        mmap_load = time.perf_counter() - start
+
+        print(f"{len(index):,} symbols")
+        print(f"{'Build from CSV + save':<36} {build * 1e3:>10.1f} ms")
+        print(f"{'Startup: pd.read_csv':<36} {csv_load * 1e3:>10.1f} ms")
+        print(f"{'Startup: SymbolIndex.load (mmap)':<36} {mmap_load * 1e3:>10.1f} ms")
+        print(f"{'get() hit':<36} {per_call_us(index.get, symbols):>10.1f} µs")
+        print(f"{'get() miss':<36} {per_call_us(index.get, [s + 'X' for s in symbols]):>10.1f} µs")
+        print(f"{'prefix(3 chars, limit 10)':<36} {per_call_us(lambda s: index.prefix(s[:3], 10), symbols):>10.1f} µs")
+        print(f"{'prefix(@, CME FUTURE, limit 10)':<36} "
+              f"{per_call_us(lambda s: index.prefix('@', 10, 'CME', 'FUTURE'), symbols[:2000]):>10.1f} µs")
+        print(f"{'fuzzy(limit 5)':<36} {per_call_us(lambda s: index.fuzzy(s[:-1], 5), symbols[:500]):>10.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Load test of symbol_reader.SymbolReader against fakeredis
+Loads a synthetic universe from fake_dtn_server.py with process_symbols.store_symbol_groups(),
+then runs --threads reader threads doing random group reads for --seconds while a writer
+thread reloads the universe every --reload-every seconds. Each reload tags the descriptions
+with its number, so every read can be checked against the reloads that had committed before
+it started. The same load runs with plain GET + JSON parse per read, and with the cached reader
+in records and columns form, using pub/sub invalidation or version polling. Exits non-zero
+when a read returns a snapshot older than --grace seconds after a newer one committed.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeredis
+import numpy as np
+import pandas as pd
+
+import process_symbols
+import symbol_reader
+from fake_dtn_server import generate_universe
+from page_codec import loads
+
+
+def tagged_groups(df, reload_number):
+    tagged = df.assign(description=df['description'] + f" r{reload_number}")
+    return list(tagged.groupby(['exchange', 'securityType'], observed=True))
+
+
+def tag_of(value, form):
+    """Reload number a decoded group was written by"""
+    if form == "columns":
+        description = str(value['description'][0])
+    else:
+        description = value[0]['description']
+    return int(description.rsplit(" r", 1)[1])
+
+
+def run(server, df, pairs, mode, args):
+    writer = fakeredis.FakeRedis(server=server, decode_responses=True)
+    process_symbols.store_symbol_groups(writer, tagged_groups(df, 0))
+    committed = [(0.0, 0)]  # (monotonic time the reload committed, reload number)
+    stop = threading.Event()
+
+    def reload_loop():
+        number = 0
+        while not stop.wait(args.reload_every):
+            number += 1
+            process_symbols.store_symbol_groups(writer, tagged_groups(df, number))
+            committed.append((time.monotonic(), number))
+
+    reader = None
+    if mode != "uncached":
+        form, invalidation = mode.split("/")
+        reader = symbol_reader.SymbolReader(fakeredis.FakeRedis(server=server), subscribe=invalidation == "pubsub",
+                                            max_staleness=args.grace / 2)
+    latencies, stale = [], []
+    lock = threading.Lock()
+
+    def read_loop(seed):
+        rng = random.Random(seed)
+        client = fakeredis.FakeRedis(server=server)
+        local = []
+        while not stop.is_set():
+            exchange, sec_type = rng.choice(pairs)
+            started = time.monotonic()
+            if reader is None:
+                value, form_read = loads(client.get(f"symbols:{exchange}:{sec_type}")), "records"
+            else:
+                value, form_read = reader.get(exchange, sec_type, form), form
+            elapsed = time.monotonic() - started
+            local.append(elapsed)
+            # Newest reload that had committed --grace seconds before this read started
+            expected = max(number for at, number in list(committed) if at <= started - args.grace)
+            seen = tag_of(value, form_read)
+            if seen < expected:
+                with lock:
+                    stale.append((exchange, sec_type, seen, expected))
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=read_loop, args=(i,)) for i in range(args.threads)]
+    reloader = threading.Thread(target=reload_loop)
+    start = time.perf_counter()
+    for thread in threads + [reloader]:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads + [reloader]:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = reader.stats if reader is not None else {}
+    if reader is not None:
+        reader.close()
+    latencies = np.array(latencies)
+    return {
+        "mode": mode, "reads": len(latencies), "per_second": len(latencies) / elapsed,
+        "p50": np.percentile(latencies, 50) * 1000, "p99": np.percentile(latencies, 99) * 1000,
+        "hit_ratio": stats["hits"] / max(1, stats["hits"] + stats["misses"]) if stats else 0.0,
+        "reloads": len(committed) - 1, "stale": stale,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='SymbolReader load test on fakeredis')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=100000)
+    parser.add_argument('--threads', type=int, help='Reader threads', default=4)
+    parser.add_argument('--seconds', type=float, help='Duration of each run', default=5.0)
+    parser.add_argument('--reload-every', type=float, help='Seconds between reloads', default=1.5)
+    parser.add_argument('--grace', type=float, help='Allowed seconds between a reload committing and readers seeing it',
+                        default=0.2)
+    args = parser.parse_args()
+
+    df = pd.DataFrame(generate_universe(args.symbols))
+    pairs = sorted(df.groupby(['exchange', 'securityType']).groups)
+    modes = ["uncached", "records/pubsub", "columns/pubsub", "records/poll"]
+    results = [run(fakeredis.FakeServer(), df, pairs, mode, args) for mode in modes]
+
+    print(f"\n{args.symbols:,} synthetic symbols in {len(pairs)} groups, {args.threads} reader threads, "
+          f"reload every {args.reload_every:.1f} s, fakeredis")
+    print(f"{'Mode':<16} {'Reads':>8} {'Reads/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'Hit ratio':>10} {'Reloads':>8} {'Stale':>6}")
+    print("-" * 82)
+    for result in results:
+        print(f"{result['mode']:<16} {result['reads']:>8,} {result['per_second']:>10,.0f} {result['p50']:>8.3f} "
+              f"{result['p99']:>8.2f} {result['hit_ratio']:>10.1%} {result['reloads']:>8} {len(result['stale']):>6}")
+    stale = [(result['mode'], read) for result in results for read in result['stale']]
+    if stale:
+        for mode, (exchange, sec_type, seen, expected) in stale[:10]:
+            print(f"{mode}: {exchange}/{sec_type} served reload {seen} after reload {expected} committed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Simulate fixed vs adaptive request pacing against a fake DTN server with injected faults
+The server accepts a limited number of searches per second, answers the rest with the backend
+database error, adds latency under concurrency and fails a share of requests at random. Exits
+non-zero if the adaptive run does not download the complete universe.
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dtn_symbol_downloader import DTNCorrectAPIDownloader
+from fake_dtn_server import start_server
+from rate_control import AdaptiveRateController
+
+
+def run(args, output_dir, rate=None, adaptive=False):
+    server = start_server(size=args.symbols, latency=args.latency, capacity=args.capacity,
+                          error_rate=args.error_rate, backend_error_rate=args.backend_error_rate,
+                          queue_latency=args.queue_latency)
+    downloader = DTNCorrectAPIDownloader(output_dir=output_dir, base_url=server.base_url)
+    # Smaller pages and shorter waits keep the simulation quick while leaving many requests
+    downloader.default_limit = args.page_size
+    downloader.retry_delay = 0.5
+    downloader.error_backoff = 2
+    if adaptive:
+        downloader.rate_controller = AdaptiveRateController(initial_rate=2.0, max_concurrency=args.workers,
+                                                            backend_pause=1.0, max_pause=10.0)
+
+    start = time.perf_counter()
+    df = downloader.download_all_symbols_parallel(workers=args.workers, rate=rate)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    return elapsed, server, df, downloader.rate_controller
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fixed vs adaptive rate simulation')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=200000)
+    parser.add_argument('--page-size', type=int, help='Symbols per page', default=500)
+    parser.add_argument('--workers', type=int, help='Download workers', default=8)
+    parser.add_argument('--capacity', type=float, help='Searches/second the fake server tolerates', default=20.0)
+    parser.add_argument('--latency', type=float, help='Base server latency in seconds', default=0.05)
+    parser.add_argument('--queue-latency', type=float, help='Extra latency per concurrent request', default=0.02)
+    parser.add_argument('--error-rate', type=float, help='Share of random 503s', default=0.01)
+    parser.add_argument('--backend-error-rate', type=float, help='Share of random backend errors', default=0.005)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    runs = [
+        (f"fixed {args.capacity / 2:g}/s", dict(rate=args.capacity / 2)),
+        (f"fixed {args.capacity * 3:g}/s", dict(rate=args.capacity * 3)),
+        ("adaptive", dict(adaptive=True)),
+    ]
+
+    print(f"{args.symbols:,} symbols, {args.page_size} per page, {args.workers} workers, "
+          f"server capacity {args.capacity:g} searches/second")
+    print(f"{'Pacing':<16} {'Seconds':>8} {'Requests':>9} {'Faults':>7} {'Symbols':>9} {'Rate end/peak':>14}")
+    print("-" * 68)
+    adaptive_complete = False
+    for name, options in runs:
+        with tempfile.TemporaryDirectory() as output_dir:
+            elapsed, server, df, controller = run(args, output_dir, **options)
+        count = len(df) if df is not None else 0
+        faults = sum(server.fault_counts.values())
+        rates = f"{controller.rate:.1f}/{controller.stats['peak_rate']:.1f}" if controller else ""
+        print(f"{name:<16} {elapsed:>8.2f} {server.request_count:>9} {faults:>7} {count:>9,} {rates:>14}")
+        if controller:
+            adaptive_complete = count == args.symbols
+
+    if not adaptive_complete:
+        print("Adaptive run did not download the complete universe")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Simulate a cooperative download by several worker processes sharing one partition queue
+Starts a fake DTN server and --processes downloader processes with --queue, each in its own
+output directory, and kills one of them with SIGKILL while it holds leases. Its partitions must
+be handed to the survivors once the leases expire, and the merged universe must contain every
+symbol of the server exactly once. Exits non-zero otherwise.
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import symbol_schema
+from fake_dtn_server import start_server
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Cooperative download simulation')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=50000)
+    parser.add_argument('--processes', type=int, help='Worker processes', default=3)
+    parser.add_argument('--threads', type=int, help='Partition threads per worker', default=2)
+    parser.add_argument('--latency', type=float, help='Server latency per request in seconds', default=0.2)
+    parser.add_argument('--lease-seconds', type=float, default=3.0)
+    parser.add_argument('--kill-after', type=float, help='Seconds before the first worker is killed (after startup, while it holds leases)', default=4.0)
+    parser.add_argument('--queue', help='Queue to share (default: a temporary directory); e.g. redis://localhost:6379/15', default=None)
+    args = parser.parse_args()
+
+    server = start_server(size=args.symbols, latency=args.latency)
+    expected = {record['symbol'] for record in server.universe}
+    run_id = f"sim-{int(time.time())}"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = args.queue or os.path.join(tmp_dir, "queue")
+        workers = []
+        for i in range(args.processes):
+            work_dir = os.path.join(tmp_dir, f"worker{i}")
+            os.makedirs(work_dir)
+            command = [sys.executable, os.path.join(ROOT, "dtn_symbol_downloader.py"), "--base-url", server.base_url,
+                       "--queue", queue, "--run-id", run_id, "--worker-id", f"w{i}", "--workers", str(args.threads),
+                       "--lease-seconds", str(args.lease_seconds), "--delay", "0"]
+            log = open(os.path.join(work_dir, "worker.log"), 'w')
+            workers.append((work_dir, log, subprocess.Popen(command, cwd=work_dir, stdout=log, stderr=subprocess.STDOUT)))
+
+        start = time.perf_counter()
+        time.sleep(args.kill_after)
+        workers[0][2].send_signal(signal.SIGKILL)
+        print(f"Killed w0 after {args.kill_after:.1f} s")
+        for _, log, process in workers:
+            process.wait()
+            log.close()
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+
+        requeued = 0
+        for work_dir, _, _ in workers[1:]:
+            with open(os.path.join(work_dir, "worker.log"), 'r') as f:
+                requeued += sum('expired, requeueing' in line for line in f)
+        print(f"Leases of dead workers requeued: {requeued}")
+
+        outputs = [(i, os.path.join(work_dir, "dtn_symbols", "all_symbols_latest.csv"))
+                   for i, (work_dir, _, _) in enumerate(workers)]
+        merged = [(i, path) for i, path in outputs if os.path.exists(path)]
+        print(f"{args.processes} workers, {args.symbols:,} symbols, {elapsed:.1f} s, "
+              f"exit codes {[process.returncode for _, _, process in workers]}")
+        if len(merged) != 1:
+            print(f"Expected exactly one merged universe, found {len(merged)}")
+            sys.exit(1)
+
+        worker, path = merged[0]
+        df = symbol_schema.read_csv(path)
+        symbols = set(df['symbol'])
+        print(f"w{worker} merged {len(df):,} rows, {len(symbols):,} unique, "
+              f"{len(expected - symbols):,} missing, {len(symbols - expected):,} unexpected")
+        if len(df) != len(symbols) or symbols != expected:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
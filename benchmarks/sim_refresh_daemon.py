@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Refresh daemon vs cold downloader runs against a fake DTN server
+Times two cold `dtn_symbol_downloader.py --delta --index` processes (the first downloads
+everything, the second is a delta against it), then starts refresh_daemon.py and times its
+first snapshot, an unchanged refresh and a refresh after a symbol was added on the server. The
+added symbol has to be served by the daemon's /symbols endpoint after that refresh; exits
+non-zero otherwise.
+
+The universe gets one record without a listedMarket in the partition that changes, so the cold
+runs hash it into a snapshot and the daemon diffs it from its schema-typed (categorical) universe;
+the simulation also fails if the cold runs stored no snapshot.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_dtn_server import start_server
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def call(url, method="GET"):
+    request = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+    except urllib.error.URLError:
+        return None, None
+
+
+def wait_for(base, condition, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        _, status = call(f"{base}/status")
+        if status and condition(status):
+            return status
+        time.sleep(0.05)
+    raise TimeoutError("daemon did not reach the expected state")
+
+
+def add_symbol(server, record):
+    """Add a record to the fake server's universe (and its partition/query caches)"""
+    server.universe.append(record)
+    server._partitions.setdefault((record["exchange"], record["securityType"]), []).append(record)
+    server._query_cache.clear()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Refresh daemon simulation')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe (multi-page partitions from about 500k)', default=1000000)
+    parser.add_argument('--latency', type=float, help='Server latency per request in seconds', default=0.05)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--timeout', type=float, help='Seconds to wait for each daemon refresh', default=600)
+    args = parser.parse_args()
+
+    server = start_server(size=args.symbols, latency=args.latency)
+    add_symbol(server, {"symbol": "@ZZZNULL25", "description": "SIMULATED LISTING WITHOUT MARKET", "exchange": "CME",
+                        "listedMarket": None, "securityType": "FUTURE"})
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cold_dir = os.path.join(tmp_dir, "cold")
+        os.makedirs(cold_dir)
+        for label in ("cold run, full download", "cold run, delta"):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(ROOT, "dtn_symbol_downloader.py"), "--base-url", server.base_url,
+                            "--delta", "--index", "--snapshot", "--workers", str(args.workers), "--delay", "0"],
+                           cwd=cold_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            rows.append((label, time.perf_counter() - start, None))
+        snapshots = os.path.join(cold_dir, "dtn_symbols", "snapshots", "manifests")
+        snapshot_count = len(os.listdir(snapshots)) if os.path.isdir(snapshots) else 0
+
+        port = free_port()
+        base = f"http://127.0.0.1:{port}"
+        start = time.perf_counter()
+        daemon = subprocess.Popen([sys.executable, os.path.join(ROOT, "refresh_daemon.py"), "--base-url", server.base_url,
+                                   "--output-dir", os.path.join(tmp_dir, "daemon"), "--port", str(port),
+                                   "--workers", str(args.workers), "--interval", "3600"],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            status = wait_for(base, lambda s: s['version'] >= 1, args.timeout)
+            rows.append(("daemon start to first snapshot", time.perf_counter() - start, status['last_refresh']['seconds']))
+
+            start = time.perf_counter()
+            call(f"{base}/refresh", "POST")
+            status = wait_for(base, lambda s: s['refreshes'] >= 2 and s['state'] == 'idle', args.timeout)
+            rows.append(("daemon refresh, unchanged", time.perf_counter() - start, status['last_refresh']['seconds']))
+
+            record = {"symbol": "@ZZZSIM25", "description": "SIMULATED LISTING", "exchange": "CME",
+                      "listedMarket": "CME", "securityType": "FUTURE"}
+            add_symbol(server, record)
+            start = time.perf_counter()
+            call(f"{base}/refresh", "POST")
+            status = wait_for(base, lambda s: s['refreshes'] >= 3 and s['state'] == 'idle', args.timeout)
+            rows.append(("daemon refresh, one new symbol", time.perf_counter() - start, status['last_refresh']['seconds']))
+            code, found = call(f"{base}/symbols/{record['symbol']}")
+        finally:
+            daemon.terminate()
+            daemon.wait(timeout=30)
+    server.shutdown()
+
+    print(f"\n{args.symbols:,} synthetic symbols, {args.latency * 1000:.0f} ms latency, {args.workers} workers")
+    print(f"{'Run':<34} {'Wall s':>8} {'Refresh s':>10}")
+    print("-" * 54)
+    for label, wall, refresh in rows:
+        print(f"{label:<34} {wall:>8.2f} {'' if refresh is None else f'{refresh:.2f}':>10}")
+    print(f"Snapshot version {status['version']}, {status['last_refresh']['changed_partitions']} changed partition(s); "
+          f"/symbols/{record['symbol']} -> {code}; {snapshot_count} cold run snapshot(s)")
+    if code != 200 or found.get('symbol') != record['symbol'] or status['version'] != 2 or snapshot_count != 2:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite tracked across commits
+Runs each benchmark in a fresh subprocess against a local fake_dtn_server.py instance (download
+throughput, per-page latency, combine and split time, peak RSS) and appends the results, tagged
+with the current git commit, to benchmarks/results/history.jsonl. --compare prints the recorded
+history of this machine as one row per commit.
+
+    python benchmarks/suite.py                      # run everything and record it
+    python benchmarks/suite.py --only split,combine --no-record
+    python benchmarks/suite.py --compare
+"""
+
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+HISTORY_FILE = os.path.join(REPO_DIR, "benchmarks", "results", "history.jsonl")
+
+# name -> (needs the fake server, metrics shown by --compare)
+BENCHMARKS = {
+    'download_serial': (True, ['symbols_per_second', 'page_p50_ms', 'page_p95_ms', 'peak_rss_mb']),
+    'download_streaming': (True, ['symbols_per_second', 'peak_rss_mb']),
+    'download_parallel': (True, ['symbols_per_second', 'peak_rss_mb']),
+    'download_async': (True, ['symbols_per_second', 'peak_rss_mb']),
+    'combine': (False, ['seconds', 'peak_rss_mb']),
+    'split': (False, ['seconds', 'peak_rss_mb']),
+}
+
+
+def peak_rss_kb():
+    """High-water RSS of this process (VmHWM, which unlike ru_maxrss is not inherited across exec)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def _downloader(output_dir, base_url, page_times=None):
+    from dtn_symbol_downloader import DTNCorrectAPIDownloader
+
+    downloader = DTNCorrectAPIDownloader(output_dir=output_dir, base_url=base_url)
+    if page_times is not None:
+        search_symbols = downloader.search_symbols
+
+        def timed_search(*args, **kwargs):
+            start = time.perf_counter()
+            result = search_symbols(*args, **kwargs)
+            page_times.append(time.perf_counter() - start)
+            return result
+        downloader.search_symbols = timed_search
+    return downloader
+
+
+def _result_count(result):
+    if result is None:
+        raise RuntimeError("download failed")
+    if isinstance(result, str):
+        with open(result, 'rb') as f:
+            return sum(1 for _ in f) - 1
+    return len(result)
+
+
+def _universe_pages(symbols, page_size=4998):
+    import pandas as pd
+    from fake_dtn_server import generate_universe
+
+    universe = generate_universe(symbols)
+    return [pd.DataFrame(universe[i:i + page_size]) for i in range(0, len(universe), page_size)]
+
+
+def run_benchmark(name, options, output_dir):
+    """Run one benchmark in this process and return its metrics"""
+    logging.disable(logging.CRITICAL)
+    metrics = {}
+    page_times = []
+    start = time.perf_counter()
+
+    if name == 'download_serial':
+        count = _result_count(_downloader(output_dir, options['base_url'], page_times).download_all_symbols(delay=0))
+    elif name == 'download_streaming':
+        count = _result_count(_downloader(output_dir, options['base_url']).download_all_symbols(delay=0, streaming=True))
+    elif name == 'download_parallel':
+        downloader = _downloader(output_dir, options['base_url'])
+        count = _result_count(downloader.download_all_symbols_parallel(workers=options['workers']))
+    elif name == 'download_async':
+        import asyncio
+        from dtn_async_downloader import AsyncDTNDownloader
+        downloader = AsyncDTNDownloader(output_dir=output_dir, base_url=options['base_url'],
+                                        max_connections=options['workers'])
+        count = _result_count(asyncio.run(downloader.download_all_symbols(partition_by='both')))
+    elif name == 'combine':
+        pages = _universe_pages(options['symbols'])
+        start = time.perf_counter()
+        count = _result_count(_downloader(output_dir, "http://127.0.0.1:9").combine_and_save(pages))
+    elif name == 'split':
+        import pandas as pd
+        df = pd.concat(_universe_pages(options['symbols']), ignore_index=True)
+        start = time.perf_counter()
+        _downloader(output_dir, "http://127.0.0.1:9").split_symbols_by_exchange_and_type(df)
+        count = len(df)
+    else:
+        raise ValueError(f"Unknown benchmark {name}")
+
+    metrics['seconds'] = time.perf_counter() - start
+    metrics['symbols'] = count
+    metrics['symbols_per_second'] = count / metrics['seconds'] if metrics['seconds'] else 0.0
+    if page_times:
+        metrics['pages'] = len(page_times)
+        metrics['page_p50_ms'] = _percentile(page_times, 0.5) * 1e3
+        metrics['page_p95_ms'] = _percentile(page_times, 0.95) * 1e3
+    metrics['peak_rss_mb'] = peak_rss_kb() / 1024
+    return metrics
+
+
+def run_in_subprocess(name, options):
+    with tempfile.TemporaryDirectory() as output_dir:
+        command = [sys.executable, os.path.abspath(__file__), '--child', name,
+                   '--options', json.dumps(options), '--output-dir', output_dir]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    commit = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    if git('status', '--porcelain', '--untracked-files=no'):
+        commit += '+dirty'
+    return commit, git('log', '-1', '--format=%s')
+
+
+def compare(history_file):
+    """Print recorded results for this machine, one row per commit and benchmark"""
+    if not os.path.exists(history_file):
+        print(f"No results recorded yet in {history_file}")
+        return
+    with open(history_file, 'r') as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    runs = [run for run in runs if run.get('machine') == platform.node()]
+
+    for name, (_, shown) in BENCHMARKS.items():
+        rows = [(run, run['results'][name]) for run in runs if name in run.get('results', {})]
+        if not rows:
+            continue
+        print(f"\n{name}")
+        print(f"{'commit':<16} {'date':<17}" + ''.join(f" {metric:>18}" for metric in shown))
+        for run, result in rows:
+            values = ''.join(f" {result[metric]:>18.2f}" if metric in result else f" {result.get('error', '-'):>18.18}"
+                             for metric in shown)
+            print(f"{run['commit']:<16} {run['date']:<17}{values}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Downloader benchmark suite')
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=300000)
+    parser.add_argument('--latency', type=float, help='Fake server latency per request in seconds', default=0.0)
+    parser.add_argument('--workers', type=int, help='Workers / connections for the parallel and async runs', default=8)
+    parser.add_argument('--only', help='Comma-separated benchmarks to run', default=None)
+    parser.add_argument('--no-record', action='store_true', help='Do not append the results to the history')
+    parser.add_argument('--history', help='History file', default=HISTORY_FILE)
+    parser.add_argument('--compare', action='store_true', help='Show the recorded history instead of running')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--options', help=argparse.SUPPRESS)
+    parser.add_argument('--output-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_benchmark(args.child, json.loads(args.options), args.output_dir)))
+        return
+    if args.compare:
+        compare(args.history)
+        return
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    from fake_dtn_server import start_server
+    server = start_server(size=args.symbols, latency=args.latency)
+    options = {'symbols': args.symbols, 'workers': args.workers, 'base_url': server.base_url}
+
+    commit, subject = git_revision()
+    print(f"{commit} {subject}")
+    print(f"{args.symbols:,} symbols, {args.latency * 1000:.0f} ms server latency, {args.workers} workers")
+    print(f"{'Benchmark':<20} {'Seconds':>8} {'Symbols/s':>11} {'Peak RSS MB':>12} {'Page p50/p95 ms':>16}")
+    print("-" * 71)
+    results = {}
+    for name in names:
+        server.reset_stats()
+        result = run_in_subprocess(name, options)
+        results[name] = result
+        if 'error' in result:
+            print(f"{name:<20} failed: {result['error']}")
+            continue
+        pages = f"{result['page_p50_ms']:.1f}/{result['page_p95_ms']:.1f}" if 'page_p50_ms' in result else ''
+        print(f"{name:<20} {result['seconds']:>8.2f} {result['symbols_per_second']:>11,.0f} "
+              f"{result['peak_rss_mb']:>12.1f} {pages:>16}")
+    server.shutdown()
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        record = {'commit': commit, 'subject': subject, 'date': datetime.now().strftime("%Y-%m-%d %H:%M"),
+                  'machine': platform.node(), 'python': platform.python_version(),
+                  'params': {'symbols': args.symbols, 'latency': args.latency, 'workers': args.workers},
+                  'results': results}
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        print(f"\nRecorded in {args.history}")
+
+
+if __name__ == "__main__":
+    main()
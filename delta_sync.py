@@ -0,0 +1,281 @@
+"""
+Incremental delta sync against the previous all_symbols_latest.csv snapshot
+Each exchange/secType partition is fingerprinted with an order-independent content hash. On the
+next run a partition whose first page still matches is reused from the previous snapshot instead
+of being paged through again, only changed partitions are diffed row by row, and the result is
+written as a compact changelog that loaders can apply with apply_changelog().
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import symbol_schema
+from dtn_symbol_downloader import RateLimiter
+from symbol_stats import SymbolStats
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "partition_manifest.json"
+CHANGELOG_DIR = "changes"
+VERIFY_MAX_AGE = 7 * 24 * 3600  # Seconds before a partition reused on its first page is paged through again
+
+
+def _normalize(df):
+    """Cast to strings with '' for missing values, so API pages and CSV reloads hash the same"""
+    # Through object first: fillna('') on a symbol_schema categorical column raises, '' not being a category
+    return df.astype(object).where(df.notna(), '').astype(str)
+
+
+def content_hash(df):
+    """Order-independent hash of a set of symbol rows"""
+    if df.empty:
+        return hashlib.sha1(b'').hexdigest()
+    columns = sorted(df.columns)
+    row_hashes = np.sort(pd.util.hash_pandas_object(_normalize(df[columns]), index=False).to_numpy())
+    digest = hashlib.sha1(','.join(columns).encode('utf-8'))
+    digest.update(row_hashes.tobytes())
+    return digest.hexdigest()
+
+
+def partition_key(exchange, sec_type):
+    return f"{exchange}|{sec_type}"
+
+
+def verify_due(key, verified, now, max_age=VERIFY_MAX_AGE):
+    """Whether a partition last paged through at verified (epoch seconds) must be paged through again
+
+    Each partition's limit lies between half and all of max_age, fixed by its key, so the
+    partitions verified together by a first full run come due over several later runs rather
+    than all in one.
+    """
+    if max_age is None:
+        return False
+    if verified is None:
+        return True
+    spread = int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:8], 16) / 0x100000000
+    return now - verified >= max_age * (0.5 + 0.5 * spread)
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'partitions': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def compute_delta(previous_df, current_df, changed_partitions=None):
+    """Return (added, removed, changed) rows between two snapshots
+
+    When changed_partitions is given, only rows in those exchange/securityType partitions are
+    compared; a symbol that moved between partitions changes both, so it is still caught.
+    """
+    if changed_partitions is not None:
+        def in_changed(df):
+            if not changed_partitions:
+                return df.iloc[0:0]
+            keys = df['exchange'].astype(str) + '|' + df['securityType'].astype(str)
+            return df[keys.isin(changed_partitions)]
+        previous_df = in_changed(previous_df)
+        current_df = in_changed(current_df)
+
+    previous_df = _normalize(previous_df).drop_duplicates(subset=['symbol'])
+    current_df = _normalize(current_df).drop_duplicates(subset=['symbol'])
+
+    added = current_df[~current_df['symbol'].isin(previous_df['symbol'])]
+    removed = previous_df[~previous_df['symbol'].isin(current_df['symbol'])]
+
+    columns = [c for c in current_df.columns if c != 'symbol' and c in previous_df.columns]
+    both = current_df.merge(previous_df[['symbol'] + columns], on='symbol', suffixes=('', '_old'))
+    differs = np.zeros(len(both), dtype=bool)
+    for column in columns:
+        differs |= (both[column] != both[column + '_old']).to_numpy()
+    changed = both.loc[differs, list(current_df.columns)]
+    return added, removed, changed
+
+
+def build_changelog(added, removed, changed):
+    """Combine delta rows into one changelog frame with an 'op' column (add/remove/change)"""
+    parts = [df.assign(op=op) for op, df in (('add', added), ('remove', removed), ('change', changed)) if len(df)]
+    if not parts:
+        return pd.DataFrame(columns=['op', 'symbol'])
+    changelog = pd.concat(parts, ignore_index=True)
+    return changelog[['op'] + [c for c in changelog.columns if c != 'op']]
+
+
+def apply_changelog(df, changelog):
+    """Apply a changelog written by DeltaSync to a previously loaded snapshot"""
+    touched = changelog['symbol']
+    kept = df[~df['symbol'].isin(touched)]
+    upserts = changelog[changelog['op'].isin(['add', 'change'])].drop(columns=['op'])
+    return pd.concat([kept, upserts[[c for c in df.columns if c in upserts.columns]]], ignore_index=True)
+
+
+class DeltaSync:
+    """Refreshes the symbol universe partition by partition against the previous snapshot"""
+    def __init__(self, downloader, trust_first_page=True, verify_max_age=VERIFY_MAX_AGE):
+        self.downloader = downloader
+        self.output_dir = downloader.output_dir
+        self.latest_file = os.path.join(self.output_dir, "all_symbols_latest.csv")
+        # When a multi-page partition reports the same total and first page as last time it is
+        # assumed unchanged; set to False to page through every partition and only skip the diff
+        self.trust_first_page = trust_first_page
+        # Changes past the first page are invisible to that check, so a partition is paged through
+        # again once it has been trusted for verify_max_age seconds (None: trust it indefinitely)
+        self.verify_max_age = verify_max_age
+        self.changed_partitions = set()
+        self.verified_partitions = 0
+        self._lock = threading.Lock()
+
+    def _sync_partition(self, exchange, sec_type, previous_entry):
+        """Fetch one partition, reusing the previous snapshot when its first page is unchanged"""
+        first = self.downloader.search_symbols(exchange=exchange, sec_type=sec_type)
+        if first is None:
+            return None, None, False
+
+        symbol_list = first.get('symbolList', [])
+        total_found = first.get('totalFound', 0)
+        first_df = pd.DataFrame(symbol_list)
+        first_page_hash = content_hash(first_df)
+        next_key = first.get('nextKey', None)
+        single_page = not symbol_list or not first.get('hasMore', False) or next_key is None
+
+        now = time.time()
+        entry = {'total_found': total_found, 'first_page_hash': first_page_hash}
+        if (not single_page and self.trust_first_page and previous_entry
+                and previous_entry.get('total_found') == total_found
+                and previous_entry.get('first_page_hash') == first_page_hash):
+            if not verify_due(partition_key(exchange, sec_type), previous_entry.get('verified'), now,
+                              self.verify_max_age):
+                entry['hash'] = previous_entry['hash']
+                entry['rows'] = previous_entry['rows']
+                entry['verified'] = previous_entry['verified']
+                return None, entry, True
+            with self._lock:
+                self.verified_partitions += 1
+
+        dataframes = [first_df] if symbol_list else []
+        complete = True
+        if not single_page:
+            more, _, _, complete = self.downloader.download_partition(exchange, sec_type, start_key=next_key)
+            dataframes.extend(more)
+        df = pd.concat(dataframes, ignore_index=True) if dataframes else pd.DataFrame()
+        entry['hash'] = content_hash(df)
+        entry['rows'] = len(df)
+        entry['verified'] = now
+        return df, entry, complete
+
+    def run(self, workers=4, rate=None, previous_df=None, categories=None, executor=None):
+        """Run one delta refresh, returning the new universe DataFrame (None on failure)
+
+        A long-running caller can pass the previous universe it still holds instead of having it
+        re-read from all_symbols_latest.csv, cached categories, and a thread pool of its own, whose
+        threads keep their HTTP sessions (and connections) from one run to the next.
+        """
+        start_time = time.time()
+        self.verified_partitions = 0
+        manifest = load_manifest(self.output_dir)
+        if previous_df is None and os.path.exists(self.latest_file):
+            previous_df = symbol_schema.read_csv(self.latest_file)
+        if previous_df is not None:
+            logger.info(f"Previous snapshot: {len(previous_df):,} symbols")
+        else:
+            logger.info("No previous snapshot, every partition will be downloaded")
+            manifest = {'partitions': {}}
+
+        categories = categories or self.downloader.get_categories()
+        if not categories:
+            logger.error("Could not retrieve categories, delta sync needs them")
+            return None
+        partitions = self.downloader.get_partitions(categories, 'both')
+
+        if not self.downloader.rate_controller:
+            self.downloader.rate_limiter = RateLimiter(rate)
+        fresh, reused, new_manifest, failed = [], [], {}, []
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                executor.submit(self._sync_partition, exchange, sec_type,
+                                manifest['partitions'].get(partition_key(exchange, sec_type))): (exchange, sec_type)
+                for exchange, sec_type in partitions
+            }
+            for future in as_completed(futures):
+                exchange, sec_type = futures[future]
+                key = partition_key(exchange, sec_type)
+                df, entry, complete = future.result()
+                if entry is None or not complete:
+                    failed.append(key)
+                    continue
+                new_manifest[key] = entry
+                if df is None:
+                    reused.append((exchange, sec_type))
+                elif len(df):
+                    fresh.append(df)
+        finally:
+            if own_executor:
+                executor.shutdown()
+            self.downloader.rate_limiter = None
+
+        if failed:
+            logger.error(f"Delta sync incomplete, failed partitions: {', '.join(failed)}")
+            return None
+
+        changed_partitions = {key for key, entry in new_manifest.items()
+                              if manifest['partitions'].get(key, {}).get('hash') != entry['hash']}
+        changed_partitions |= set(manifest['partitions']) - set(new_manifest)
+        self.changed_partitions = changed_partitions
+
+        if previous_df is not None and not changed_partitions:
+            # Every partition hashes as before, so the previous snapshot is the new one
+            current_df = previous_df
+        else:
+            # Rebuild the universe from fresh partitions plus the reused part of the previous snapshot
+            parts = list(fresh)
+            if reused:
+                reused_keys = {partition_key(e, t) for e, t in reused}
+                previous_keys = previous_df['exchange'].astype(str) + '|' + previous_df['securityType'].astype(str)
+                parts.append(previous_df[previous_keys.isin(reused_keys)])
+            current_df = pd.concat(parts, ignore_index=True).drop_duplicates(subset=['symbol']) if parts else pd.DataFrame()
+        logger.info(f"Partitions: {len(partitions)} total, {len(reused)} reused without paging, "
+                    f"{self.verified_partitions} paged through again for verification, {len(changed_partitions)} changed")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        changelog_name = None
+        if previous_df is not None:
+            added, removed, changed = compute_delta(previous_df, current_df, changed_partitions)
+            logger.info(f"Delta: {len(added):,} added, {len(removed):,} removed, {len(changed):,} changed")
+            # No file for an empty delta: the changes directory is committed on every scheduled run
+            if len(added) or len(removed) or len(changed):
+                changelog_dir = os.path.join(self.output_dir, CHANGELOG_DIR)
+                os.makedirs(changelog_dir, exist_ok=True)
+                changelog_name = f"changelog_{timestamp}.csv"
+                build_changelog(added, removed, changed).to_csv(os.path.join(changelog_dir, changelog_name), index=False)
+                logger.info(f"Saved changelog to {os.path.join(changelog_dir, changelog_name)}")
+
+        if changed_partitions or not os.path.exists(self.latest_file):
+            tmp_file = self.latest_file + ".tmp"
+            current_df.to_csv(tmp_file, index=False)
+            os.replace(tmp_file, self.latest_file)
+        else:
+            logger.info(f"No partition changed, {self.latest_file} left as it is")
+
+        manifest_path = os.path.join(self.output_dir, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", 'w') as f:
+            json.dump({'generated': timestamp, 'changelog': changelog_name, 'partitions': new_manifest}, f, indent=1)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        current_df = symbol_schema.apply_schema(current_df)
+        self.downloader.save_symbol_stats(SymbolStats.from_frame(current_df))
+        logger.info(f"Delta sync finished in {time.time() - start_time:.1f} seconds, {len(current_df):,} symbols")
+        return current_df
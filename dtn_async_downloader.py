@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Pipelined asyncio client for the DTN IQFeed symbol search API
+Fetches pages over a pooled aiohttp connector while a consumer task parses and persists
+the previous pages, so network waits overlap with CSV and state writes
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency, only needed for the --async mode
+    aiohttp = None
+
+import page_codec
+import rate_control
+import symbol_schema
+from dtn_symbol_downloader import DTNCorrectAPIDownloader, error_kind
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDTNDownloader(DTNCorrectAPIDownloader):
+    """asyncio variant of DTNCorrectAPIDownloader with a producer/consumer page pipeline"""
+
+    def __init__(self, output_dir="dtn_symbols", base_url="https://ws1.dtn.com", max_connections=8,
+                 queue_size=16, max_batches=1000):
+        if aiohttp is None:
+            raise ImportError("The asyncio client needs aiohttp: pip install aiohttp")
+        super().__init__(output_dir=output_dir, base_url=base_url)
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.max_batches = max_batches
+        self.state_file = os.path.join(self.output_dir, "async_download_state.json")
+
+        # aiohttp only decodes brotli when the optional brotli package is installed
+        self.headers = dict(self.headers, **{'Accept-Encoding': 'gzip, deflate'})
+
+    def _open_session(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        return aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                     timeout=aiohttp.ClientTimeout(total=60))
+
+    async def get_categories_async(self, http):
+        """Get available exchanges and security types"""
+        try:
+            async with http.get(self.categories_url, params={'symbology': 'IQ'},
+                                timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status == 200:
+                    data = await response.json(content_type=None)
+                    if 'data' in data:
+                        logger.info("Successfully retrieved categories")
+                        return data['data']
+            return None
+        except Exception as e:
+            logger.error(f"Error getting categories: {e}")
+            return None
+
+    async def search_symbols_async(self, http, next_key=None, retry_count=3, retry_delay=None, exchange=None, sec_type=None):
+        """Search for symbols with the same retry, backoff and rate control semantics as search_symbols"""
+        params = self.build_search_params(next_key, exchange, sec_type)
+        retry_delay = self.retry_delay if retry_delay is None else retry_delay
+
+        last_error = None
+        for attempt in range(retry_count):
+            outcome = rate_control.ERROR
+            wait_time = None
+            with self.metrics.phase('rate_wait'):
+                ticket = await self.rate_controller.acquire_async() if self.rate_controller else None
+            if attempt:
+                self.metrics.incr('retries')
+            self.metrics.incr('requests')
+            try:
+                request_start = time.perf_counter()
+                async with http.get(self.search_url, params=params) as response:
+                    if response.status == 200:
+                        content = await response.read()
+                        self.metrics.add_time('network', time.perf_counter() - request_start)
+                        self.metrics.incr('bytes_received', value=len(content))
+                        with self.metrics.phase('decode'):
+                            data = page_codec.loads(content)
+                        if 'data' in data:
+                            outcome = rate_control.OK
+                            self.metrics.incr('pages')
+                            self.metrics.incr('rows_received', value=len(data['data'].get('symbolList') or []))
+                            return data['data']
+                        elif 'errors' in data:
+                            error_msg = data['errors'][0] if data['errors'] else 'Unknown error'
+                            logger.warning(f"API returned error: {error_msg}")
+                            last_error = error_msg
+
+                            # If it's a backend connection error, wait longer before retry
+                            if rate_control.BACKEND_ERROR_TEXT in error_msg:
+                                outcome = rate_control.BACKEND_ERROR
+                                wait_time = rate_control.backoff_delay(attempt + 1, retry_delay)
+                                logger.info(f"Backend database error. Waiting {wait_time:.1f} seconds before retry {attempt + 2}/{retry_count}...")
+                        else:
+                            logger.error(f"Unexpected response structure: {data}")
+                            last_error = "Unexpected response structure"
+                    else:
+                        text = await response.text()
+                        last_error = f"HTTP {response.status}: {text[:200]}"
+                        logger.error(last_error)
+
+                        # Retry on server errors
+                        if response.status >= 500:
+                            outcome = rate_control.SERVER_ERROR
+                            wait_time = rate_control.backoff_delay(attempt, retry_delay)
+                            logger.info(f"Server error. Waiting {wait_time:.1f} seconds before retry {attempt + 2}/{retry_count}...")
+
+            except asyncio.TimeoutError:
+                outcome = rate_control.TIMEOUT
+                last_error = "Request timed out"
+                logger.warning(f"Attempt {attempt + 1}/{retry_count}: {last_error}")
+                wait_time = rate_control.backoff_delay(attempt, retry_delay)
+
+            except aiohttp.ClientConnectionError as e:
+                outcome = rate_control.SERVER_ERROR
+                last_error = f"Connection error: {e}"
+                logger.warning(f"Attempt {attempt + 1}/{retry_count}: {last_error}")
+                wait_time = rate_control.backoff_delay(attempt, retry_delay)
+
+            except Exception as e:
+                last_error = f"Unexpected error: {e}"
+                logger.error(f"Attempt {attempt + 1}/{retry_count}: {last_error}")
+                wait_time = rate_control.backoff_delay(attempt, retry_delay)
+
+            finally:
+                if ticket is not None:
+                    self.rate_controller.release(ticket, outcome)
+                if outcome != rate_control.OK:
+                    self.metrics.incr('errors', error_kind(outcome, last_error))
+
+            if wait_time is not None and attempt < retry_count - 1:
+                with self.metrics.phase('backoff'):
+                    await asyncio.sleep(wait_time)
+
+        logger.error(f"All retry attempts failed. Last error: {last_error}")
+        return None
+
+    async def _produce(self, http, partition, start_key, queue, semaphore, delay):
+        """Walk one partition cursor, handing each page to the consumer as soon as it arrives"""
+        exchange, sec_type = partition
+        next_key = start_key
+        batch = 0
+        consecutive_errors = 0
+
+        async with semaphore:
+            while batch < self.max_batches:
+                if batch and delay and not self.rate_controller:
+                    with self.metrics.phase('sleep'):
+                        await asyncio.sleep(delay)
+
+                result = await self.search_symbols_async(http, next_key, exchange=exchange, sec_type=sec_type)
+                if result is None:
+                    consecutive_errors += 1
+                    if consecutive_errors >= 3:
+                        logger.error(f"  {exchange}/{sec_type}: too many consecutive errors, stopping partition")
+                        return False
+                    with self.metrics.phase('backoff'):
+                        await asyncio.sleep(rate_control.backoff_delay(consecutive_errors - 1, self.error_backoff))
+                    continue
+                consecutive_errors = 0
+
+                symbol_list = result.get('symbolList', [])
+                next_key = result.get('nextKey', None)
+                done = not symbol_list or not result.get('hasMore', False) or next_key is None
+                await queue.put((partition, symbol_list, next_key, done))
+                if done:
+                    return True
+                batch += 1
+
+        # Like download_partition, the cap ends the partition rather than failing the download: a
+        # resume would only walk the cursor into the cap again. An empty page records it as done.
+        logger.warning(f"  {exchange}/{sec_type}: reached safety limit of {self.max_batches} batches, stopping...")
+        await queue.put((partition, [], next_key, True))
+        return True
+
+    def _persist_page(self, state, partition, symbol_list, next_key, done, batch_number):
+        """Parse a page into a DataFrame and write its batch file and the download state"""
+        df = None
+        entry = state['partitions'].setdefault(_partition_key(partition), {'next_key': None, 'done': False, 'batches': []})
+        if symbol_list:
+            df = self.save_symbols_batch(symbol_list, batch_number)
+            entry['batches'].append(f"batch_{batch_number}.csv")
+        entry['next_key'] = next_key
+        entry['done'] = done
+
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+        return df
+
+    async def _consume(self, queue, state, all_dataframes, first_batch):
+        """Persist pages off the event loop while producers keep fetching"""
+        loop = asyncio.get_running_loop()
+        batch_number = first_batch
+        total_symbols = sum(len(df) for df in all_dataframes)
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            partition, symbol_list, next_key, done = item
+            df = await loop.run_in_executor(None, self._persist_page, state, partition, symbol_list,
+                                            next_key, done, batch_number)
+            if df is not None:
+                all_dataframes.append(df)
+                total_symbols += len(df)
+                batch_number += 1
+                logger.info(f"  Total symbols downloaded: {total_symbols:,}")
+
+    def _load_state(self, all_dataframes):
+        """Reload the pipeline state and already downloaded batches for a resume"""
+        with open(self.state_file, 'r') as f:
+            state = json.load(f)
+        last_batch = 0
+        for entry in state['partitions'].values():
+            for batch_file in entry['batches']:
+                df = symbol_schema.read_csv(os.path.join(self.output_dir, batch_file))
+                all_dataframes.append(df)
+                last_batch = max(last_batch, int(batch_file[len("batch_"):-len(".csv")]))
+        logger.info(f"Restored {len(all_dataframes)} batches from {self.state_file}")
+        return state, last_batch + 1
+
+    async def download_all_symbols(self, delay=0, partition_by=None, resume=False):
+        """Download all symbols through the async pipeline, optionally one cursor per partition"""
+        start_time = time.time()
+        all_dataframes = []
+        state = {'partitions': {}}
+        first_batch = 1
+        if resume and os.path.exists(self.state_file):
+            state, first_batch = self._load_state(all_dataframes)
+
+        logger.info("=" * 60)
+        logger.info(f"Starting async DTN IQFeed symbol download ({self.max_connections} connections)...")
+        logger.info("=" * 60)
+
+        async with self._open_session() as http:
+            partitions = [(None, None)]
+            if partition_by:
+                categories = await self.get_categories_async(http)
+                if not categories:
+                    logger.error("Could not retrieve categories, partitioned download needs them")
+                    return None
+                partitions = self.get_partitions(categories, partition_by)
+                logger.info(f"Partitions to download: {len(partitions)}")
+
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            semaphore = asyncio.Semaphore(self.max_connections)
+            consumer = asyncio.create_task(self._consume(queue, state, all_dataframes, first_batch))
+
+            producers = []
+            for partition in partitions:
+                entry = state['partitions'].get(_partition_key(partition))
+                if entry and entry['done']:
+                    continue
+                start_key = entry['next_key'] if entry else None
+                producers.append(asyncio.create_task(self._produce(http, partition, start_key, queue, semaphore, delay)))
+
+            try:
+                # Producers block on the bounded queue once the consumer stops taking pages, so
+                # every wait also watches the consumer and gives up as soon as it fails
+                results = await _unless_consumer_fails(asyncio.gather(*producers), consumer)
+                await _unless_consumer_fails(queue.put(None), consumer)
+                await consumer
+            finally:
+                pending = [task for task in producers + [consumer] if not task.done()]
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        total_time = time.time() - start_time
+        failed = results.count(False)
+        logger.info("\n" + "=" * 60)
+        logger.info("DOWNLOAD SUMMARY")
+        logger.info("=" * 60)
+        logger.info(f"Total batches downloaded: {len(all_dataframes)}")
+        logger.info(f"Total download time: {total_time:.1f} seconds ({total_time/60:.1f} minutes)")
+        self.log_rate_control()
+        if failed:
+            logger.warning(f"{failed} partition(s) incomplete, rerun with --resume to continue them")
+            return None
+
+        combined_df = self.combine_and_save(all_dataframes)
+        if combined_df is not None and os.path.exists(self.state_file):
+            os.remove(self.state_file)
+        return combined_df
+
+
+async def _unless_consumer_fails(awaitable, consumer):
+    """Result of awaitable, or the consumer task's exception if it fails first"""
+    task = asyncio.ensure_future(awaitable)
+    await asyncio.wait({task, consumer}, return_when=asyncio.FIRST_COMPLETED)
+    if task.done():
+        return task.result()
+    task.cancel()
+    await asyncio.wait({task})
+    if not task.cancelled():
+        # A cancelled gather() can end with CancelledError as its exception; fetch it so it is not reported
+        task.exception()
+    # The consumer only finishes before the end marker by raising
+    consumer.result()
+    raise RuntimeError("Page consumer stopped before the end of the download")
+
+
+def _partition_key(partition):
+    exchange, sec_type = partition
+    return f"{exchange or '*'}|{sec_type or '*'}"
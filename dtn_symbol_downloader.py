@@ -5,20 +5,187 @@ Downloads all symbols using the actual API endpoints found in the JavaScript
 """
 
 import requests
+import numpy as np
 import pandas as pd
 import time
 import os
 from datetime import datetime
 import logging
-import json
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import compress
+
+import file_codecs
+import page_codec
+import rate_control
+import symbol_schema
+from page_journal import JOURNAL_FILE, PageJournal
+from rate_control import AdaptiveRateController
+from run_metrics import REPORT_FILE, RunMetrics
+from query_filter import QueryFilter
+from symbol_stats import SymbolStats
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class RateLimiter:
+    """Spaces out requests from all worker threads to stay under a global rate"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        """Block until the caller may issue its next request"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+class SymbolHashSet:
+    """Compact set of 64-bit symbol hashes used to deduplicate pages as they stream in
+
+    Hashes live in a large sorted array plus a small sorted array of recent additions that is
+    merged into the large one once it grows past merge_threshold, so each lookup is a binary
+    search and each symbol costs 8 bytes instead of a Python string.
+    """
+    def __init__(self, merge_threshold=262144):
+        self.merge_threshold = merge_threshold
+        self._main = np.empty(0, dtype=np.uint64)
+        self._recent = np.empty(0, dtype=np.uint64)
+    
+    def __len__(self):
+        return len(self._main) + len(self._recent)
+    
+    @property
+    def nbytes(self):
+        return self._main.nbytes + self._recent.nbytes
+    
+    @staticmethod
+    def _contains(sorted_hashes, hashes):
+        if not len(sorted_hashes):
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(sorted_hashes, hashes).clip(max=len(sorted_hashes) - 1)
+        return sorted_hashes[positions] == hashes
+    
+    def add_new(self, symbols):
+        """Add symbols to the set and return a mask of the ones that were not seen before"""
+        hashes = pd.util.hash_array(np.asarray(symbols, dtype=object))
+        is_new = ~pd.Index(hashes).duplicated()
+        is_new &= ~self._contains(self._main, hashes)
+        is_new &= ~self._contains(self._recent, hashes)
+        
+        if is_new.any():
+            self._recent = self._merge(self._recent, np.sort(hashes[is_new]))
+            if len(self._recent) >= self.merge_threshold:
+                self._main = self._merge(self._main, self._recent)
+                self._recent = np.empty(0, dtype=np.uint64)
+        return is_new
+    
+    @staticmethod
+    def _merge(sorted_hashes, sorted_new):
+        """Merge two sorted arrays in linear time instead of re-sorting their concatenation"""
+        return np.insert(sorted_hashes, np.searchsorted(sorted_hashes, sorted_new), sorted_new)
+
+class StreamingSymbolWriter:
+    """Appends pages straight to the final CSV, skipping symbols that were already written"""
+    def __init__(self, path, metrics=None):
+        self.path = path
+        self.metrics = metrics or RunMetrics()
+        self.partial_path = path + ".partial"
+        self.columns = None
+        self.seen = SymbolHashSet()
+        self.stats = SymbolStats()
+        self.pages = 0
+        self.rows_written = 0
+        self.duplicates_removed = 0
+        self._file = None
+        self._lock = threading.Lock()
+    
+    def open(self, resume_offset=None):
+        """Start a new output file, or truncate a partial one back to the last saved page"""
+        if resume_offset and os.path.exists(self.partial_path):
+            self._file = open(self.partial_path, 'r+', newline='', encoding='utf-8')
+            self._file.truncate(resume_offset)
+            self._file.seek(resume_offset)
+            self._file.flush()
+            # Rebuild the dedup index and statistics from the columns they need, a chunk at a time
+            stats_columns = {'symbol', 'description', 'exchange', 'securityType'}
+            for chunk in symbol_schema.read_csv(self.partial_path, usecols=lambda column: column in stats_columns,
+                                                chunksize=500000):
+                self.rows_written += len(chunk)
+                self.seen.add_new(chunk['symbol'].to_numpy(dtype=object))
+                self.stats.add_frame(chunk)
+            with open(self.partial_path, 'r', encoding='utf-8') as f:
+                self.columns = f.readline().strip().split(',')
+            logger.info(f"Resumed {self.partial_path} at {resume_offset:,} bytes ({self.rows_written:,} symbols)")
+        else:
+            self._file = open(self.partial_path, 'w', newline='', encoding='utf-8')
+        return self
+    
+    def write_page(self, symbols):
+        """Append the symbols of one page that have not been written yet, return the new row count"""
+        return self.write_rows(*page_codec.page_rows(symbols))
+    
+    def write_rows(self, columns, rows):
+        """write_page() for a page already split into columns and row tuples (see page_codec)"""
+        with self._lock:
+            header = None
+            if self.columns is None:
+                self.columns = list(columns)
+                header = self.columns
+            
+            if list(columns) != self.columns:
+                extra_columns = set(columns) - set(self.columns)
+                if extra_columns:
+                    logger.warning(f"Dropping columns not present in the first page: {sorted(extra_columns)}")
+                positions = {column: i for i, column in enumerate(columns)}
+                picks = [positions.get(column) for column in self.columns]
+                rows = [tuple(None if i is None else row[i] for i in picks) for row in rows]
+            
+            if 'symbol' in self.columns and rows:
+                with self.metrics.phase('dedup'):
+                    position = self.columns.index('symbol')
+                    is_new = self.seen.add_new([row[position] for row in rows])
+                    duplicates = len(rows) - int(is_new.sum())
+                    if duplicates:
+                        self.duplicates_removed += duplicates
+                        rows = list(compress(rows, is_new))
+            
+            with self.metrics.phase('csv_write'):
+                page_codec.write_csv_rows(self._file, rows, header)
+                self._file.flush()
+            
+            with self.metrics.phase('stats'):
+                self.stats.add_rows(self.columns, rows)
+            
+            self.pages += 1
+            self.rows_written += len(rows)
+            return len(rows)
+    
+    def tell(self):
+        """Byte offset of the end of the last complete page (saved in the resume state)"""
+        with self._lock:
+            return self._file.tell()
+    
+    def close(self, complete=True):
+        """Close the output and, if the download finished, move it into place"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if complete:
+            os.replace(self.partial_path, self.path)
+
 class DTNCorrectAPIDownloader:
-    def __init__(self, output_dir="dtn_symbols"):
-        self.base_url = "https://ws1.dtn.com"
+    def __init__(self, output_dir="dtn_symbols", base_url="https://ws1.dtn.com"):
+        self.base_url = base_url
         self.search_url = f"{self.base_url}/SymbolSearch/QuerySymbolsDD"
         self.categories_url = f"{self.base_url}/SymbolSearch/GetSymbolCategories"
         self.session = requests.Session()
@@ -39,6 +206,29 @@ class DTNCorrectAPIDownloader:
             'Referer': 'https://ws1.dtn.com/IQ/Search/'
         }
         self.session.headers.update(self.headers)
+        
+        # Shared by all worker threads in partitioned downloads. rate_controller, when set, takes
+        # over from rate_limiter and from the fixed delay between batches
+        self.rate_limiter = None
+        self.rate_controller = None
+        self.retry_delay = 5
+        self.error_backoff = 30  # Base wait after a page failed all its retries
+        self.metrics = RunMetrics()
+        self.symbol_stats = None
+        # Optional query_filter.QueryFilter: restricts partitions and sets the server-side flags
+        self.query_filter = None
+        self._local = threading.local()
+    
+    def _get_session(self):
+        """Return the session for the calling thread (requests.Session is not thread-safe)"""
+        if threading.current_thread() is threading.main_thread():
+            return self.session
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
     
     def get_categories(self):
         """Get available exchanges and security types"""
@@ -56,14 +246,37 @@ class DTNCorrectAPIDownloader:
             logger.error(f"Error getting categories: {e}")
             return None
     
-    def search_symbols(self, next_key=None, retry_count=3, retry_delay=5):
-        """Search for symbols with pagination support and retry mechanism"""
+    def get_partitions(self, categories, partition_by='both'):
+        """Build the (exchange, secType) partitions to download from get_categories() data"""
+        def category_values(items):
+            values = []
+            for item in items or []:
+                # Categories may come back as plain strings or as objects
+                if isinstance(item, dict):
+                    item = item.get('value') or item.get('name') or item.get('code')
+                if item:
+                    values.append(str(item))
+            return values
+        
+        exchanges = category_values(categories.get('exchange'))
+        security_types = category_values(categories.get('securityType'))
+        
+        if self.query_filter is not None and self.query_filter.partitioned:
+            return self.query_filter.partitions(exchanges, security_types, partition_by)
+        if partition_by == 'exchange':
+            return [(exchange, None) for exchange in exchanges]
+        if partition_by == 'secType':
+            return [(None, sec_type) for sec_type in security_types]
+        return [(exchange, sec_type) for exchange in exchanges for sec_type in security_types]
+    
+    def build_search_params(self, next_key=None, exchange=None, sec_type=None):
+        """Build the QuerySymbolsDD query parameters for one page"""
         params = {
             'nextKey': next_key,
             'searchText': '',  # Empty to get all symbols
             'symbology': 'iq',
-            'exchange': None,  # All exchanges
-            'secType': None,   # All security types
+            'exchange': exchange,  # None means all exchanges
+            'secType': sec_type,   # None means all security types
             'sicCode': None,
             'naicsCode': None,
             'onlyFront': 'false',
@@ -75,31 +288,57 @@ class DTNCorrectAPIDownloader:
             'clientVersion': 'IQsite 1.0'
         }
         
+        if self.query_filter is not None:
+            params.update(self.query_filter.search_params())
+        
         # Remove None values
-        params = {k: v for k, v in params.items() if v is not None}
+        return {k: v for k, v in params.items() if v is not None}
+    
+    def search_symbols(self, next_key=None, retry_count=3, retry_delay=None, exchange=None, sec_type=None):
+        """Search for symbols with pagination support and retry mechanism
+        
+        Retries back off exponentially with jitter. When a rate_controller is set every attempt
+        goes through it and its outcome is reported back, so pacing follows server health.
+        """
+        params = self.build_search_params(next_key, exchange, sec_type)
+        retry_delay = self.retry_delay if retry_delay is None else retry_delay
         
         last_error = None
         for attempt in range(retry_count):
+            outcome = rate_control.ERROR
+            wait_time = None
+            with self.metrics.phase('rate_wait'):
+                ticket = self.rate_controller.acquire() if self.rate_controller else None
+                if ticket is None and self.rate_limiter:
+                    self.rate_limiter.wait()
+            if attempt:
+                self.metrics.incr('retries')
+            self.metrics.incr('requests')
             try:
-                response = self.session.get(self.search_url, params=params, timeout=60)
+                with self.metrics.phase('network'):
+                    response = self._get_session().get(self.search_url, params=params, timeout=60)
+                    content = response.content
+                self.metrics.incr('bytes_received', value=len(content))
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    with self.metrics.phase('decode'):
+                        data = page_codec.loads(content)
                     if 'data' in data:
+                        outcome = rate_control.OK
+                        self.metrics.incr('pages')
+                        self.metrics.incr('rows_received', value=len(data['data'].get('symbolList') or []))
                         return data['data']
                     elif 'errors' in data:
                         # Handle known errors
                         error_msg = data['errors'][0] if data['errors'] else 'Unknown error'
                         logger.warning(f"API returned error: {error_msg}")
+                        last_error = error_msg
                         
                         # If it's a backend connection error, wait longer before retry
-                        if 'backend search database' in error_msg:
-                            if attempt < retry_count - 1:
-                                wait_time = retry_delay * (attempt + 2)  # Exponential backoff
-                                logger.info(f"Backend database error. Waiting {wait_time} seconds before retry {attempt + 2}/{retry_count}...")
-                                time.sleep(wait_time)
-                                continue
-                        last_error = error_msg
+                        if rate_control.BACKEND_ERROR_TEXT in error_msg:
+                            outcome = rate_control.BACKEND_ERROR
+                            wait_time = rate_control.backoff_delay(attempt + 1, retry_delay)
+                            logger.info(f"Backend database error. Waiting {wait_time:.1f} seconds before retry {attempt + 2}/{retry_count}...")
                     else:
                         logger.error(f"Unexpected response structure: {data}")
                         last_error = "Unexpected response structure"
@@ -108,81 +347,88 @@ class DTNCorrectAPIDownloader:
                     logger.error(last_error)
                     
                     # Retry on server errors
-                    if response.status_code >= 500 and attempt < retry_count - 1:
-                        wait_time = retry_delay * (attempt + 1)
-                        logger.info(f"Server error. Waiting {wait_time} seconds before retry {attempt + 2}/{retry_count}...")
-                        time.sleep(wait_time)
-                        continue
+                    if response.status_code >= 500:
+                        outcome = rate_control.SERVER_ERROR
+                        wait_time = rate_control.backoff_delay(attempt, retry_delay)
+                        logger.info(f"Server error. Waiting {wait_time:.1f} seconds before retry {attempt + 2}/{retry_count}...")
                         
             except requests.exceptions.Timeout:
+                outcome = rate_control.TIMEOUT
                 last_error = "Request timed out"
                 logger.warning(f"Attempt {attempt + 1}/{retry_count}: {last_error}")
-                if attempt < retry_count - 1:
-                    logger.info(f"Waiting {retry_delay} seconds before retry...")
-                    time.sleep(retry_delay)
+                wait_time = rate_control.backoff_delay(attempt, retry_delay)
                     
             except requests.exceptions.ConnectionError as e:
+                # Refused or reset connections are the usual symptom of an overloaded server
+                outcome = rate_control.SERVER_ERROR
                 last_error = f"Connection error: {e}"
                 logger.warning(f"Attempt {attempt + 1}/{retry_count}: {last_error}")
-                if attempt < retry_count - 1:
-                    wait_time = retry_delay * (attempt + 1)
-                    logger.info(f"Waiting {wait_time} seconds before retry...")
-                    time.sleep(wait_time)
+                wait_time = rate_control.backoff_delay(attempt, retry_delay)
                     
             except Exception as e:
                 last_error = f"Unexpected error: {e}"
                 logger.error(f"Attempt {attempt + 1}/{retry_count}: {last_error}")
-                if attempt < retry_count - 1:
-                    time.sleep(retry_delay)
+                wait_time = rate_control.backoff_delay(attempt, retry_delay)
+            
+            finally:
+                if ticket is not None:
+                    self.rate_controller.release(ticket, outcome)
+                if outcome != rate_control.OK:
+                    self.metrics.incr('errors', error_kind(outcome, last_error))
+            
+            if wait_time is not None and attempt < retry_count - 1:
+                with self.metrics.phase('backoff'):
+                    time.sleep(wait_time)
         
         logger.error(f"All retry attempts failed. Last error: {last_error}")
         return None
     
     def save_symbols_batch(self, symbols, batch_number):
         """Save a batch of symbols to CSV"""
-        df = pd.DataFrame(symbols)
+        columns, rows = page_codec.page_rows(symbols)
         
         # Save batch file
         batch_file = os.path.join(self.output_dir, f"batch_{batch_number}.csv")
-        df.to_csv(batch_file, index=False)
-        logger.info(f"Saved batch {batch_number} with {len(df)} symbols to {batch_file}")
+        with open(batch_file, 'w', newline='', encoding='utf-8') as f:
+            page_codec.write_csv_rows(f, rows, header=columns)
+        logger.info(f"Saved batch {batch_number} with {len(rows)} symbols to {batch_file}")
         
-        return df
+        return page_codec.rows_frame(columns, rows)
     
-    def download_all_symbols(self, delay=2, resume_from_batch=None):
-        """Download all symbols using the correct pagination with resume capability"""
-        all_dataframes = []
-        batch = resume_from_batch if resume_from_batch else 1
+    def download_all_symbols(self, delay=2, resume_from_batch=None, streaming=False):
+        """Download all symbols using the correct pagination with resume capability
+        
+        Every page is appended to a PageJournal together with the cursor state after it, and
+        resume_from_batch continues from the journal's last good record. Once the download is
+        complete the journal is combined into all_symbols_latest.csv. With streaming=True the
+        pages are streamed out of the journal through a StreamingSymbolWriter and the path of
+        that file is returned instead of a DataFrame.
+        """
+        journal = PageJournal(os.path.join(self.output_dir, JOURNAL_FILE))
+        batch = 1
         next_key = None
         total_symbols = 0
         total_reported = 0
+        done = False
         start_time = time.time()
         consecutive_errors = 0
         max_consecutive_errors = 3
         
-        # If resuming, load existing data
-        if resume_from_batch and resume_from_batch > 1:
-            logger.info(f"Resuming from batch {resume_from_batch}")
-            # Load previous batches
-            for i in range(1, resume_from_batch):
-                batch_file = os.path.join(self.output_dir, f"batch_{i}.csv")
-                if os.path.exists(batch_file):
-                    df = pd.read_csv(batch_file)
-                    all_dataframes.append(df)
-                    total_symbols += len(df)
-                    logger.info(f"Loaded batch {i} with {len(df)} symbols")
-            
-            # Try to find the next_key from a state file
-            state_file = os.path.join(self.output_dir, "download_state.json")
-            if os.path.exists(state_file):
-                try:
-                    with open(state_file, 'r') as f:
-                        state = json.load(f)
-                        next_key = state.get('next_key')
-                        total_reported = state.get('total_reported', 0)
-                        logger.info(f"Restored state: next_key={next_key}, total_reported={total_reported}")
-                except:
-                    logger.warning("Could not restore state, starting fresh")
+        # If resuming, continue from the last good page in the journal
+        state = journal.open(resume=bool(resume_from_batch))
+        if resume_from_batch:
+            if state:
+                batch = state['batch']
+                next_key = state['next_key']
+                total_symbols = state['total_symbols']
+                total_reported = state['total_reported']
+                done = state['done']
+                logger.info(f"Restored state from journal: batch={batch}, next_key={next_key}, "
+                            f"total_symbols={total_symbols:,}, total_reported={total_reported:,}")
+                if resume_from_batch != batch:
+                    logger.info(f"The journal ends before batch {batch}, resuming there instead of batch {resume_from_batch}")
+            else:
+                logger.warning("No download journal to resume from, starting fresh")
         
         logger.info("="*60)
         logger.info("Starting DTN IQFeed symbol download...")
@@ -198,13 +444,14 @@ class DTNCorrectAPIDownloader:
                 logger.info(f"Available security types: {len(security_types)}")
                 logger.info("-"*60)
         
-        while True:
+        while not done:
             batch_start = time.time()
             logger.info(f"\nBatch {batch}:")
             logger.info(f"  Downloading...")
             
-            if batch > 1:
-                time.sleep(delay)
+            if batch > 1 and not self.rate_controller:
+                with self.metrics.phase('sleep'):
+                    time.sleep(delay)
             
             # Search for symbols with retry mechanism
             result = self.search_symbols(next_key)
@@ -219,9 +466,10 @@ class DTNCorrectAPIDownloader:
                     break
                 
                 # Wait before continuing to next batch
-                wait_time = 30 * consecutive_errors  # Exponential backoff
-                logger.info(f"  Waiting {wait_time} seconds before trying next batch...")
-                time.sleep(wait_time)
+                wait_time = rate_control.backoff_delay(consecutive_errors - 1, self.error_backoff)
+                logger.info(f"  Waiting {wait_time:.1f} seconds before trying next batch...")
+                with self.metrics.phase('backoff'):
+                    time.sleep(wait_time)
                 continue
             
             # Reset error counter on success
@@ -236,17 +484,24 @@ class DTNCorrectAPIDownloader:
                 total_reported = total_found
                 logger.info(f"  Total symbols available: {total_reported:,}")
             
-            if not symbol_list:
-                logger.info("  No symbols returned, reached end of data")
-                break
-            
-            # Save this batch
-            df = self.save_symbols_batch(symbol_list, batch)
-            all_dataframes.append(df)
+            # Check if there are more results
+            has_more = result.get('hasMore', False)
+            next_key = result.get('nextKey', None)
+            done = not symbol_list or not has_more or next_key is None
             
             # Update counters
             batch_symbols = len(symbol_list)
             total_symbols += batch_symbols
+            
+            # Journal the page with the state to resume from after it
+            with self.metrics.phase('journal_write'):
+                journal.append(symbol_list, batch=batch + 1, next_key=next_key, total_symbols=total_symbols,
+                               total_reported=total_reported, done=done)
+            
+            if not symbol_list:
+                logger.info("  No symbols returned, reached end of data")
+                break
+            
             batch_time = time.time() - batch_start
             
             # Progress information
@@ -265,22 +520,7 @@ class DTNCorrectAPIDownloader:
                     
             logger.info(f"  Batch download time: {batch_time:.1f} seconds")
             
-            # Check if there are more results
-            has_more = result.get('hasMore', False)
-            next_key = result.get('nextKey', None)
-            
-            # Save state for resume capability
-            state = {
-                'batch': batch + 1,
-                'next_key': next_key,
-                'total_symbols': total_symbols,
-                'total_reported': total_reported
-            }
-            state_file = os.path.join(self.output_dir, "download_state.json")
-            with open(state_file, 'w') as f:
-                json.dump(state, f)
-            
-            if not has_more or next_key is None:
+            if done:
                 logger.info("\n  Reached end of data (no more symbols available)")
                 break
             
@@ -289,32 +529,221 @@ class DTNCorrectAPIDownloader:
             # Safety limit
             if batch > 1000:
                 logger.warning("Reached safety limit of 1000 batches, stopping...")
+                done = True
                 break
         
         # Calculate total time
         total_time = time.time() - start_time
+        batch_count = journal.records_written
+        
+        logger.info("\n" + "="*60)
+        logger.info("DOWNLOAD SUMMARY")
+        logger.info("="*60)
+        logger.info(f"Total batches downloaded: {batch_count}")
+        logger.info(f"Total symbols downloaded: {total_symbols:,}")
+        if total_reported > 0:
+            completion_percentage = (total_symbols / total_reported) * 100
+            logger.info(f"Download completion: {completion_percentage:.1f}%")
+        logger.info(f"Total download time: {total_time:.1f} seconds ({total_time/60:.1f} minutes)")
+        if batch_count > 0:
+            logger.info(f"Average time per batch: {total_time/batch_count:.1f} seconds")
+        self.log_rate_control()
+        
+        if not done:
+            journal.close()
+            logger.warning(f"Download incomplete, pages so far are kept in {journal.path}")
+            return None
+        
+        # Combine straight out of the journal
+        if streaming:
+            writer = StreamingSymbolWriter(os.path.join(self.output_dir, "all_symbols_latest.csv"), self.metrics).open()
+            for _, columns, rows in journal.records():
+                if rows:
+                    writer.write_rows(columns, rows)
+            result = self.finish_streaming(writer)
+        else:
+            with self.metrics.phase('dataframe_build'):
+                dataframes = [page_codec.rows_frame(columns, rows) for _, columns, rows in journal.records() if rows]
+            result = self.combine_and_save(dataframes)
+        
+        if result is not None:
+            journal.remove()
+        else:
+            journal.close()
+        return result
+    
+    def download_partition(self, exchange=None, sec_type=None, max_batches=1000, page_sink=None, start_key=None):
+        """Walk the nextKey cursor of a single exchange/security type partition
+        
+        Pages are collected as DataFrames, or handed to page_sink(symbol_list) when one is given.
+        start_key continues a cursor whose earlier pages were already fetched.
+        """
+        dataframes = []
+        symbol_count = 0
+        next_key = start_key
+        total_found = 0
+        batch = 1
+        consecutive_errors = 0
+        max_consecutive_errors = 3
+        
+        while batch <= max_batches:
+            result = self.search_symbols(next_key, exchange=exchange, sec_type=sec_type)
+            
+            if result is None:
+                consecutive_errors += 1
+                if consecutive_errors >= max_consecutive_errors:
+                    logger.error(f"  {exchange}/{sec_type}: too many consecutive errors, giving up after batch {batch - 1}")
+                    return dataframes, symbol_count, total_found, False
+                with self.metrics.phase('backoff'):
+                    time.sleep(rate_control.backoff_delay(consecutive_errors - 1, self.error_backoff))
+                continue
+            consecutive_errors = 0
+            
+            symbol_list = result.get('symbolList', [])
+            if batch == 1:
+                total_found = result.get('totalFound', 0)
+            if not symbol_list:
+                break
+            
+            symbol_count += len(symbol_list)
+            if page_sink:
+                page_sink(symbol_list)
+            else:
+                with self.metrics.phase('dataframe_build'):
+                    dataframes.append(pd.DataFrame(symbol_list))
+            
+            next_key = result.get('nextKey', None)
+            if not result.get('hasMore', False) or next_key is None:
+                break
+            batch += 1
+        else:
+            logger.warning(f"  {exchange}/{sec_type}: reached safety limit of {max_batches} batches, stopping...")
+        
+        return dataframes, symbol_count, total_found, True
+    
+    def download_all_symbols_parallel(self, workers=4, rate=None, partition_by='both', streaming=False):
+        """Download all symbols with one cursor per exchange/secType partition on a worker pool"""
+        start_time = time.time()
+        writer = None
+        page_sink = None
+        
+        logger.info("="*60)
+        logger.info(f"Starting partitioned DTN IQFeed symbol download ({workers} workers)...")
+        logger.info("="*60)
+        
+        categories = self.get_categories()
+        if not categories:
+            logger.error("Could not retrieve categories, partitioned download needs them")
+            return None
+        
+        partitions = self.get_partitions(categories, partition_by)
+        logger.info(f"Partitions to download: {len(partitions)}")
+        if self.rate_controller:
+            logger.info(f"Adaptive rate control, starting at {self.rate_controller.rate:.2f} requests/second")
+        elif rate:
+            logger.info(f"Global rate limit: {rate:.2f} requests/second")
+        logger.info("-"*60)
+        
+        if streaming:
+            writer = StreamingSymbolWriter(os.path.join(self.output_dir, "all_symbols_latest.csv"), self.metrics).open()
+            page_sink = writer.write_page
+        
+        if not self.rate_controller:
+            self.rate_limiter = RateLimiter(rate)
+        all_dataframes = []
+        failed_partitions = []
+        total_symbols = 0
+        total_reported = 0
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self.download_partition, exchange, sec_type, page_sink=page_sink): (exchange, sec_type)
+                    for exchange, sec_type in partitions
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    exchange, sec_type = futures[future]
+                    try:
+                        dataframes, partition_symbols, total_found, complete = future.result()
+                    except Exception as e:
+                        logger.error(f"  {exchange}/{sec_type}: unexpected error: {e}")
+                        dataframes, partition_symbols, total_found, complete = [], 0, 0, False
+                    
+                    if not complete:
+                        failed_partitions.append((exchange, sec_type))
+                    
+                    all_dataframes.extend(dataframes)
+                    total_symbols += partition_symbols
+                    total_reported += total_found
+                    
+                    if partition_symbols or not complete:
+                        logger.info(f"  [{done}/{len(partitions)}] {exchange}/{sec_type}: {partition_symbols:,} symbols "
+                                    f"(total {total_symbols:,})")
+        finally:
+            self.rate_limiter = None
+        
+        total_time = time.time() - start_time
         
         logger.info("\n" + "="*60)
         logger.info("DOWNLOAD SUMMARY")
         logger.info("="*60)
-        logger.info(f"Total batches downloaded: {len(all_dataframes)}")
+        logger.info(f"Partitions downloaded: {len(partitions) - len(failed_partitions)}/{len(partitions)}")
+        logger.info(f"Total batches downloaded: {writer.pages if writer else len(all_dataframes)}")
         logger.info(f"Total symbols downloaded: {total_symbols:,}")
         if total_reported > 0:
             completion_percentage = (total_symbols / total_reported) * 100
             logger.info(f"Download completion: {completion_percentage:.1f}%")
         logger.info(f"Total download time: {total_time:.1f} seconds ({total_time/60:.1f} minutes)")
-        if len(all_dataframes) > 0:
-            logger.info(f"Average time per batch: {total_time/len(all_dataframes):.1f} seconds")
+        self.log_rate_control()
+        if failed_partitions:
+            logger.warning(f"Incomplete partitions: {', '.join(f'{e}/{t}' for e, t in failed_partitions)}")
         
-        # Combine all results
+        if writer:
+            return self.finish_streaming(writer)
+        return self.combine_and_save(all_dataframes)
+    
+    def log_rate_control(self):
+        """Log where the adaptive rate controller ended up, if one was used"""
+        if not self.rate_controller:
+            return
+        stats = self.rate_controller.stats
+        logger.info(f"Adaptive rate: {self.rate_controller.rate:.2f} requests/second at the end, "
+                    f"peak {stats['peak_rate']:.2f}, {stats['decreases']} slowdowns, "
+                    f"{stats['server_error'] + stats['timeout']} server errors/timeouts, "
+                    f"{stats['backend_error']} backend errors")
+    
+    def finish_streaming(self, writer, complete=True):
+        """Move the streamed output into place and report on it"""
+        if not complete:
+            writer.close(complete=False)
+            logger.warning(f"Download incomplete, partial output kept in {writer.partial_path}")
+            return None
+        
+        writer.close()
+        if writer.duplicates_removed > 0:
+            logger.info(f"Removed {writer.duplicates_removed:,} duplicate symbols")
+        logger.info(f"Final unique symbol count: {writer.rows_written:,}")
+        logger.info(f"Dedup index size: {writer.seen.nbytes / (1024 * 1024):.2f} MB")
+        logger.info(f"Saved as: {writer.path}")
+        file_size = os.path.getsize(writer.path) / (1024 * 1024)  # MB
+        logger.info(f"File size: {file_size:.2f} MB")
+        self.save_symbol_stats(writer.stats)
+        
+        return writer.path
+    
+    def combine_and_save(self, all_dataframes):
+        """Combine downloaded batches, remove duplicates and save all_symbols_latest.csv"""
         if all_dataframes:
             logger.info(f"\nCombining {len(all_dataframes)} batches...")
-            combined_df = pd.concat(all_dataframes, ignore_index=True)
+            with self.metrics.phase('combine'):
+                combined_df = pd.concat(all_dataframes, ignore_index=True)
             
             # Remove duplicates based on symbol
             original_count = len(combined_df)
-            combined_df = combined_df.drop_duplicates(subset=['symbol'])
+            with self.metrics.phase('dedup'):
+                combined_df = combined_df.drop_duplicates(subset=['symbol'])
             duplicates_removed = original_count - len(combined_df)
+            combined_df = symbol_schema.apply_schema(combined_df)
             
             if duplicates_removed > 0:
                 logger.info(f"Removed {duplicates_removed:,} duplicate symbols")
@@ -329,23 +758,27 @@ class DTNCorrectAPIDownloader:
             
             # Also save as latest
             latest_file = os.path.join(self.output_dir, "all_symbols_latest.csv")
-            combined_df.to_csv(latest_file, index=False)
+            with self.metrics.phase('csv_write'):
+                combined_df.to_csv(latest_file, index=False)
             logger.info(f"Also saved as: {latest_file}")
             
             # File size information
             file_size = os.path.getsize(latest_file) / (1024 * 1024)  # MB
             logger.info(f"File size: {file_size:.2f} MB")
             
-            # Remove state file on successful completion
-            state_file = os.path.join(self.output_dir, "download_state.json")
-            if os.path.exists(state_file):
-                os.remove(state_file)
-            
+            with self.metrics.phase('stats'):
+                self.save_symbol_stats(SymbolStats.from_frame(combined_df))
             return combined_df
         else:
             logger.warning("No data was collected")
             return None
     
+    def save_symbol_stats(self, stats):
+        """Keep the statistics of the final output and persist them next to it"""
+        self.symbol_stats = stats
+        path = stats.save(self.output_dir)
+        logger.info(f"Saved statistics to: {path}")
+    
     def cleanup_batch_files(self):
         """Remove temporary batch files"""
         logger.info("Cleaning up batch files...")
@@ -357,8 +790,40 @@ class DTNCorrectAPIDownloader:
                     pass
         logger.info("Cleanup complete")
 
-    def split_symbols_by_exchange_and_type(self, dataframe):
-        """Splits the symbols into files by exchange and security type"""
+    def split_csv_by_exchange_and_type(self, csv_path, chunksize=500000, archive_path=None,
+                                       codec=file_codecs.DEFAULT_CODEC, archive_codec=file_codecs.DEFAULT_ARCHIVE_CODEC):
+        """Splits a combined CSV into files by exchange and security type one chunk at a time"""
+        written = set()
+        for chunk in symbol_schema.read_csv(csv_path, chunksize=chunksize):
+            self.split_symbols_by_exchange_and_type(chunk, written=written, codec=codec)
+        
+        # Appended files are only final after the last chunk, so archive them from disk
+        if archive_path:
+            compression, compresslevel = file_codecs.parse_archive_codec(archive_codec)
+            tmp_path = archive_path + ".tmp"
+            with zipfile.ZipFile(tmp_path, 'w', compression=compression, compresslevel=compresslevel) as archive:
+                for file_path in sorted(written):
+                    archive.write(file_path, self._split_arcname(file_path))
+            os.replace(tmp_path, archive_path)
+            logger.info(f"Saved {len(written)} files to {archive_path}")
+    
+    def _split_arcname(self, file_path):
+        """Archive member name matching `zip -r dtn_symbols/by_exchange.zip dtn_symbols/by_exchange`"""
+        relative = os.path.relpath(file_path, self.output_dir)
+        return os.path.join(os.path.basename(os.path.normpath(self.output_dir)), relative).replace(os.sep, '/')
+    
+    def split_symbols_by_exchange_and_type(self, dataframe, written=None, archive_path=None, max_workers=None,
+                                           codec=file_codecs.DEFAULT_CODEC, archive_codec=file_codecs.DEFAULT_ARCHIVE_CODEC):
+        """Splits the symbols into files by exchange and security type
+        
+        Groups are built in a single pass over both keys and written from a thread pool. With
+        archive_path the same bytes are also written into a zip archive, so no separate
+        compression step is needed. When a written set is passed, files already in it are
+        appended to, so the split can be fed one chunk at a time (see split_csv_by_exchange_and_type).
+        codec compresses the files themselves ({sec_type}.csv.gz / .csv.zst, see file_codecs),
+        archive_codec sets the zip method and level.
+        """
+        file_suffix = file_codecs.suffix(codec)
         if dataframe is None or 'exchange' not in dataframe.columns or 'securityType' not in dataframe.columns:
             logger.warning("DataFrame is missing 'exchange' or 'securityType' columns. Skipping split.")
             return
@@ -367,19 +832,83 @@ class DTNCorrectAPIDownloader:
         os.makedirs(split_output_dir, exist_ok=True)
         logger.info(f"Splitting symbols into {split_output_dir}")
 
-        grouped_by_exchange = dataframe.groupby('exchange')
-
-        for exchange, exchange_group in grouped_by_exchange:
+        tasks = []
+        exchange_dirs = set()
+        for (exchange, sec_type), type_group in dataframe.groupby(['exchange', 'securityType'], sort=True, observed=True):
             exchange_dir = os.path.join(split_output_dir, str(exchange))
-            os.makedirs(exchange_dir, exist_ok=True)
+            if exchange_dir not in exchange_dirs:
+                os.makedirs(exchange_dir, exist_ok=True)
+                exchange_dirs.add(exchange_dir)
+            
+            file_path = os.path.join(exchange_dir, f"{sec_type}.csv{file_suffix}")
+            append = written is not None and file_path in written
+            if written is not None:
+                written.add(file_path)
+            if not append:
+                # A split written with another codec would otherwise be read twice downstream
+                for stale_suffix, _ in file_codecs.CODECS.values():
+                    stale_path = os.path.join(exchange_dir, f"{sec_type}.csv{stale_suffix}")
+                    if stale_suffix != file_suffix and os.path.exists(stale_path):
+                        os.remove(stale_path)
+            tasks.append((file_path, type_group, append))
+
+        def write_group(task):
+            file_path, type_group, append = task
+            data = file_codecs.compress(type_group.to_csv(index=False, header=not append).encode('utf-8'), codec)
+            with open(file_path, 'ab' if append else 'wb') as f:
+                f.write(data)
+            logger.debug(f"Saved {len(type_group)} symbols to {file_path}")
+            return file_path, data
 
-            grouped_by_type = exchange_group.groupby('securityType')
+        max_workers = max_workers or min(8, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(write_group, tasks)
+            if archive_path:
+                # zipfile needs a single writer, it consumes results while the pool keeps serialising
+                compression, compresslevel = file_codecs.parse_archive_codec(archive_codec)
+                tmp_path = archive_path + ".tmp"
+                with zipfile.ZipFile(tmp_path, 'w', compression=compression, compresslevel=compresslevel) as archive:
+                    for file_path, data in results:
+                        archive.writestr(self._split_arcname(file_path), data)
+                os.replace(tmp_path, archive_path)
+            else:
+                for _ in results:
+                    pass
+
+        logger.info(f"Saved {len(dataframe):,} symbols to {len(tasks)} files")
+        if archive_path:
+            logger.info(f"Saved {len(tasks)} files to {archive_path}")
+
+def error_kind(outcome, last_error):
+    """Short error type for the run metrics"""
+    if outcome == rate_control.SERVER_ERROR:
+        return 'connection' if last_error and last_error.startswith('Connection error') else 'http_5xx'
+    if outcome in (rate_control.BACKEND_ERROR, rate_control.TIMEOUT):
+        return outcome.replace('_error', '')
+    if last_error and last_error.startswith('HTTP '):
+        return 'http_other'
+    if last_error == "Unexpected response structure":
+        return 'bad_response'
+    if last_error and last_error.startswith('Unexpected error'):
+        return 'unexpected'
+    return 'api_error'
 
-            for sec_type, type_group in grouped_by_type:
-                file_name = f"{sec_type}.csv"
-                file_path = os.path.join(exchange_dir, file_name)
-                type_group.to_csv(file_path, index=False)
-                logger.info(f"Saved {len(type_group)} symbols to {file_path}")
+def print_resume_hint(output_dir):
+    """Tell the user how to resume from the download journal, if there is one"""
+    journal_path = os.path.join(output_dir, JOURNAL_FILE)
+    if not os.path.exists(journal_path):
+        return
+    try:
+        journal = PageJournal(journal_path)
+        state = journal.open()
+        journal.close()
+    except Exception as e:
+        logger.warning(f"Could not read {journal_path}: {e}")
+        return
+    if state:
+        print(f"\nDownload can be resumed from batch {state['batch']}")
+        print(f"Symbols downloaded so far: {state['total_symbols']:,}")
+        print(f"\nTo resume, run: python {os.path.basename(__file__)} --resume {state['batch']}")
 
 def main():
     """Main function"""
@@ -388,41 +917,147 @@ def main():
     parser = argparse.ArgumentParser(description='DTN IQFeed Symbol Downloader')
     parser.add_argument('--resume', type=int, help='Resume from specific batch number', default=None)
     parser.add_argument('--delay', type=int, help='Delay between batches in seconds', default=2)
+    parser.add_argument('--workers', type=int, help='Download exchange/secType partitions in parallel with this many workers', default=1)
+    parser.add_argument('--rate', type=float, help='Global request rate limit for parallel downloads (requests/second)', default=None)
+    parser.add_argument('--adaptive', action='store_true', help='Pace requests by server feedback instead of a fixed delay/rate (--rate sets the starting rate)')
+    parser.add_argument('--partition-by', choices=['both', 'exchange', 'secType'], help='How to partition parallel downloads', default='both')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Use the pipelined asyncio client')
+    parser.add_argument('--connections', type=int, help='Pooled connection limit for the asyncio client', default=8)
+    parser.add_argument('--base-url', help='DTN API base URL (e.g. a local fake_dtn_server.py)', default='https://ws1.dtn.com')
+    parser.add_argument('--streaming', action='store_true', help='Append pages to the final CSV as they arrive instead of combining in memory')
+    parser.add_argument('--delta', action='store_true', help='Refresh against the previous snapshot and write a changelog')
+    parser.add_argument('--verify-all', action='store_true', help='Delta sync: page through every partition, even those whose first page is unchanged')
+    parser.add_argument('--queue', help='Cooperative download: lease partitions from this shared queue (a directory or redis://host:port/db)', default=None)
+    parser.add_argument('--run-id', help='Queue run shared by the cooperating workers (default: the GitHub Actions run, else the UTC date and hour)', default=None)
+    parser.add_argument('--worker-id', help='Name of this worker in the queue (default: host-pid)', default=None)
+    parser.add_argument('--lease-seconds', type=float, help='Partition lease time; heartbeats renew it every third', default=120)
+    parser.add_argument('--zip', action='store_true', help='Also write the by_exchange split into by_exchange.zip')
+    parser.add_argument('--codec', help='Compression of the by_exchange files: none, gzip[:level] or zstd[:level]', default=file_codecs.DEFAULT_CODEC)
+    parser.add_argument('--archive-codec', help='Zip method of by_exchange.zip: stored, deflate[:level], bzip2[:level] or lzma', default=file_codecs.DEFAULT_ARCHIVE_CODEC)
+    parser.add_argument('--index', action='store_true', help='Also build the memory-mapped symbol lookup index')
+    parser.add_argument('--chains', action='store_true', help='Also parse futures/options into per-root chain tables')
+    parser.add_argument('--sqlite', action='store_true', help='Also load the symbols into an indexed SQLite database with full-text search')
+    parser.add_argument('--parquet', action='store_true', help='Also write a Parquet dataset partitioned by exchange/securityType (needs pyarrow)')
+    parser.add_argument('--snapshot', action='store_true', help='Also store the result in the content-addressed snapshot store (<output dir>/snapshots)')
+    parser.add_argument('--exchanges', help='Filtered download: only these comma-separated exchanges', default=None)
+    parser.add_argument('--sec-types', help='Filtered download: only these comma-separated security types', default=None)
+    parser.add_argument('--no-options', action='store_true', help='Filtered download: ask the server to leave out options')
+    parser.add_argument('--no-spreads', action='store_true', help='Filtered download: ask the server to leave out spreads')
+    parser.add_argument('--front-only', action='store_true', help='Filtered download: only front-month futures')
+    parser.add_argument('--filter-config', help='JSON file with exchanges/security_types/no_options/no_spreads/only_front', default=None)
+    parser.add_argument('--report', help=f'JSON run report with phase timings and counters (default: <output dir>/{REPORT_FILE})', default=None)
+    parser.add_argument('--prometheus', help='Also write the run metrics to this file in the Prometheus text format', default=None)
     args = parser.parse_args()
     
-    downloader = DTNCorrectAPIDownloader()
+    # A filtered download gets its own output directory, keyed by the filter
+    query_filter = QueryFilter.from_args(args)
+    if query_filter.partitioned and args.resume:
+        # --resume continues the single unfiltered cursor of the serial journal, which would
+        # download every exchange and security type into the filtered directory
+        parser.error("--resume cannot be combined with --exchanges/--sec-types (or a filter config with them); "
+                     "run the filtered download again without --resume")
+    if query_filter:
+        downloader = DTNCorrectAPIDownloader(output_dir=query_filter.output_dir(), base_url=args.base_url)
+        downloader.query_filter = query_filter
+        query_filter.save(downloader.output_dir)
+        logger.info(f"Filtered download ({query_filter.describe()}) into {downloader.output_dir}")
+    else:
+        downloader = DTNCorrectAPIDownloader(base_url=args.base_url)
+    # Exchange/secType filters are pushed to the server as partition cursors
+    partitioned = args.workers > 1 or query_filter.partitioned
+    if args.adaptive:
+        downloader.rate_controller = AdaptiveRateController(initial_rate=args.rate or 2.0,
+                                                            max_concurrency=max(args.workers, args.connections if args.use_async else 1))
+    metrics = downloader.metrics
+    mode = ('async' if args.use_async else 'delta' if args.delta else 'cooperative' if args.queue else
+            'parallel' if partitioned and not args.resume else 'serial')
+    metrics.set_info(mode=mode + ('-streaming' if args.streaming and mode in ('parallel', 'serial') else ''),
+                     adaptive=args.adaptive, success=False)
+    if query_filter:
+        metrics.set_info(query_filter=query_filter.to_dict())
+    result_df = None
     
     try:
         # Download all symbols
-        result_df = downloader.download_all_symbols(delay=args.delay, resume_from_batch=args.resume)
+        if args.use_async:
+            import asyncio
+            from dtn_async_downloader import AsyncDTNDownloader
+            rate_controller = downloader.rate_controller
+            downloader = AsyncDTNDownloader(output_dir=downloader.output_dir, base_url=args.base_url,
+                                            max_connections=args.connections)
+            downloader.rate_controller = rate_controller
+            downloader.metrics = metrics
+            downloader.query_filter = query_filter or None
+            partition_by = args.partition_by if partitioned else None
+            with metrics.phase('download'):
+                result_df = asyncio.run(downloader.download_all_symbols(delay=args.delay, partition_by=partition_by,
+                                                                        resume=bool(args.resume)))
+        elif args.delta:
+            from delta_sync import DeltaSync
+            rate = args.rate or (max(args.workers, 1) / args.delay if args.delay else None)
+            with metrics.phase('download'):
+                result_df = DeltaSync(downloader, trust_first_page=not args.verify_all).run(workers=max(args.workers, 1), rate=rate)
+        elif args.queue:
+            from partition_queue import CooperativeDownload, open_queue
+            rate = args.rate or (max(args.workers, 1) / args.delay if args.delay else None)
+            cooperative = CooperativeDownload(downloader, open_queue(args.queue, args.run_id), worker_id=args.worker_id,
+                                              threads=args.workers, lease_seconds=args.lease_seconds)
+            metrics.set_info(worker_id=cooperative.worker_id)
+            with metrics.phase('download'):
+                result_df = cooperative.run(rate=rate)
+            metrics.set_info(partitions_done=cooperative.partitions_done, merged_by=cooperative.merged_by)
+            if result_df is None and cooperative.merged_by not in (None, cooperative.worker_id):
+                # Another worker merges; this one is done once its partitions are in the queue
+                metrics.set_info(success=True)
+                print(f"\nPartitions finished ({cooperative.partitions_done} by this worker), merged by {cooperative.merged_by}")
+                return
+        elif partitioned and not args.resume:
+            # Each worker honours --delay on its own cursor unless a global rate is given
+            rate = args.rate or (args.workers / args.delay if args.delay else None)
+            with metrics.phase('download'):
+                result_df = downloader.download_all_symbols_parallel(workers=args.workers, rate=rate,
+                                                                     partition_by=args.partition_by,
+                                                                     streaming=args.streaming)
+        else:
+            with metrics.phase('download'):
+                result_df = downloader.download_all_symbols(delay=args.delay, resume_from_batch=args.resume,
+                                                            streaming=args.streaming)
         
         if result_df is not None:
             print(f"\n{'='*80}")
             print(f"{'DOWNLOAD COMPLETE!':^80}")
             print(f"{'='*80}")
             
+            # Statistics were collected while the output was written; rescan only if they are missing
+            stats = downloader.symbol_stats
+            if stats is None:
+                stats = SymbolStats.from_csv(result_df) if isinstance(result_df, str) else SymbolStats.from_frame(result_df)
+            summary = stats.summary()
+            metrics.set_info(total_symbols=summary['total'],
+                             security_types=summary['security_types'].to_dict() if summary['security_types'] is not None else {},
+                             exchanges=summary['exchanges'].to_dict() if summary['exchanges'] is not None else {})
+            
             # Summary statistics
             print(f"\nFINAL STATISTICS:")
             print(f"-" * 40)
-            print(f"Total unique symbols: {len(result_df):,}")
-            print(f"Data columns: {', '.join(result_df.columns)}")
+            print(f"Total unique symbols: {summary['total']:,}")
+            print(f"Data columns: {', '.join(summary['columns'])}")
             
             # Detailed breakdown by security type
-            if 'securityType' in result_df.columns:
+            if summary['security_types'] is not None:
                 print(f"\nBREAKDOWN BY SECURITY TYPE:")
                 print(f"-" * 40)
-                sec_types = result_df['securityType'].value_counts()
-                for sec_type, count in sec_types.items():
-                    percentage = (count / len(result_df)) * 100
+                for sec_type, count in summary['security_types'].items():
+                    percentage = (count / summary['total']) * 100
                     print(f"{sec_type:<30} {count:>8,} ({percentage:>5.1f}%)")
             
             # Detailed breakdown by exchange
-            if 'exchange' in result_df.columns:
+            if summary['exchanges'] is not None:
                 print(f"\nBREAKDOWN BY EXCHANGE:")
                 print(f"-" * 40)
-                exchanges = result_df['exchange'].value_counts()
+                exchanges = summary['exchanges']
                 for exchange, count in exchanges.head(20).items():  # Top 20 exchanges
-                    percentage = (count / len(result_df)) * 100
+                    percentage = (count / summary['total']) * 100
                     print(f"{exchange:<30} {count:>8,} ({percentage:>5.1f}%)")
                 
                 if len(exchanges) > 20:
@@ -431,16 +1066,71 @@ def main():
             # Sample data
             print(f"\nSAMPLE DATA (First 10 symbols):")
             print(f"-" * 80)
-            sample_cols = ['symbol', 'description', 'exchange']
-            display_cols = [col for col in sample_cols if col in result_df.columns]
-            print(result_df[display_cols].head(10).to_string(index=False))
+            print(summary['sample'].to_string(index=False))
             
             # *** ADD THIS PART ***
             print(f"\nSPLITTING SYMBOLS:")
             print(f"-" * 40)
-            downloader.split_symbols_by_exchange_and_type(result_df)
+            archive_path = os.path.join(downloader.output_dir, "by_exchange.zip") if args.zip else None
+            with metrics.phase('split'):
+                if isinstance(result_df, str):
+                    downloader.split_csv_by_exchange_and_type(result_df, archive_path=archive_path, codec=args.codec,
+                                                              archive_codec=args.archive_codec)
+                else:
+                    downloader.split_symbols_by_exchange_and_type(result_df, archive_path=archive_path, codec=args.codec,
+                                                                  archive_codec=args.archive_codec)
             print(f"Splitting complete.")
             # *** END OF ADDED PART ***
+            
+            if args.parquet:
+                from symbol_io import write_parquet_dataset
+                print(f"\nWRITING PARQUET DATASET:")
+                print(f"-" * 40)
+                with metrics.phase('parquet'):
+                    dataset_dir = write_parquet_dataset(result_df, downloader.output_dir)
+                print(f"Parquet dataset: {dataset_dir}")
+            
+            if args.index:
+                from symbol_index import INDEX_DIR, SymbolIndex
+                print(f"\nBUILDING SYMBOL INDEX:")
+                print(f"-" * 40)
+                index_dir = os.path.join(downloader.output_dir, INDEX_DIR)
+                with metrics.phase('index'):
+                    index_df = symbol_schema.read_csv(result_df) if isinstance(result_df, str) else result_df
+                    SymbolIndex.from_dataframe(index_df).save(index_dir)
+                print(f"Symbol index: {index_dir}")
+
+            if args.chains:
+                from instrument_chains import CHAINS_DIR, InstrumentChains
+                print(f"\nBUILDING INSTRUMENT CHAINS:")
+                print(f"-" * 40)
+                chains_dir = os.path.join(downloader.output_dir, CHAINS_DIR)
+                with metrics.phase('chains'):
+                    chains = InstrumentChains.from_csv(downloader.output_dir) if isinstance(result_df, str) \
+                        else InstrumentChains.from_dataframe(result_df)
+                    chains.save(chains_dir)
+                metrics.set_info(instruments={kind: len(table) for kind, table in chains.tables.items()})
+                print(f"Instrument chains: {chains_dir}")
+
+            if args.sqlite:
+                from symbol_db import DB_FILE, build
+                print(f"\nLOADING SQLITE STORE:")
+                print(f"-" * 40)
+                db_path = os.path.join(downloader.output_dir, DB_FILE)
+                with metrics.phase('sqlite'):
+                    build(result_df, db_path)
+                print(f"SQLite store: {db_path} ({os.path.getsize(db_path) / (1024 * 1024):.2f} MB)")
+
+            if args.snapshot:
+                from snapshot_store import SNAPSHOT_DIR, SnapshotStore
+                print(f"\nSTORING SNAPSHOT:")
+                print(f"-" * 40)
+                store = SnapshotStore(os.path.join(downloader.output_dir, SNAPSHOT_DIR))
+                with metrics.phase('snapshot'):
+                    snapshot_df = symbol_schema.read_csv(result_df) if isinstance(result_df, str) else result_df
+                    manifest = store.commit(snapshot_df)
+                print(f"Snapshot {manifest['id']}: {len(manifest['partitions'])} partitions, "
+                      f"store size {store.size() / (1024 * 1024):.2f} MB")
 
             # File information
             print(f"\nFILE INFORMATION:")
@@ -451,6 +1141,7 @@ def main():
             # Check file size
             latest_file = os.path.join(downloader.output_dir, "all_symbols_latest.csv")
             if os.path.exists(latest_file):
+                metrics.set_info(output_bytes=os.path.getsize(latest_file))
                 file_size = os.path.getsize(latest_file) / (1024 * 1024)
                 print(f"File size: {file_size:.2f} MB")
             
@@ -459,15 +1150,15 @@ def main():
             print(f"-" * 40)
             
             # Count symbols by type
-            if 'symbol' in result_df.columns:
-                futures = result_df[result_df['symbol'].str.startswith('@')].shape[0]
-                options = result_df[result_df['symbol'].str.contains('[CP]\\d', regex=True)].shape[0]
-                stocks = result_df[~result_df['symbol'].str.startswith('@')].shape[0] - options
-                
-                print(f"Futures symbols (@): {futures:,}")
-                print(f"Options symbols: {options:,}")
-                print(f"Other symbols: {stocks:,}")
+            if summary['futures'] is not None:
+                # Every @ symbol, as this figure always counted; the lines below split it
+                print(f"Futures symbols (@): {summary['futures'] + summary['futures_options']:,}")
+                print(f"  Futures (@, excluding futures options): {summary['futures']:,}")
+                print(f"  Futures options: {summary['futures_options']:,}")
+                print(f"Options symbols (including futures options): {summary['options']:,}")
+                print(f"Other symbols: {summary['others']:,}")
             
+            metrics.set_info(success=True)
             print(f"\n{'='*80}")
             print("Download completed successfully!")
             print(f"{'='*80}")
@@ -478,16 +1169,7 @@ def main():
             print("="*80)
             
             # Check if we can resume
-            state_file = os.path.join(downloader.output_dir, "download_state.json")
-            if os.path.exists(state_file):
-                try:
-                    with open(state_file, 'r') as f:
-                        state = json.load(f)
-                        print(f"\nDownload can be resumed from batch {state['batch']}")
-                        print(f"Symbols downloaded so far: {state['total_symbols']:,}")
-                        print(f"\nTo resume, run: python {os.path.basename(__file__)} --resume {state['batch']}")
-                except:
-                    pass
+            print_resume_hint(downloader.output_dir)
     
     except KeyboardInterrupt:
         logger.info("\nDownload interrupted by user")
@@ -496,16 +1178,7 @@ def main():
         print("="*80)
         
         # Check if we can resume
-        state_file = os.path.join(downloader.output_dir, "download_state.json")
-        if os.path.exists(state_file):
-            try:
-                with open(state_file, 'r') as f:
-                    state = json.load(f)
-                    print(f"\nDownload can be resumed from batch {state['batch']}")
-                    print(f"Symbols downloaded so far: {state['total_symbols']:,}")
-                    print(f"\nTo resume, run: python {os.path.basename(__file__)} --resume {state['batch']}")
-            except:
-                pass
+        print_resume_hint(downloader.output_dir)
                 
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
@@ -519,6 +1192,12 @@ def main():
         if result_df is not None and len(result_df) > 0:
             downloader.cleanup_batch_files()
             print("Batch files cleaned up.")
+        
+        # The run report is written for failed runs too, with success false
+        report_path = metrics.write_report(args.report or os.path.join(downloader.output_dir, REPORT_FILE))
+        print(f"Run report: {report_path}")
+        if args.prometheus:
+            print(f"Prometheus metrics: {metrics.write_prometheus(args.prometheus)}")
 
 
 
@@ -534,6 +1213,7 @@ if __name__ == "__main__":
     print("  Normal run: python script.py")
     print("  Resume:     python script.py --resume 41")
     print("  Custom delay: python script.py --delay 5")
+    print("  Parallel:   python script.py --workers 8")
     print("\nStarting download...\n")
     
     main()
\ No newline at end of file
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the DTN symbol search API
+Serves GetSymbolCategories and QuerySymbolsDD over a synthetic symbol universe so the
+downloaders can be exercised and benchmarked without hitting ws1.dtn.com. Paging follows the real
+API: at most 4998 symbols per page, an opaque nextKey cursor tied to the query, hasMore and
+totalFound. Faults can be injected: random 503s, "backend search database" errors and dropped
+connections, a request rate capacity beyond which every request fails, and latency that grows
+with the number of requests in flight. The noOptions, noSpreads and onlyFront flags are honoured
+(front month = the first future listed per exchange and root).
+"""
+
+import base64
+
+import json
+import random
+import string
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+EXCHANGES = ["CME", "CBOT", "NYMEX", "COMEX", "NYSE", "NASDAQ", "EUREX", "ICEEU", "ICEFU", "OPRA"]
+
+# (securityType, share of the universe)
+SECURITY_TYPES = [
+    ("FOPTION", 0.50),
+    ("SPREAD", 0.12),
+    ("EQUITY", 0.10),
+    ("FUTURE", 0.07),
+    ("INDEX", 0.05),
+    ("COMBINED_FOPTION", 0.04),
+    ("GENERICRPT", 0.04),
+    ("FOREX", 0.03),
+    ("BONDS", 0.03),
+    ("ICSPREAD", 0.02),
+]
+
+MONTH_CODES = "FGHJKMNQUVXZ"
+
+# Security types dropped by the noOptions and noSpreads flags
+OPTION_TYPES = {"FOPTION", "COMBINED_FOPTION", "OPTION"}
+SPREAD_TYPES = {"SPREAD", "ICSPREAD"}
+SEARCH_FLAGS = ("noOptions", "noSpreads", "onlyFront")
+
+BACKEND_ERROR = "Unable to connect to the backend search database, please try again"
+MAX_LIMIT = 4998
+
+
+def _root(n):
+    """Encode an integer as an upper-case ticker root"""
+    letters = string.ascii_uppercase
+    root = ""
+    n += 1
+    while n:
+        n, rem = divmod(n - 1, 26)
+        root = letters[rem] + root
+    return root
+
+
+def generate_universe(size=100000, seed=42):
+    """Generate a deterministic synthetic universe of symbol records"""
+    rng = random.Random(seed)
+    type_names = [name for name, _ in SECURITY_TYPES]
+    type_weights = [weight for _, weight in SECURITY_TYPES]
+
+    symbols = []
+    seen = set()
+    for i in range(size):
+        sec_type = rng.choices(type_names, type_weights)[0]
+        exchange = rng.choice(EXCHANGES)
+        root = _root(i // 40)
+        month = MONTH_CODES[i % 12]
+        year = 25 + (i // 12) % 3
+        suffix = i % 40
+
+        if sec_type == "FOPTION":
+            side = "C" if i % 2 else "P"
+            symbol = f"@{root}{month}{year}{side}{1000 + suffix * 25}"
+            description = f"{root} FUTURE OPTION {month}{year} {'Call' if side == 'C' else 'Put'} {1000 + suffix * 25}"
+        elif sec_type == "FUTURE":
+            symbol = f"@{root}{month}{year}" if suffix else f"@{root}#"
+            description = f"{root} FUTURE {month}{year}" if suffix else f"{root} FUTURE Continuous"
+        elif sec_type in ("SPREAD", "ICSPREAD"):
+            symbol = f"@{root}{month}{year}-@{root}{MONTH_CODES[(i + 1) % 12]}{year}.{suffix}"
+            description = f"{root} CALENDAR SPREAD {suffix}"
+        elif sec_type == "EQUITY":
+            symbol = f"{root}{_root(suffix)}"
+            description = f"{root} HOLDINGS INC CLASS {_root(suffix)}"
+        else:
+            symbol = f"{root}.{sec_type[:2]}{suffix}"
+            description = f"{root} {sec_type.title()} {suffix}"
+
+        # Keep symbols unique, like the real universe
+        if symbol in seen:
+            symbol = f"{symbol}.{i}"
+        seen.add(symbol)
+
+        symbols.append({
+            "symbol": symbol,
+            "description": description,
+            "exchange": exchange,
+            "listedMarket": exchange,
+            "securityType": sec_type,
+        })
+    return symbols
+
+
+class FakeDTNServer(ThreadingHTTPServer):
+    """HTTP server holding the synthetic universe and response settings"""
+    daemon_threads = True
+
+    def __init__(self, address, universe, latency=0.0, error_rate=0.0, backend_error_rate=0.0, capacity=None,
+                 queue_latency=0.0, drop_rate=0.0, seed=0):
+        super().__init__(address, FakeDTNHandler)
+        self.universe = universe
+        self.latency = latency
+        # Fault injection: share of search requests answered with a 503 or the backend error or
+        # whose connection is closed without a response, requests/second above which searches
+        # fail with the backend error, and extra latency per other request in flight
+        self.error_rate = error_rate
+        self.backend_error_rate = backend_error_rate
+        self.drop_rate = drop_rate
+        self.capacity = capacity
+        self.queue_latency = queue_latency
+        self.request_count = 0
+        self.fault_counts = {'server_error': 0, 'backend_error': 0, 'over_capacity': 0, 'dropped': 0}
+        self.in_flight = 0
+        self._recent = deque()
+        self._rng = random.Random(seed)
+        self._count_lock = threading.Lock()
+        self._partitions = {}
+        self._front = set()
+        front_roots = set()
+        for record in universe:
+            key = (record["exchange"], record["securityType"])
+            self._partitions.setdefault(key, []).append(record)
+            if record["securityType"] == "FUTURE":
+                root = (record["exchange"], record["description"].split()[0])
+                if root not in front_roots:
+                    front_roots.add(root)
+                    self._front.add(record["symbol"])
+        self._query_cache = {}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def query(self, exchange=None, sec_type=None, flags=()):
+        """Return the records matching an exchange/secType filter (None means all) and search flags"""
+        flags = frozenset(flags)
+        if exchange is None and sec_type is None and not flags:
+            return self.universe
+        key = (exchange, sec_type, flags)
+        with self._count_lock:
+            cached = self._query_cache.get(key)
+        if cached is not None:
+            return cached
+        matches = []
+        for (record_exchange, record_type), records in self._partitions.items():
+            if exchange is not None and record_exchange != exchange:
+                continue
+            if sec_type is not None and record_type != sec_type:
+                continue
+            if "noOptions" in flags and record_type in OPTION_TYPES:
+                continue
+            if "noSpreads" in flags and record_type in SPREAD_TYPES:
+                continue
+            if "onlyFront" in flags and record_type == "FUTURE":
+                matches.extend(record for record in records if record["symbol"] in self._front)
+                continue
+            matches.extend(records)
+        with self._count_lock:
+            self._query_cache[key] = matches
+        return matches
+
+    def reset_stats(self):
+        with self._count_lock:
+            self.request_count = 0
+            self.fault_counts = dict.fromkeys(self.fault_counts, 0)
+            self._recent.clear()
+
+    def admit(self):
+        """Count a search request and decide its fault (None or a fault_counts key)"""
+        with self._count_lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            while self._recent and self._recent[0] <= now - 1.0:
+                self._recent.popleft()
+            if self.capacity and len(self._recent) > self.capacity:
+                fault = 'over_capacity'
+            elif self._rng.random() < self.error_rate:
+                fault = 'server_error'
+            elif self._rng.random() < self.backend_error_rate:
+                fault = 'backend_error'
+            elif self._rng.random() < self.drop_rate:
+                fault = 'dropped'
+            else:
+                fault = None
+            if fault:
+                self.fault_counts[fault] += 1
+            return fault
+
+
+def encode_next_key(offset, exchange, sec_type, flags=()):
+    """Opaque cursor for the page starting at offset, only valid for the same filters"""
+    token = f"{offset}|{exchange or ''}|{sec_type or ''}|{','.join(sorted(flags))}".encode("utf-8")
+    return base64.urlsafe_b64encode(token).decode("ascii").rstrip("=")
+
+
+def decode_next_key(next_key, exchange, sec_type, flags=()):
+    """Offset encoded in a cursor, or None if it is malformed or was issued for other filters"""
+    try:
+        token = base64.urlsafe_b64decode(next_key + "=" * (-len(next_key) % 4)).decode("utf-8")
+        offset, key_exchange, key_type, key_flags = token.split("|")
+        if (key_exchange != (exchange or '') or key_type != (sec_type or '')
+                or key_flags != ','.join(sorted(flags))):
+            return None
+        return int(offset)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class FakeDTNHandler(BaseHTTPRequestHandler):
+    """Implements the subset of the DTN symbol search API used by the downloaders"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server._count_lock:
+            server.request_count += 1
+            server.in_flight += 1
+            others = server.in_flight - 1
+        try:
+            delay = server.latency + server.queue_latency * others
+            if delay:
+                time.sleep(delay)
+            self._handle()
+        finally:
+            with server._count_lock:
+                server.in_flight -= 1
+
+    def _handle(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path.endswith("/GetSymbolCategories"):
+            self._send_json({"data": {
+                "exchange": sorted({record["exchange"] for record in server.universe}),
+                "securityType": sorted({record["securityType"] for record in server.universe}),
+            }})
+        elif url.path.endswith("/QuerySymbolsDD"):
+            fault = server.admit()
+            if fault == 'dropped':
+                self.close_connection = True
+                return
+            if fault == 'server_error':
+                self._send_json({"errors": ["Service Unavailable"]}, status=503)
+                return
+            if fault:
+                self._send_json({"errors": [BACKEND_ERROR]})
+                return
+
+            exchange, sec_type = params.get("exchange"), params.get("secType")
+            flags = [flag for flag in SEARCH_FLAGS if params.get(flag) == "true"]
+            offset = 0
+            if params.get("nextKey"):
+                offset = decode_next_key(params["nextKey"], exchange, sec_type, flags)
+                if offset is None:
+                    self._send_json({"errors": ["Invalid nextKey"]})
+                    return
+            limit = max(1, min(int(params.get("limit") or MAX_LIMIT), MAX_LIMIT))
+            records = server.query(exchange, sec_type, flags)
+            page = records[offset:offset + limit]
+            has_more = offset + limit < len(records)
+            self._send_json({"data": {
+                "symbolList": page,
+                "totalFound": len(records),
+                "hasMore": has_more,
+                "nextKey": encode_next_key(offset + limit, exchange, sec_type, flags) if has_more else None,
+            }})
+        else:
+            self._send_json({"errors": [f"Unknown endpoint {url.path}"]}, status=404)
+
+
+def start_server(size=100000, latency=0.0, host="127.0.0.1", port=0, seed=42, **faults):
+    """Start a fake DTN server on a background thread and return it
+
+    faults are passed on to FakeDTNServer (error_rate, backend_error_rate, drop_rate, capacity,
+    queue_latency).
+    """
+    server = FakeDTNServer((host, port), generate_universe(size, seed), latency=latency, **faults)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Local fake DTN symbol search server')
+    parser.add_argument('--port', type=int, help='Port to listen on', default=8765)
+    parser.add_argument('--symbols', type=int, help='Size of the synthetic universe', default=100000)
+    parser.add_argument('--latency', type=float, help='Added latency per request in seconds', default=0.0)
+    parser.add_argument('--error-rate', type=float, help='Share of searches answered with HTTP 503', default=0.0)
+    parser.add_argument('--backend-error-rate', type=float, help='Share of searches answered with the backend database error', default=0.0)
+    parser.add_argument('--drop-rate', type=float, help='Share of searches whose connection is closed without a response', default=0.0)
+    parser.add_argument('--capacity', type=float, help='Searches/second above which every search gets the backend error', default=None)
+    parser.add_argument('--queue-latency', type=float, help='Extra latency per concurrent request in seconds', default=0.0)
+    args = parser.parse_args()
+
+    server = FakeDTNServer(("127.0.0.1", args.port), generate_universe(args.symbols), latency=args.latency,
+                           error_rate=args.error_rate, backend_error_rate=args.backend_error_rate,
+                           drop_rate=args.drop_rate, capacity=args.capacity, queue_latency=args.queue_latency)
+    print(f"Serving {args.symbols:,} synthetic symbols on {server.base_url}")
+    print(f"Run the downloader with: python dtn_symbol_downloader.py --base-url {server.base_url} --delay 0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compression codecs for the split CSV outputs and the by_exchange.zip archive
+Split files can be written plain, gzip or zstd compressed (zstd needs the zstandard package).
+Every write is compressed as one complete gzip member / zstd frame, so files that are appended to
+chunk by chunk stay valid and are read back as one stream. The archive can use any zipfile
+method (stored, deflate, bzip2, lzma) at a chosen level. Codecs are given as "name[:level]",
+e.g. "zstd:3", "gzip:1" or "deflate:6".
+"""
+
+import gzip
+import zipfile
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed for the zstd codec
+    zstandard = None
+
+# Codec -> file suffix and default level
+CODECS = {'none': ('', None), 'gzip': ('.gz', 6), 'zstd': ('.zst', 3)}
+ARCHIVE_CODECS = {'stored': (zipfile.ZIP_STORED, None), 'deflate': (zipfile.ZIP_DEFLATED, 6),
+                  'bzip2': (zipfile.ZIP_BZIP2, 9), 'lzma': (zipfile.ZIP_LZMA, None)}
+
+DEFAULT_CODEC = 'none'
+DEFAULT_ARCHIVE_CODEC = 'deflate:6'
+
+
+def _parse(spec, codecs, kind):
+    name, _, level = str(spec).partition(':')
+    name = name.strip().lower()
+    if name not in codecs:
+        raise ValueError(f"Unknown {kind} codec {name!r}, choose from {', '.join(codecs)}")
+    return name, int(level) if level else codecs[name][1]
+
+
+def parse_codec(spec=DEFAULT_CODEC):
+    """(name, level) for a file codec spec such as "zstd:3" """
+    name, level = _parse(spec, CODECS, 'file')
+    if name == 'zstd' and zstandard is None:
+        raise ImportError("The zstd codec needs zstandard: pip install zstandard")
+    return name, level
+
+
+def parse_archive_codec(spec=DEFAULT_ARCHIVE_CODEC):
+    """(zipfile compression, compresslevel) for an archive codec spec such as "deflate:1" """
+    name, level = _parse(spec, ARCHIVE_CODECS, 'archive')
+    return ARCHIVE_CODECS[name][0], level
+
+
+def suffix(spec):
+    return CODECS[parse_codec(spec)[0]][0]
+
+
+def codec_from_path(path):
+    """Codec name of a file from its suffix"""
+    for name, (codec_suffix, _) in CODECS.items():
+        if codec_suffix and str(path).endswith(codec_suffix):
+            return name
+    return 'none'
+
+
+def compress(data, spec):
+    """data as one self-contained gzip member / zstd frame (unchanged for 'none')"""
+    name, level = parse_codec(spec)
+    if name == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if name == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return data
+
+
+def open_reader(fileobj, name):
+    """Decompressing binary stream over an open binary file, reading across members/frames"""
+    if name == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if name == 'zstd':
+        if zstandard is None:
+            raise ImportError("Reading .zst files needs zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+    return fileobj
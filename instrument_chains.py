@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Structured futures and option fields parsed from IQFeed symbols, and per-root chain indexes
+parse_instruments() decomposes the whole symbol column in a few vectorized regex passes
+(pyarrow.compute.extract_regex, pandas str.extract without pyarrow):
+
+    @ESH25        future          root ES, month code H, year 2025
+    @ES#, @ES#C   future          root ES, continuous (front month / back-adjusted)
+    @ESH25C5000   future option   root ES, contract month H25, call, strike 5000
+    AAPL2517A190  equity option   root AAPL, expiry 2025-01-17, call (A-L calls, M-X puts), strike 190
+
+Futures and futures options have no expiry day in the symbol; their expiry is the first day of
+the contract month. InstrumentChains keeps futures, futures options and equity options as three
+tables sorted by root and expiry with the row range of every root, so "all NQ futures" or
+"AAPL options expiring 2025-01-17" is a dict lookup plus a binary search instead of a regex
+scan of the universe.
+
+    python instrument_chains.py build
+    python instrument_chains.py futures NQ
+    python instrument_chains.py options AAPL --expiry 2025-01-17 --type C
+"""
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # optional dependency, pandas str.extract is used when it is missing
+    pa = None
+
+CHAINS_DIR = "instrument_chains"
+FORMAT_VERSION = 1
+
+MONTH_CODES = "FGHJKMNQUVXZ"
+# Equity option month letters: A-L are January-December calls, M-X January-December puts
+EQUITY_OPTION_MONTHS = "ABCDEFGHIJKLMNOPQRSTUVWX"
+
+# Security types each pattern is tried on (by symbol prefix when there is no securityType column)
+FUTURE_TYPES = {"FUTURE"}
+FUTURE_OPTION_TYPES = {"FOPTION", "COMBINED_FOPTION"}
+EQUITY_OPTION_TYPES = {"IEOPTION", "OPTION"}
+FUTURE_PREFIX = "@"
+
+FUTURE_PATTERN = r"^@?(?P<root>[A-Z0-9]+?)(?P<month>[FGHJKMNQUVXZ])(?P<year>\d{2})$"
+CONTINUOUS_PATTERN = r"^@?(?P<root>[A-Z0-9]+)#C?$"
+FUTURE_OPTION_PATTERN = r"^@?(?P<root>[A-Z0-9]+?)(?P<month>[FGHJKMNQUVXZ])(?P<year>\d{2})(?P<side>[CP])(?P<strike>\d+(?:\.\d+)?)$"
+EQUITY_OPTION_PATTERN = r"^(?P<root>[A-Z][A-Z0-9.]*?)(?P<year>\d{2})(?P<day>\d{2})(?P<month>[A-X])(?P<strike>\d+(?:\.\d+)?)$"
+
+KINDS = ["future", "future_option", "equity_option"]
+INSTRUMENT_COLUMNS = ["kind", "root", "expiry", "strike", "option_type", "month_code", "year", "continuous"]
+# Columns of the source table carried into the chain tables
+CARRIED_COLUMNS = ["symbol", "description", "exchange", "securityType"]
+
+
+def _symbol_array(symbols):
+    """The symbol column as a pyarrow array (zero-copy for pyarrow-backed strings), or an object Series"""
+    if pa is None:
+        return pd.Series(symbols, dtype=object).reset_index(drop=True)
+    try:
+        array = pa.array(symbols, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        array = pa.array(pd.Series(symbols).astype(str), type=pa.string())
+    return array.combine_chunks() if isinstance(array, pa.ChunkedArray) else array
+
+
+def _extract(symbols, candidates, pattern, numeric=('year', 'day', 'strike')):
+    """
+    (positions, groups) of the candidate symbols matching pattern: their row positions and a
+    numpy array per named group, with the numeric groups as float64. Only candidates are scanned.
+    """
+    positions = np.flatnonzero(candidates)
+    if not len(positions):
+        return positions, {}
+    if pa is not None:
+        struct = pc.extract_regex(symbols.filter(pa.array(candidates)), pattern)
+        valid = struct.is_valid()
+        struct = struct.filter(valid)
+        groups = {}
+        for i in range(struct.type.num_fields):
+            name, field = struct.type.field(i).name, struct.field(i)
+            if name in numeric:
+                field = pc.cast(field, pa.float64())
+            groups[name] = field.to_numpy(zero_copy_only=False)
+        return positions[valid.to_numpy(zero_copy_only=False)], groups
+    extracted = symbols.iloc[positions].str.extract(pattern)
+    valid = extracted['root'].notna().to_numpy()
+    groups = {name: (pd.to_numeric(values[valid]) if name in numeric else values[valid]).to_numpy()
+              for name, values in extracted.items()}
+    return positions[valid], groups
+
+
+def _month_start(years, months):
+    """datetime64[ns] first days of the given years and 1-based months"""
+    return ((np.asarray(years, dtype=np.int64) - 1970) * 12 + months - 1).astype('datetime64[M]').astype('datetime64[ns]')
+
+
+def parse_instruments(df):
+    """
+    Structured instrument columns (INSTRUMENT_COLUMNS) for a DataFrame with a symbol column,
+    index-aligned with it. kind is null for symbols that are not futures or options. The
+    securityType column, when present, decides which patterns a row is matched against.
+    """
+    n = len(df)
+    symbols = _symbol_array(df['symbol'])
+    prefixed = df['symbol'].astype(str).str.startswith(FUTURE_PREFIX).to_numpy(dtype=bool)
+    if 'securityType' in df.columns:
+        type_rows = lambda types, _: df['securityType'].isin(types).to_numpy(dtype=bool)
+    else:
+        type_rows = lambda _, future_prefixed: prefixed if future_prefixed else ~prefixed
+
+    # Categoricals are assembled from codes, -1 meaning null
+    kind = np.full(n, -1, dtype=np.int8)
+    option_type = np.full(n, -1, dtype=np.int8)
+    month_code = np.full(n, -1, dtype=np.int8)
+    root = np.full(n, None, dtype=object)
+    year = np.zeros(n, dtype=np.int16)
+    strike = np.full(n, np.nan)
+    expiry = np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]')
+    continuous = np.zeros(n, dtype=bool)
+    month_index = pd.Index(list(MONTH_CODES))
+
+    # Options first, so a futures option is never taken for its underlying future
+    rows, groups = _extract(symbols, type_rows(FUTURE_OPTION_TYPES, True), FUTURE_OPTION_PATTERN)
+    if len(rows):
+        kind[rows] = KINDS.index("future_option")
+        root[rows] = groups['root']
+        option_type[rows] = np.where(groups['side'] == "C", 0, 1)
+        month_code[rows] = month_index.get_indexer(groups['month'])
+        year[rows] = 2000 + groups['year']
+        strike[rows] = groups['strike']
+        expiry[rows] = _month_start(year[rows], month_code[rows] + 1)
+
+    rows, groups = _extract(symbols, type_rows(EQUITY_OPTION_TYPES, False) & (kind < 0), EQUITY_OPTION_PATTERN)
+    if len(rows):
+        kind[rows] = KINDS.index("equity_option")
+        root[rows] = groups['root']
+        letters = pd.Index(list(EQUITY_OPTION_MONTHS)).get_indexer(groups['month'])
+        option_type[rows] = letters // 12
+        strike[rows] = groups['strike']
+        expiry[rows] = (_month_start(2000 + groups['year'], letters % 12 + 1)
+                        + (groups['day'].astype(np.int64) - 1).astype('timedelta64[D]'))
+
+    future_rows = type_rows(FUTURE_TYPES, True)
+    rows, groups = _extract(symbols, future_rows & (kind < 0), FUTURE_PATTERN)
+    if len(rows):
+        kind[rows] = KINDS.index("future")
+        root[rows] = groups['root']
+        month_code[rows] = month_index.get_indexer(groups['month'])
+        year[rows] = 2000 + groups['year']
+        expiry[rows] = _month_start(year[rows], month_code[rows] + 1)
+
+    rows, groups = _extract(symbols, future_rows & (kind < 0), CONTINUOUS_PATTERN)
+    if len(rows):
+        kind[rows] = KINDS.index("future")
+        root[rows] = groups['root']
+        continuous[rows] = True
+
+    return pd.DataFrame({
+        'kind': pd.Categorical.from_codes(kind, categories=KINDS),
+        'root': pd.Categorical(root),
+        'expiry': expiry,
+        'strike': strike,
+        'option_type': pd.Categorical.from_codes(option_type, categories=["C", "P"]),
+        'month_code': pd.Categorical.from_codes(month_code, categories=list(MONTH_CODES)),
+        'year': pd.arrays.IntegerArray(year, year == 0),
+        'continuous': continuous,
+    }, index=df.index)
+
+
+def _root_ranges(roots):
+    """{root: (start, stop)} for a sorted array of roots"""
+    if not len(roots):
+        return {}
+    values, starts = np.unique(roots, return_index=True)
+    stops = np.append(starts[1:], len(roots))
+    order = np.argsort(starts)
+    return {str(values[i]): (int(starts[i]), int(stops[i])) for i in order}
+
+
+class InstrumentChains:
+    """Futures curves and option chains sorted by root and expiry with the row range of every root"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.ranges = {kind: _root_ranges(table['root'].to_numpy(dtype=object)) for kind, table in tables.items()}
+
+    @classmethod
+    def from_dataframe(cls, df, instruments=None):
+        """Build the chains from the symbol table (and its parse_instruments() columns, if already parsed)"""
+        instruments = parse_instruments(df) if instruments is None else instruments
+        carried = df[[column for column in CARRIED_COLUMNS if column in df.columns]]
+        parsed = pd.concat([carried, instruments], axis=1)
+        parsed = parsed[parsed['kind'].notna()]
+
+        tables = {}
+        for kind in KINDS:
+            table = parsed[parsed['kind'] == kind].drop(columns='kind')
+            if kind == "future":
+                # Continuous contracts (no expiry) lead each curve
+                table = table.drop(columns=['strike', 'option_type'])
+                table = table.sort_values(['root', 'expiry', 'symbol'], na_position='first', kind='stable')
+            else:
+                table = table.drop(columns='continuous')
+                table = table.sort_values(['root', 'expiry', 'option_type', 'strike', 'symbol'], kind='stable')
+            tables[kind] = table.reset_index(drop=True)
+        return cls(tables)
+
+    @classmethod
+    def from_csv(cls, output_dir, chunksize=500000):
+        """Parse the downloaded universe a chunk at a time, keeping only futures and options"""
+        import symbol_schema
+
+        csv_path = os.path.join(output_dir, "all_symbols_latest.csv")
+        parts = []
+        for chunk in symbol_schema.read_csv(csv_path, usecols=lambda column: column in CARRIED_COLUMNS, chunksize=chunksize):
+            instruments = parse_instruments(chunk)
+            keep = instruments['kind'].notna().to_numpy()
+            parts.append(pd.concat([chunk[keep], instruments[keep]], axis=1))
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=CARRIED_COLUMNS + INSTRUMENT_COLUMNS)
+        return cls.from_dataframe(df[[c for c in CARRIED_COLUMNS if c in df.columns]], df[INSTRUMENT_COLUMNS])
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables.values())
+
+    def roots(self, kind="future"):
+        return list(self.ranges[kind])
+
+    def _slice(self, kind, root):
+        start, stop = self.ranges[kind].get(root, (0, 0))
+        return self.tables[kind].iloc[start:stop]
+
+    def futures(self, root, include_continuous=True):
+        """Futures curve of a root ordered by expiry, continuous contracts first"""
+        curve = self._slice("future", root)
+        return curve if include_continuous else curve[~curve['continuous'].to_numpy()]
+
+    def options(self, root, expiry=None, option_type=None, kinds=("future_option", "equity_option")):
+        """Option chain of a root (futures and equity options), optionally for one expiry and side"""
+        chains = []
+        for kind in kinds:
+            chain = self._slice(kind, root)
+            if expiry is not None and len(chain):
+                # Rows of a root are sorted by expiry, so one expiry is a contiguous run
+                expiries = chain['expiry'].to_numpy()
+                day = pd.Timestamp(expiry).normalize().to_datetime64()
+                chain = chain.iloc[np.searchsorted(expiries, day, 'left'):np.searchsorted(expiries, day, 'right')]
+            if option_type is not None:
+                chain = chain[(chain['option_type'] == option_type).to_numpy()]
+            chains.append(chain)
+        return pd.concat(chains) if len(chains) > 1 else chains[0]
+
+    def expiries(self, root, kind="future_option"):
+        return self._slice(kind, root)['expiry'].drop_duplicates().tolist()
+
+    def save(self, directory):
+        """Persist the chain tables as CSV plus a JSON header with the root ranges, replacing any previous ones"""
+        tmp_dir = directory + ".tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        for kind, table in self.tables.items():
+            table.to_csv(os.path.join(tmp_dir, f"{kind}.csv"), index=False, date_format='%Y-%m-%d')
+        with open(os.path.join(tmp_dir, "chains.json"), 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'counts': {kind: len(table) for kind, table in self.tables.items()},
+                       'roots': self.ranges}, f)
+
+        old_dir = directory + ".old"
+        if os.path.exists(directory):
+            os.rename(directory, old_dir)
+        os.rename(tmp_dir, directory)
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "chains.json"), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported instrument chains version {meta.get('version')} in {directory}")
+
+        tables = {}
+        for kind in KINDS:
+            table = pd.read_csv(os.path.join(directory, f"{kind}.csv"), keep_default_na=False, na_values=[''],
+                                dtype={'symbol': 'string', 'description': 'string', 'root': 'string', 'month_code': 'category',
+                                       'option_type': 'category', 'year': 'Int16', 'strike': 'float64'},
+                                parse_dates=['expiry'])
+            table['expiry'] = table['expiry'].astype('datetime64[ns]')
+            tables[kind] = table
+        return cls(tables)
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or query the futures curves and option chains')
+    parser.add_argument('--output-dir', help='Directory holding the downloaded symbols', default='dtn_symbols')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help='Parse the downloaded universe into chain tables')
+    futures = subparsers.add_parser('futures', help='Futures curve of a root')
+    futures.add_argument('root')
+    options = subparsers.add_parser('options', help='Option chain of a root')
+    options.add_argument('root')
+    options.add_argument('--expiry', help='Expiry date (first of the month for futures options)', default=None)
+    options.add_argument('--type', choices=['C', 'P'], default=None)
+    args = parser.parse_args()
+
+    chains_dir = os.path.join(args.output_dir, CHAINS_DIR)
+    if args.command == 'build':
+        start = time.perf_counter()
+        chains = InstrumentChains.from_csv(args.output_dir)
+        chains.save(chains_dir)
+        counts = ', '.join(f"{len(table):,} {kind.replace('_', ' ')}s" for kind, table in chains.tables.items())
+        print(f"Parsed {counts} into {chains_dir} in {time.perf_counter() - start:.1f} seconds")
+        return
+
+    chains = InstrumentChains.load(chains_dir)
+    start = time.perf_counter()
+    if args.command == 'futures':
+        results = chains.futures(args.root)
+    else:
+        results = chains.options(args.root, expiry=args.expiry, option_type=args.type)
+    elapsed = time.perf_counter() - start
+
+    if len(results):
+        print(results.to_string(index=False))
+    else:
+        print("No matches")
+    print(f"\n{len(results)} result(s) in {elapsed * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
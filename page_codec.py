@@ -0,0 +1,77 @@
+"""
+Fast decoding and row extraction for symbol pages
+Pages are decoded with orjson when it is installed (falling back to the json module) and turned
+into a column list plus row tuples in one pass with operator.itemgetter, so writers can emit CSV
+rows or build a DataFrame without pandas inferring a frame from thousands of dicts per page.
+"""
+
+import csv
+import json
+from operator import itemgetter
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional dependency, the json module is used when it is missing
+    orjson = None
+
+
+def loads(data):
+    """Decode a JSON document from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """Encode obj as compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def page_rows(symbols, columns=None):
+    """Return (columns, rows) for a page of symbol dicts, rows being tuples in column order
+
+    columns defaults to the keys of the records. Pages whose records all have the same keys, which
+    is what the API returns, take the itemgetter fast path; missing keys become None.
+    """
+    if not symbols:
+        return list(columns or []), []
+    default_columns = columns is None
+    if default_columns:
+        first = symbols[0]
+        columns = list(first) if all(map(len(first).__eq__, map(len, symbols))) else _all_keys(symbols)
+    columns = list(columns)
+    if not columns:
+        return columns, [()] * len(symbols)
+
+    getter = itemgetter(*columns)
+    try:
+        rows = list(map(getter, symbols))
+    except KeyError:
+        # Some record lacks a column (or, with the same number of keys, has different ones)
+        if default_columns:
+            columns = _all_keys(symbols)
+        return columns, [tuple(row.get(column) for column in columns) for row in symbols]
+    if len(columns) == 1:
+        rows = [(value,) for value in rows]
+    return columns, rows
+
+
+def _all_keys(symbols):
+    return list(dict.fromkeys(key for row in symbols for key in row))
+
+
+def rows_frame(columns, rows):
+    """Build a DataFrame from page_rows() output"""
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def write_csv_rows(file, rows, header=None):
+    """Write rows to an open text file in the same CSV dialect as DataFrame.to_csv"""
+    writer = csv.writer(file, lineterminator='\n')
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows(rows)
@@ -0,0 +1,174 @@
+"""
+Append-only, checksummed journal of downloaded pages
+Each page is one record: a header (magic, payload length, CRC32), a zlib-compressed JSON payload
+holding the page's columns and row values plus the cursor state after it, and a trailer pointing back at the
+record's start. Records are flushed as they are written and fsynced in batches. Resuming reads
+the trailer at the end of the file and verifies that one record, so it costs the same however
+long the journal is; only a torn tail (a crash in the middle of a write) needs a scan of the
+record headers to find the last good record, which is then truncated after.
+"""
+
+import logging
+import os
+import struct
+import zlib
+
+import page_codec
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = "download_journal.dat"
+
+FILE_MAGIC = b"DTNJRNL2"
+RECORD_MAGIC = b"DTNR"
+TRAILER_MAGIC = b"RNTD"
+HEADER = struct.Struct("<4sII")    # magic, payload length, crc32 of payload
+TRAILER = struct.Struct("<Q4s")    # record start offset, magic
+
+
+class PageJournal:
+    """Journal of downloaded pages, each stored with the download state after it"""
+
+    def __init__(self, path, fsync_every=8, compress_level=1):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.compress_level = compress_level
+        self.last = None  # State of the last good record
+        self.records_written = 0
+        self._file = None
+        self._unsynced = 0
+
+    def open(self, resume=True):
+        """Open for appending; with resume=True keep the existing records, otherwise start over
+
+        Returns the state stored with the last good record, or None if there is none.
+        """
+        self.last = None
+        if resume and os.path.exists(self.path):
+            self._file = open(self.path, 'r+b')
+            end = self._recover()
+        else:
+            self._file = open(self.path, 'w+b')
+            self._file.write(FILE_MAGIC)
+            end = len(FILE_MAGIC)
+        self._file.truncate(end)
+        self._file.seek(end)
+        return self.last
+
+    def _read_record(self, offset, with_rows=False):
+        """Read and verify the record at offset; returns (state, (columns, rows), end offset) or None"""
+        self._file.seek(offset)
+        header = self._file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        magic, length, crc = HEADER.unpack(header)
+        if magic != RECORD_MAGIC:
+            return None
+        payload = self._file.read(length)
+        trailer = self._file.read(TRAILER.size)
+        if len(payload) < length or len(trailer) < TRAILER.size:
+            return None
+        start, trailer_magic = TRAILER.unpack(trailer)
+        if trailer_magic != TRAILER_MAGIC or start != offset or zlib.crc32(payload) != crc:
+            return None
+        record = page_codec.loads(zlib.decompress(payload))
+        page = (record['columns'], record['rows']) if with_rows else None
+        return record['state'], page, offset + HEADER.size + length + TRAILER.size
+
+    def _recover(self):
+        """Locate the last good record and return the offset just after it"""
+        if self._file.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            logger.warning(f"{self.path} is not a page journal, starting a new one")
+            self._file.seek(0)
+            self._file.write(FILE_MAGIC)
+            return len(FILE_MAGIC)
+
+        # Fast path: the file ends with a complete record whose trailer points at its start
+        size = self._file.seek(0, os.SEEK_END)
+        if size >= len(FILE_MAGIC) + HEADER.size + TRAILER.size:
+            self._file.seek(size - TRAILER.size)
+            start, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+            if magic == TRAILER_MAGIC and start < size:
+                record = self._read_record(start)
+                if record and record[2] == size:
+                    self.last = record[0]
+                    return size
+        if size == len(FILE_MAGIC):
+            return size
+
+        # Torn tail: walk the record headers and trailers forward without reading the payloads,
+        # then keep everything up to the last record that also passes its checksum
+        offsets = []
+        offset = len(FILE_MAGIC)
+        while True:
+            self._file.seek(offset)
+            header = self._file.read(HEADER.size)
+            if len(header) < HEADER.size:
+                break
+            magic, length, _ = HEADER.unpack(header)
+            end = offset + HEADER.size + length + TRAILER.size
+            if magic != RECORD_MAGIC or end > size:
+                break
+            self._file.seek(end - TRAILER.size)
+            start, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+            if magic != TRAILER_MAGIC or start != offset:
+                break
+            offsets.append(offset)
+            offset = end
+
+        good_end = len(FILE_MAGIC)
+        for offset in reversed(offsets):
+            record = self._read_record(offset)
+            if record:
+                self.last, _, good_end = record
+                break
+        logger.warning(f"Discarded {size - good_end:,} bytes of torn writes at the end of {self.path}")
+        return good_end
+
+    def append(self, symbols, **state):
+        """Append one page together with the download state after it"""
+        # Rows as value lists under one column list, instead of a dict per symbol
+        columns, rows = page_codec.page_rows(symbols)
+        payload = zlib.compress(page_codec.dumps({'state': state, 'columns': columns, 'rows': rows}),
+                                self.compress_level)
+        start = self._file.tell()
+        self._file.write(HEADER.pack(RECORD_MAGIC, len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+        self._file.write(TRAILER.pack(start, TRAILER_MAGIC))
+        # After flush() the record survives the process being killed; fsync() covers power loss
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+        self.last = state
+        self.records_written += 1
+
+    def sync(self):
+        if self._file and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def records(self):
+        """Yield (state, columns, rows) for every record, oldest first"""
+        end = self._file.tell() if self._file else os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            reader = PageJournal(self.path)
+            reader._file = f
+            offset = len(FILE_MAGIC)
+            while offset < end:
+                record = reader._read_record(offset, with_rows=True)
+                if record is None:
+                    raise ValueError(f"Corrupt record at offset {offset} in {self.path}")
+                state, (columns, rows), offset = record
+                yield state, columns, rows
+
+    def close(self):
+        if self._file:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,498 @@
+"""
+Shared work queue of exchange/secType partitions for cooperative downloads
+Several downloader processes, on one machine or many, lease partitions from the same queue,
+page through them and hand the result back to the queue. A lease is kept alive by heartbeats;
+one that is not renewed in time (its worker died or hung) expires and the partition goes back
+to the queue for another worker, up to MAX_ATTEMPTS times. When every partition is done, the
+first worker to claim the merge combines the parts into one deduplicated universe.
+
+The queue is a directory guarded by a lock file (FileLeaseQueue, for processes sharing a file
+system) or a Redis server (RedisLeaseQueue, e.g. the one process_symbols.py loads into), whose
+optimistic transactions and server clock keep leases consistent across machines.
+"""
+
+import fcntl
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import pandas as pd
+
+import symbol_schema
+from delta_sync import partition_key
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 2.0
+REDIS_PREFIX = "dtn_queue"
+REDIS_TTL = 2 * 24 * 3600  # Queue keys outlive a merged run by this long
+
+
+def default_run_id():
+    """Run id shared by the workers of one refresh
+
+    In GitHub Actions this is the workflow run (and attempt), which every job of the run shares;
+    elsewhere it is the UTC date and hour, so the 00:00 and 12:00 refreshes get separate runs.
+    """
+    if os.environ.get("GITHUB_RUN_ID"):
+        return f"gh{os.environ['GITHUB_RUN_ID']}-{os.environ.get('GITHUB_RUN_ATTEMPT', '1')}"
+    return datetime.now(timezone.utc).strftime("%Y%m%d%H")
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def open_queue(spec, run_id=None):
+    """FileLeaseQueue for a directory, RedisLeaseQueue for a redis:// or rediss:// URL"""
+    run_id = run_id or default_run_id()
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis
+        return RedisLeaseQueue(redis.Redis.from_url(spec), run_id)
+    return FileLeaseQueue(spec, run_id)
+
+
+def encode_part(df):
+    """Partition rows as gzipped CSV, the form parts are stored in the queue"""
+    return gzip.compress(df.to_csv(index=False).encode('utf-8'), compresslevel=1, mtime=0)
+
+
+def decode_part(data):
+    return symbol_schema.read_csv(io.BytesIO(data), compression='gzip')
+
+
+class FileLeaseQueue:
+    """Partition queue in a directory; every state change happens under an exclusive flock"""
+
+    def __init__(self, root, run_id):
+        self.run_id = run_id
+        self.root = os.path.join(root, run_id)
+        self.parts_dir = os.path.join(self.root, "parts")
+        self.state_path = os.path.join(self.root, "state.json")
+        os.makedirs(self.parts_dir, exist_ok=True)
+
+    def __repr__(self):
+        return f"FileLeaseQueue({self.root})"
+
+    @contextmanager
+    def _state(self):
+        """Read-modify-write of state.json under the lock file"""
+        with open(os.path.join(self.root, "queue.lock"), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = {}
+                if os.path.exists(self.state_path):
+                    with open(self.state_path, 'r') as f:
+                        state = json.load(f)
+                before = json.dumps(state, sort_keys=True)
+                yield state
+                if json.dumps(state, sort_keys=True) != before:
+                    with open(self.state_path + ".tmp", 'w') as f:
+                        json.dump(state, f, indent=1)
+                    os.replace(self.state_path + ".tmp", self.state_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _part_path(self, key):
+        return os.path.join(self.parts_dir, f"{quote(key, safe='')}.csv.gz")
+
+    @staticmethod
+    def _reclaim(state, now):
+        for key, entry in state['partitions'].items():
+            if entry['state'] == 'leased' and entry['expires'] <= now:
+                logger.warning(f"Lease on {key} held by {entry['owner']} expired, requeueing")
+                entry['attempts'] += 1
+                entry.update(state='failed' if entry['attempts'] >= MAX_ATTEMPTS else 'pending', owner=None, expires=None)
+
+    def init(self, partitions):
+        """Create the plan from partitions unless a worker already did; return the plan in effect"""
+        with self._state() as state:
+            if not state:
+                state['created'] = datetime.now().isoformat(timespec='seconds')
+                state['plan'] = [[partition_key(exchange, sec_type), exchange, sec_type] for exchange, sec_type in partitions]
+                state['partitions'] = {key: {'state': 'pending', 'owner': None, 'expires': None, 'attempts': 0}
+                                       for key, _, _ in state['plan']}
+                state['merge'] = None
+            return {key: (exchange, sec_type) for key, exchange, sec_type in state['plan']}
+
+    def acquire(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """Lease the next pending partition (expired leases first go back to the queue), or None"""
+        with self._state() as state:
+            now = time.time()
+            self._reclaim(state, now)
+            for key, _, _ in state['plan']:
+                entry = state['partitions'][key]
+                if entry['state'] == 'pending':
+                    entry.update(state='leased', owner=worker_id, expires=now + lease_seconds)
+                    return key
+        return None
+
+    def heartbeat(self, key, worker_id, lease_seconds=LEASE_SECONDS):
+        """Extend a lease; False when it is no longer held by worker_id"""
+        with self._state() as state:
+            entry = state['partitions'][key]
+            if entry['state'] != 'leased' or entry['owner'] != worker_id:
+                return False
+            entry['expires'] = time.time() + lease_seconds
+            return True
+
+    def complete(self, key, worker_id, data):
+        """Store the partition's rows and mark it done; False (nothing stored) if the lease was lost"""
+        tmp_path = f"{self._part_path(key)}.{worker_id}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        with self._state() as state:
+            entry = state['partitions'][key]
+            if entry['state'] != 'leased' or entry['owner'] != worker_id:
+                os.remove(tmp_path)
+                return False
+            os.replace(tmp_path, self._part_path(key))
+            entry.update(state='done', owner=worker_id, expires=None)
+            return True
+
+    def release(self, key, worker_id):
+        """Give a partition back after a failed attempt"""
+        with self._state() as state:
+            entry = state['partitions'][key]
+            if entry['state'] == 'leased' and entry['owner'] == worker_id:
+                entry['attempts'] += 1
+                entry.update(state='failed' if entry['attempts'] >= MAX_ATTEMPTS else 'pending', owner=None, expires=None)
+
+    def status(self):
+        with self._state() as state:
+            counts = {name: 0 for name in ('pending', 'leased', 'done', 'failed')}
+            for entry in state.get('partitions', {}).values():
+                counts[entry['state']] += 1
+            return counts
+
+    def failed(self):
+        with self._state() as state:
+            return [key for key, _, _ in state['plan'] if state['partitions'][key]['state'] == 'failed']
+
+    def parts(self):
+        """(key, stored bytes) of the done partitions in plan order"""
+        with self._state() as state:
+            keys = [key for key, _, _ in state['plan'] if state['partitions'][key]['state'] == 'done']
+        for key in keys:
+            with open(self._part_path(key), 'rb') as f:
+                yield key, f.read()
+
+    def claim_merge(self, worker_id):
+        """True for the one worker that gets to merge the parts"""
+        with self._state() as state:
+            if state.get('merge') is None:
+                state['merge'] = {'owner': worker_id, 'started': datetime.now().isoformat(timespec='seconds')}
+                return True
+            return False
+
+    def merge_owner(self):
+        with self._state() as state:
+            return (state.get('merge') or {}).get('owner')
+
+    def cleanup(self):
+        """Drop the stored parts of a merged run, keeping its state for inspection"""
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+
+
+class RedisLeaseQueue:
+    """Partition queue in Redis, updated with WATCH/MULTI transactions and leases on the server clock"""
+
+    def __init__(self, client, run_id):
+        self.client = client
+        self.run_id = run_id
+        prefix = f"{REDIS_PREFIX}:{run_id}"
+        self.plan_key = f"{prefix}:plan"
+        self.pending_key = f"{prefix}:pending"
+        self.leases_key = f"{prefix}:leases"      # zset partition -> lease expiry
+        self.owners_key = f"{prefix}:owners"      # hash partition -> worker
+        self.attempts_key = f"{prefix}:attempts"  # hash partition -> failed attempts
+        self.done_key = f"{prefix}:done"
+        self.failed_key = f"{prefix}:failed"
+        self.merge_key = f"{prefix}:merge"
+        self.part_prefix = f"{prefix}:part:"
+        self._plan = None
+
+    def __repr__(self):
+        return f"RedisLeaseQueue({self.plan_key})"
+
+    @staticmethod
+    def _text(value):
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    @staticmethod
+    def _server_time(client):
+        seconds, microseconds = client.time()
+        return seconds + microseconds / 1e6
+
+    def init(self, partitions):
+        plan = json.dumps([[partition_key(exchange, sec_type), exchange, sec_type] for exchange, sec_type in partitions])
+
+        def create(pipe):
+            if pipe.exists(self.plan_key):
+                return
+            keys = [entry[0] for entry in json.loads(plan)]
+            pipe.multi()
+            pipe.set(self.plan_key, plan)
+            if keys:
+                pipe.rpush(self.pending_key, *keys)
+
+        self.client.transaction(create, self.plan_key)
+        self._plan = {key: (exchange, sec_type) for key, exchange, sec_type in json.loads(self._text(self.client.get(self.plan_key)))}
+        return self._plan
+
+    def _requeue(self, pipe, key, attempts):
+        pipe.hset(self.attempts_key, key, attempts)
+        if attempts >= MAX_ATTEMPTS:
+            pipe.sadd(self.failed_key, key)
+        else:
+            pipe.rpush(self.pending_key, key)
+
+    def acquire(self, worker_id, lease_seconds=LEASE_SECONDS):
+        def lease(pipe):
+            now = self._server_time(pipe)
+            expired = [self._text(key) for key in pipe.zrangebyscore(self.leases_key, '-inf', now)]
+            attempts = {key: int(pipe.hget(self.attempts_key, key) or 0) + 1 for key in expired}
+            head = pipe.lindex(self.pending_key, 0)
+            pipe.multi()
+            for key in expired:
+                pipe.zrem(self.leases_key, key)
+                pipe.hdel(self.owners_key, key)
+                self._requeue(pipe, key, attempts[key])
+            candidates = [self._text(head)] if head is not None else \
+                [key for key in expired if attempts[key] < MAX_ATTEMPTS]
+            if not candidates:
+                return None, expired
+            pipe.lpop(self.pending_key)
+            pipe.zadd(self.leases_key, {candidates[0]: now + lease_seconds})
+            pipe.hset(self.owners_key, candidates[0], worker_id)
+            return candidates[0], expired
+
+        # The callable is retried when a watched key changes, so log only the committed outcome
+        key, expired = self.client.transaction(lease, self.pending_key, self.leases_key, self.attempts_key,
+                                               value_from_callable=True)
+        for expired_key in expired:
+            logger.warning(f"Lease on {expired_key} expired, requeueing")
+        return key
+
+    def _if_owner(self, key, worker_id, update):
+        """Run update(pipe) in a transaction only while worker_id holds the lease on key"""
+        def guarded(pipe):
+            if self._text(pipe.hget(self.owners_key, key)) != worker_id:
+                return False
+            now = self._server_time(pipe)
+            pipe.multi()
+            update(pipe, now)
+            return True
+
+        return self.client.transaction(guarded, self.owners_key, value_from_callable=True)
+
+    def heartbeat(self, key, worker_id, lease_seconds=LEASE_SECONDS):
+        return self._if_owner(key, worker_id, lambda pipe, now: pipe.zadd(self.leases_key, {key: now + lease_seconds}, xx=True))
+
+    def complete(self, key, worker_id, data):
+        def finish(pipe, now):
+            pipe.set(self.part_prefix + key, data)
+            pipe.zrem(self.leases_key, key)
+            pipe.sadd(self.done_key, key)
+        return self._if_owner(key, worker_id, finish)
+
+    def release(self, key, worker_id):
+        attempts = int(self.client.hget(self.attempts_key, key) or 0) + 1
+
+        def give_back(pipe, now):
+            pipe.zrem(self.leases_key, key)
+            pipe.hdel(self.owners_key, key)
+            self._requeue(pipe, key, attempts)
+        self._if_owner(key, worker_id, give_back)
+
+    def status(self):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.llen(self.pending_key).zcard(self.leases_key).scard(self.done_key).scard(self.failed_key)
+        pending, leased, done, failed = pipe.execute()
+        return {'pending': pending, 'leased': leased, 'done': done, 'failed': failed}
+
+    def _plan_keys(self):
+        if self._plan is None:
+            self._plan = {entry[0]: (entry[1], entry[2]) for entry in json.loads(self._text(self.client.get(self.plan_key)))}
+        return list(self._plan)
+
+    def failed(self):
+        failed = {self._text(key) for key in self.client.smembers(self.failed_key)}
+        return [key for key in self._plan_keys() if key in failed]
+
+    def parts(self):
+        done = {self._text(key) for key in self.client.smembers(self.done_key)}
+        for key in self._plan_keys():
+            if key in done:
+                yield key, self.client.get(self.part_prefix + key)
+
+    def claim_merge(self, worker_id):
+        return bool(self.client.set(self.merge_key, worker_id, nx=True))
+
+    def merge_owner(self):
+        return self._text(self.client.get(self.merge_key))
+
+    def cleanup(self):
+        """Drop the stored parts of a merged run and let the rest of its keys expire"""
+        keys = [self.part_prefix + key for key in self._plan_keys()]
+        if keys:
+            self.client.delete(*keys)
+        for key in (self.plan_key, self.pending_key, self.leases_key, self.owners_key, self.attempts_key,
+                    self.done_key, self.failed_key, self.merge_key):
+            self.client.expire(key, REDIS_TTL)
+
+
+class LeaseKeeper(threading.Thread):
+    """Heartbeats every lease a worker holds, a third of the lease time apart"""
+
+    def __init__(self, queue, worker_id, lease_seconds=LEASE_SECONDS):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.held = set()
+        self.lost = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def add(self, key):
+        with self._lock:
+            self.held.add(key)
+            self.lost.discard(key)
+
+    def remove(self, key):
+        """Stop renewing key; True if the lease was still held at the last heartbeat"""
+        with self._lock:
+            self.held.discard(key)
+            return key not in self.lost
+
+    def run(self):
+        while not self._stopped.wait(self.lease_seconds / 3):
+            with self._lock:
+                held = list(self.held)
+            for key in held:
+                try:
+                    alive = self.queue.heartbeat(key, self.worker_id, self.lease_seconds)
+                except Exception as e:
+                    logger.warning(f"Heartbeat for {key} failed: {e}")
+                    continue
+                if not alive:
+                    logger.warning(f"Lost the lease on {key}")
+                    with self._lock:
+                        self.lost.add(key)
+
+    def stop(self):
+        self._stopped.set()
+
+
+class CooperativeDownload:
+    """One worker of a cooperative download: lease partitions until the queue is drained, maybe merge"""
+
+    def __init__(self, downloader, queue, worker_id=None, threads=1, lease_seconds=LEASE_SECONDS,
+                 poll_seconds=POLL_SECONDS):
+        self.downloader = downloader
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.threads = max(1, threads)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.merged_by = None
+        self.partitions_done = 0
+
+    def _work(self, plan, keeper):
+        metrics = self.downloader.metrics
+        while True:
+            key = self.queue.acquire(self.worker_id, self.lease_seconds)
+            if key is None:
+                status = self.queue.status()
+                if not status['pending'] and not status['leased']:
+                    return
+                # Other workers hold the remaining leases; wait in case one of them expires
+                time.sleep(self.poll_seconds)
+                continue
+
+            exchange, sec_type = plan[key]
+            keeper.add(key)
+            metrics.incr('queue', 'leased')
+            try:
+                dataframes, symbol_count, _, complete = self.downloader.download_partition(exchange, sec_type)
+            except Exception as e:
+                logger.error(f"  {key}: unexpected error: {e}")
+                dataframes, symbol_count, complete = [], 0, False
+            still_held = keeper.remove(key)
+
+            if not complete:
+                self.queue.release(key, self.worker_id)
+                metrics.incr('queue', 'released')
+                continue
+            df = pd.concat(dataframes, ignore_index=True) if dataframes else pd.DataFrame()
+            if still_held and self.queue.complete(key, self.worker_id, encode_part(df)):
+                self.partitions_done += 1
+                metrics.incr('queue', 'completed')
+                logger.info(f"  [{self.worker_id}] {key}: {symbol_count:,} symbols")
+            else:
+                # Another worker took the partition over after our lease expired
+                metrics.incr('queue', 'lost')
+                logger.warning(f"  [{self.worker_id}] {key}: lease lost, result discarded")
+
+    def run(self, rate=None):
+        """Work the queue, then merge if this worker claims it; returns the merged universe or None"""
+        from dtn_symbol_downloader import RateLimiter
+
+        start_time = time.time()
+        merged_by = self.queue.merge_owner()
+        if merged_by is not None:
+            # Not a partner that finished first: this run's parts are gone, so nothing was refreshed
+            logger.error(f"{self.queue} was already merged by {merged_by}, use a new --run-id to refresh again")
+            return None
+        categories = self.downloader.get_categories()
+        if not categories:
+            logger.error("Could not retrieve categories, cooperative download needs them")
+            return None
+        plan = self.queue.init(self.downloader.get_partitions(categories, 'both'))
+        logger.info(f"Worker {self.worker_id} joined {self.queue} ({len(plan)} partitions, {self.threads} threads)")
+
+        keeper = LeaseKeeper(self.queue, self.worker_id, self.lease_seconds)
+        keeper.start()
+        if not self.downloader.rate_controller:
+            self.downloader.rate_limiter = RateLimiter(rate)
+        try:
+            with ThreadPoolExecutor(max_workers=self.threads) as executor:
+                for future in [executor.submit(self._work, plan, keeper) for _ in range(self.threads)]:
+                    future.result()
+        finally:
+            keeper.stop()
+            self.downloader.rate_limiter = None
+        logger.info(f"Worker {self.worker_id} finished {self.partitions_done} partitions in "
+                    f"{time.time() - start_time:.1f} seconds, queue {self.queue.status()}")
+
+        if not self.queue.claim_merge(self.worker_id):
+            self.merged_by = self.queue.merge_owner()
+            logger.info(f"Parts are merged by {self.merged_by}")
+            return None
+        self.merged_by = self.worker_id
+        return self.merge()
+
+    def merge(self):
+        """Combine the stored parts into one deduplicated universe in the downloader's output dir"""
+        failed = self.queue.failed()
+        if failed:
+            logger.warning(f"Partitions that failed {MAX_ATTEMPTS} attempts: {', '.join(failed)}")
+        dataframes = [df for _, data in self.queue.parts() for df in [decode_part(data)] if len(df)]
+        logger.info(f"Merging {len(dataframes)} partitions")
+        result = self.downloader.combine_and_save(dataframes)
+        if result is not None:
+            self.queue.cleanup()
+        return result
@@ -1,3 +1,4 @@
+import io
 import zipfile
 import os
 import pandas as pd
@@ -5,22 +6,180 @@ import redis
 import glob
 import requests # Import the requests library
 import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import file_codecs
+import symbol_schema
+from query_filter import QueryFilter
+from symbol_io import PARQUET_DIR, load_symbols, parquet_available, parquet_is_current
 
 # Configuration
 ZIP_FILE_URL = "https://github.com/chaitanyamurarka/DTN-IQFeed-Symbol-Downloader/raw/refs/heads/main/dtn_symbols/by_exchange.zip"
 LOCAL_ZIP_PATH = "by_exchange.zip" # Local path to save the downloaded file
 EXTRACT_DIR = "dtn_symbols_extracted"
 TARGET_EXCHANGES = ["NYSE", "CME", "NASDAQ", "EUREX"]
+LOCAL_OUTPUT_DIR = "dtn_symbols" # Used instead of the zip when it holds a Parquet dataset
 
-# Redis connection
-try:
-    r = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True) # decode_responses is good practice
-    r.ping()
-    print("Successfully connected to Redis!")
-except redis.exceptions.ConnectionError as e:
-    print(f"Could not connect to Redis: {e}")
-    print("Please ensure Redis server is running and accessible.")
-    exit()
+# Redis layout: "blob" keeps one JSON string per symbols:{exchange}:{secType} key, "hash" stores
+# one hash per symbol plus a symbol set per group for O(1) point lookups, "both" writes both
+REDIS_LAYOUT = "blob"
+REDIS_CHUNK_SIZE = 1000 # Commands per pipeline round trip
+
+# Read the target exchanges straight out of the zip (over HTTP range requests) instead of
+# downloading and extracting it to disk
+STREAM_ZIP = True
+CSV_CHUNK_SIZE = 100000 # Rows parsed per chunk while a member is being decompressed
+SPLIT_FILE_SUFFIXES = tuple(".csv" + suffix for suffix, _ in file_codecs.CODECS.values()) # Plain, gzip and zstd split files
+
+# Parse and serialise split files in this many processes while the main process writes to
+# Redis over its single connection (1 keeps everything in one process)
+LOAD_WORKERS = 1
+
+# Download only the target exchanges from the DTN API with the filters pushed to the server,
+# instead of reading the full by_exchange.zip (see dtn_symbol_downloader.py --exchanges)
+DOWNLOAD_FILTERED = False
+DOWNLOAD_FILTER = QueryFilter(exchanges=TARGET_EXCHANGES)  # e.g. add no_options=True
+DTN_BASE_URL = "https://ws1.dtn.com"
+DOWNLOAD_WORKERS = 4
+
+VERSION_KEY = "symbols:version"
+VERSION_CHANNEL = "symbols:reloaded" # Each new version is published here by the swap, for reader caches
+GROUPS_KEY = "symbols:groups"
+STAGING_PREFIX = "staging:"
+
+def connect_redis(host='localhost', port=6379, db=0):
+    """Connects to Redis, exiting if the server is not reachable."""
+    try:
+        client = redis.Redis(host=host, port=port, db=db, decode_responses=True) # decode_responses is good practice
+        client.ping()
+        print("Successfully connected to Redis!")
+        return client
+    except redis.exceptions.ConnectionError as e:
+        print(f"Could not connect to Redis: {e}")
+        print("Please ensure Redis server is running and accessible.")
+        exit()
+
+def symbol_key(version, symbol):
+    """Key of the per-symbol hash in a given snapshot version."""
+    return f"symbols:v{version}:sym:{symbol}"
+
+def group_set_key(version, exchange, sec_type):
+    """Key of the set of symbols in one exchange/secType group in a given snapshot version."""
+    return f"symbols:v{version}:set:{exchange}:{sec_type}"
+
+def lookup_symbol(redis_client, symbol):
+    """Returns the fields of one symbol from the current snapshot (hash layout), or None."""
+    version = redis_client.get(VERSION_KEY)
+    if version is None:
+        return None
+    return redis_client.hgetall(symbol_key(version, symbol)) or None
+
+def serialize_group(group_df, layout=REDIS_LAYOUT):
+    """
+    Redis payload of one group as (blob, records, row count): the JSON array stored under the
+    blob key and the string records of the per-symbol hashes, each None when the layout
+    does not use it.
+    """
+    blob = group_df.to_json(orient='records') if layout in ("blob", "both") else None
+    records = group_df.fillna('').astype(str).to_dict(orient='records') if layout in ("hash", "both") else None
+    return blob, records, len(group_df)
+
+def store_symbol_groups(redis_client, groups, layout=REDIS_LAYOUT, chunk_size=REDIS_CHUNK_SIZE):
+    """
+    Stores ((exchange, secType), DataFrame) groups in Redis, see store_serialized_groups.
+    """
+    payloads = (((exchange_name, sec_type), serialize_group(group_df, layout)) for (exchange_name, sec_type), group_df in groups)
+    return store_serialized_groups(redis_client, payloads, layout=layout, chunk_size=chunk_size)
+
+def store_serialized_groups(redis_client, payloads, layout=REDIS_LAYOUT, chunk_size=REDIS_CHUNK_SIZE):
+    """
+    Stores ((exchange, secType), serialize_group() payload) pairs in Redis using pipelines of
+    chunk_size commands, then swaps the new snapshot in with a single MULTI/EXEC so readers
+    never see a half-loaded universe. The new version is also published on VERSION_CHANNEL,
+    which invalidates symbol_reader caches.
+
+    Blob keys are written under a staging prefix and RENAMEd over the live keys in the swap.
+    Hash layout keys are versioned (symbols:v{N}:...), the swap points symbols:version at the
+    new version and the previous version's keys are unlinked afterwards.
+
+    If reading the payloads raises, or they hold no groups at all, the staged keys are
+    discarded and the live snapshot is left untouched; groups missing from the new snapshot
+    are only deleted by the swap of a load that completed.
+    """
+    version = redis_client.incr(f"{VERSION_KEY}:next")
+    previous_version = redis_client.get(VERSION_KEY)
+    pipe = redis_client.pipeline(transaction=False)
+    pending = 0
+    live_keys = []
+    processed_count = 0
+
+    def flush(force=False):
+        nonlocal pending
+        if pending and (force or pending >= chunk_size):
+            pipe.execute()
+            pending = 0
+
+    groups_loaded = 0
+    try:
+        for (exchange_name, sec_type), (blob, records, row_count) in payloads:
+            redis_key = f"symbols:{exchange_name}:{sec_type}"
+            if layout in ("blob", "both"):
+                pipe.set(STAGING_PREFIX + redis_key, blob)
+                live_keys.append(redis_key)
+                pending += 1
+                flush()
+
+            if layout in ("hash", "both"):
+                set_key = group_set_key(version, exchange_name, sec_type)
+                for start in range(0, len(records), chunk_size):
+                    chunk = records[start:start + chunk_size]
+                    for record in chunk:
+                        pipe.hset(symbol_key(version, record['symbol']), mapping=record)
+                    pipe.sadd(set_key, *[record['symbol'] for record in chunk])
+                    pending += len(chunk) + 1
+                    flush()
+
+            processed_count += row_count
+            groups_loaded += 1
+        flush(force=True)
+        if not groups_loaded:
+            raise ValueError("No symbol groups were loaded, keeping the current snapshot")
+    except BaseException:
+        pipe.reset()
+        discard_keys(redis_client, [STAGING_PREFIX + redis_key for redis_key in live_keys], chunk_size)
+        unlink_version_keys(redis_client, version, chunk_size)
+        raise
+
+    # Atomic swap: rename staged blobs over the live keys, drop groups that disappeared and
+    # publish the new version in one transaction
+    previous_groups = redis_client.smembers(GROUPS_KEY) if layout in ("blob", "both") else set()
+    swap = redis_client.pipeline(transaction=True)
+    for redis_key in live_keys:
+        swap.rename(STAGING_PREFIX + redis_key, redis_key)
+    stale_groups = set(previous_groups) - set(live_keys)
+    if stale_groups:
+        swap.delete(*stale_groups)
+    if layout in ("blob", "both"):
+        swap.delete(GROUPS_KEY)
+        if live_keys:
+            swap.sadd(GROUPS_KEY, *live_keys)
+    swap.set(VERSION_KEY, version)
+    swap.publish(VERSION_CHANNEL, version)
+    swap.execute()
+
+    # Readers resolve the version first, so the old versioned keys can go now
+    if previous_version is not None:
+        unlink_version_keys(redis_client, previous_version, chunk_size)
+
+    return processed_count
+
+def discard_keys(redis_client, keys, chunk_size=REDIS_CHUNK_SIZE):
+    """Unlinks keys chunk_size at a time."""
+    for start in range(0, len(keys), chunk_size):
+        redis_client.unlink(*keys[start:start + chunk_size])
+
+def unlink_version_keys(redis_client, version, chunk_size=REDIS_CHUNK_SIZE):
+    """Unlinks the versioned hash layout keys (symbols:v{version}:...) of one snapshot version."""
+    discard_keys(redis_client, list(redis_client.scan_iter(match=f"symbols:v{version}:*", count=chunk_size)), chunk_size)
 
 def download_file(url, destination):
     """Downloads a file from a URL to a local destination."""
@@ -37,6 +196,134 @@ def download_file(url, destination):
         print(f"Error downloading file: {e}")
         return False
 
+class HTTPRangeFile:
+    """
+    Read-only, seekable file over HTTP using Range requests, so zipfile can read the central
+    directory and just the members it needs. Reads are served from a read-ahead block to keep
+    the number of requests low. If the server ignores Range, the body is streamed into memory.
+    """
+    def __init__(self, url, block_size=1024 * 1024, session=None):
+        self.session = session or requests.Session()
+        self.block_size = block_size
+        self.position = 0
+        self.requests_made = 0
+        self._buffer = b''
+        self._buffer_start = 0
+        self._fallback = None
+
+        response = self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, allow_redirects=True)
+        response.raise_for_status()
+        self.requests_made += 1
+        self.url = response.url # Follow redirects once (e.g. to the LFS media host)
+        if response.status_code == 206 and '/' in response.headers.get('Content-Range', ''):
+            self.size = int(response.headers['Content-Range'].rsplit('/', 1)[1])
+            response.close()
+        else:
+            print("Server does not support range requests, streaming the zip into memory")
+            self._fallback = io.BytesIO()
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                self._fallback.write(chunk)
+            self.size = self._fallback.tell()
+            self._fallback.seek(0)
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._fallback.tell() if self._fallback else self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if self._fallback:
+            return self._fallback.seek(offset, whence)
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, min(offset, self.size))
+        return self.position
+
+    def read(self, n=-1):
+        if self._fallback:
+            return self._fallback.read(n)
+        if n is None or n < 0:
+            n = self.size - self.position
+        n = min(n, self.size - self.position)
+        if n <= 0:
+            return b''
+
+        offset = self.position - self._buffer_start
+        if offset < 0 or offset + n > len(self._buffer):
+            end = min(self.position + max(n, self.block_size), self.size) - 1
+            response = self.session.get(self.url, headers={'Range': f'bytes={self.position}-{end}'})
+            response.raise_for_status()
+            self.requests_made += 1
+            self._buffer = response.content
+            self._buffer_start = self.position
+            offset = 0
+
+        data = self._buffer[offset:offset + n]
+        self.position += len(data)
+        return data
+
+    def close(self):
+        self.session.close()
+
+def split_members(zip_ref):
+    """Names of the split file members of by_exchange.zip, by exchange"""
+    members = {}
+    for name in zip_ref.namelist():
+        parts = name.split('/')
+        # Members look like dtn_symbols/by_exchange/{exchange}/{secType}.csv[.gz|.zst]
+        if len(parts) >= 3 and parts[-3] == 'by_exchange' and parts[-1].endswith(SPLIT_FILE_SUFFIXES):
+            members.setdefault(parts[-2], []).append(name)
+    return members
+
+def iter_symbol_groups_from_zip(zip_source, target_exchanges, chunksize=CSV_CHUNK_SIZE):
+    """
+    Yields ((exchange, secType), DataFrame) groups read directly from the members of
+    by_exchange.zip that belong to the target exchanges. zip_source is a local path or an
+    http(s) URL; members are decompressed as a stream and parsed chunk by chunk, and the
+    members of other exchanges are never read. Members may themselves be .csv.gz or .csv.zst
+    (see file_codecs), in which case they are decompressed in the same stream.
+    """
+    remote = zip_source.startswith(('http://', 'https://'))
+    source = HTTPRangeFile(zip_source) if remote else zip_source
+
+    try:
+        with zipfile.ZipFile(source) as zip_ref:
+            members = split_members(zip_ref)
+            for exchange_name in target_exchanges:
+                if exchange_name not in members:
+                    print(f"Warning: Exchange not found in zip for {exchange_name}")
+                    continue
+
+                print(f"Processing symbols for exchange: {exchange_name}")
+                for member in members[exchange_name]:
+                    try:
+                        groups = {}
+                        with zip_ref.open(member) as member_file, \
+                                file_codecs.open_reader(member_file, file_codecs.codec_from_path(member)) as reader:
+                            for chunk in symbol_schema.read_csv(reader, chunksize=chunksize):
+                                if 'symbol' not in chunk.columns or 'exchange' not in chunk.columns or 'securityType' not in chunk.columns:
+                                    raise ValueError("Missing one of the required columns ('symbol', 'exchange', 'securityType')")
+                                chunk = chunk[chunk['exchange'] == exchange_name]
+                                for sec_type, group_df in chunk.groupby('securityType', observed=True):
+                                    groups.setdefault(sec_type, []).append(group_df)
+
+                        for sec_type, parts in groups.items():
+                            yield (exchange_name, sec_type), pd.concat(parts, ignore_index=True)
+                    except Exception as e:
+                        # A member that cannot be read aborts the load rather than dropping its groups
+                        print(f"Error processing {member}: {e}")
+                        raise
+    finally:
+        if remote:
+            print(f"Read zip over {source.requests_made} HTTP range request(s)")
+            source.close()
+
 def extract_zip(zip_path, extract_to):
     """Extracts a zip file to a specified directory."""
     if not os.path.exists(zip_path):
@@ -54,12 +341,11 @@ def extract_zip(zip_path, extract_to):
     print("Extraction complete.")
     return True
 
-def process_and_store_symbols(extracted_dir, redis_client, target_exchanges):
+def iter_split_files(extracted_dir, target_exchanges):
     """
-    Processes extracted CSVs, filters by exchange, and stores symbols in Redis
-    using the columns present in the file.
+    Yields (exchange, path) for the split files of the target exchanges in an extracted
+    by_exchange directory.
     """
-    processed_count = 0
     # The extracted structure is nested, e.g., .../dtn_symbols_extracted/dtn_symbols/by_exchange/
     base_path = os.path.join(extracted_dir, "dtn_symbols", "by_exchange")
 
@@ -72,41 +358,225 @@ def process_and_store_symbols(extracted_dir, redis_client, target_exchanges):
             continue
 
         print(f"Processing symbols for exchange: {exchange_name}")
-        csv_files = glob.glob(os.path.join(exchange_path, "*.csv"))
+        csv_files = [path for suffix in SPLIT_FILE_SUFFIXES for path in glob.glob(os.path.join(exchange_path, "*" + suffix))]
 
         if not csv_files:
             print(f"No CSV files found for exchange {exchange_name}")
             continue
 
         for csv_file in csv_files:
-            try:
-                df = pd.read_csv(csv_file)
+            yield exchange_name, csv_file
 
-                # Check for the actual column names from your sample
-                if 'symbol' not in df.columns or 'exchange' not in df.columns or 'securityType' not in df.columns:
-                    print(f"Skipping {csv_file}: Missing one of the required columns ('symbol', 'exchange', 'securityType').")
-                    continue
+def iter_symbol_groups(extracted_dir, target_exchanges):
+    """
+    Yields ((exchange, secType), DataFrame) groups from the extracted CSVs, filtered by
+    exchange, using the columns present in the file.
+    """
+    for exchange_name, csv_file in iter_split_files(extracted_dir, target_exchanges):
+        try:
+            # Compression of .csv.gz / .csv.zst files is inferred from the suffix
+            df = symbol_schema.read_csv(csv_file)
 
-                # Filter the DataFrame to ensure we only process symbols for the target exchange
-                df_filtered = df[df['exchange'] == exchange_name]
+            # Check for the actual column names from your sample
+            if 'symbol' not in df.columns or 'exchange' not in df.columns or 'securityType' not in df.columns:
+                raise ValueError("Missing one of the required columns ('symbol', 'exchange', 'securityType')")
 
-                if df_filtered.empty:
-                    continue
-                
-                # Group by the securityType to create the Redis key
-                grouped = df_filtered.groupby('securityType')
+            # Filter the DataFrame to ensure we only process symbols for the target exchange
+            df_filtered = df[df['exchange'] == exchange_name]
+
+            if df_filtered.empty:
+                continue
 
-                for sec_type, group_df in grouped:
-                    redis_key = f"symbols:{exchange_name}:{sec_type}"
-                    redis_client.set(redis_key, group_df.to_json(orient='records'))
-                    processed_count += len(group_df)
+            # Group by the securityType to create the Redis key
+            for sec_type, group_df in df_filtered.groupby('securityType', observed=True):
+                yield (exchange_name, sec_type), group_df
 
-            except Exception as e:
-                print(f"Error processing {csv_file}: {e}")
+        except Exception as e:
+            # A file that cannot be read aborts the load rather than dropping its groups
+            print(f"Error processing {csv_file}: {e}")
+            raise
+
+def serialize_split_file(task):
+    """
+    Worker of iter_serialized_groups: parses one split file a chunk at a time and returns its
+    groups as [((exchange, secType), serialize_group() payload)].
+
+    A split file only holds one exchange (its directory), so the rows are not filtered by
+    exchange again. Chunks are serialised as they are parsed and their JSON arrays joined, so
+    a worker holds one chunk of rows plus the serialised file, never a DataFrame of the file.
+    """
+    exchange_name, path, zip_source, layout, chunksize = task
+    blobs, records, row_counts = {}, {}, {}
+
+    def add_chunks(chunks):
+        for chunk in chunks:
+            if 'symbol' not in chunk.columns or 'securityType' not in chunk.columns:
+                raise ValueError("Missing one of the required columns ('symbol', 'securityType')")
+            for sec_type, group_df in chunk.groupby('securityType', observed=True):
+                blob, group_records, row_count = serialize_group(group_df, layout)
+                if blob is not None:
+                    blobs.setdefault(sec_type, []).append(blob[1:-1])
+                if group_records is not None:
+                    records.setdefault(sec_type, []).extend(group_records)
+                row_counts[sec_type] = row_counts.get(sec_type, 0) + row_count
+
+    if zip_source:
+        remote = zip_source.startswith(('http://', 'https://'))
+        source = HTTPRangeFile(zip_source) if remote else zip_source
+        try:
+            with zipfile.ZipFile(source) as zip_ref, zip_ref.open(path) as member_file, \
+                    file_codecs.open_reader(member_file, file_codecs.codec_from_path(path)) as reader:
+                add_chunks(symbol_schema.read_csv(reader, chunksize=chunksize))
+        finally:
+            if remote:
+                source.close()
+    else:
+        add_chunks(symbol_schema.read_csv(path, chunksize=chunksize))
+
+    return [((exchange_name, sec_type),
+             ('[' + ','.join(blobs[sec_type]) + ']' if sec_type in blobs else None, records.get(sec_type), row_count))
+            for sec_type, row_count in row_counts.items()]
+
+def iter_serialized_groups(tasks, workers=LOAD_WORKERS):
+    """
+    Runs serialize_split_file over (exchange, path, zip_source, layout, chunksize) tasks in a
+    pool of worker processes and yields their groups as they finish, largest files first.
+    At most two files per worker are in flight, so finished payloads never pile up in the
+    main process while it is writing to Redis.
+    """
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running = {}
+
+        def submit_next():
+            task = next(tasks, None)
+            if task is not None:
+                running[executor.submit(serialize_split_file, task)] = task[1]
+
+        for _ in range(2 * workers):
+            submit_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = running.pop(future)
+                submit_next()
+                try:
+                    groups = future.result()
+                except Exception as e:
+                    # A file that cannot be read aborts the load rather than dropping its groups
+                    print(f"Error processing {path}: {e}")
+                    executor.shutdown(cancel_futures=True)
+                    raise
+                yield from groups
+
+def split_file_tasks(target_exchanges, extracted_dir=None, zip_source=None, layout=REDIS_LAYOUT, chunksize=CSV_CHUNK_SIZE):
+    """
+    serialize_split_file tasks for the split files of the target exchanges, from an extracted
+    directory or from the members of by_exchange.zip (a local path or an http(s) URL),
+    ordered by size so the largest files do not end up last on a single worker.
+    """
+    sized = []
+    if zip_source:
+        remote = zip_source.startswith(('http://', 'https://'))
+        source = HTTPRangeFile(zip_source) if remote else zip_source
+        try:
+            with zipfile.ZipFile(source) as zip_ref:
+                members = split_members(zip_ref)
+                for exchange_name in target_exchanges:
+                    if exchange_name not in members:
+                        print(f"Warning: Exchange not found in zip for {exchange_name}")
+                        continue
+                    print(f"Processing symbols for exchange: {exchange_name}")
+                    sized.extend((zip_ref.getinfo(member).file_size, exchange_name, member) for member in members[exchange_name])
+        finally:
+            if remote:
+                source.close()
+    else:
+        sized = [(os.path.getsize(path), exchange_name, path) for exchange_name, path in iter_split_files(extracted_dir, target_exchanges)]
+
+    sized.sort(key=lambda item: item[0], reverse=True)
+    return [(exchange_name, path, zip_source, layout, chunksize) for _, exchange_name, path in sized]
+
+def process_and_store_symbols(extracted_dir, redis_client, target_exchanges, layout=REDIS_LAYOUT, chunk_size=REDIS_CHUNK_SIZE,
+                              workers=LOAD_WORKERS):
+    """
+    Processes extracted CSVs, filters by exchange, and stores symbols in Redis
+    using the columns present in the file. With workers > 1 the files are parsed and
+    serialised in that many processes (see iter_serialized_groups).
+    """
+    if workers > 1:
+        tasks = split_file_tasks(target_exchanges, extracted_dir=extracted_dir, layout=layout)
+        processed_count = store_serialized_groups(redis_client, iter_serialized_groups(tasks, workers), layout=layout,
+                                                  chunk_size=chunk_size)
+    else:
+        groups = iter_symbol_groups(extracted_dir, target_exchanges)
+        processed_count = store_symbol_groups(redis_client, groups, layout=layout, chunk_size=chunk_size)
+
+    print(f"\nFinished processing. Total symbols stored in Redis: {processed_count}")
+    return processed_count
+
+def process_and_store_symbols_from_dataset(output_dir, redis_client, target_exchanges, layout=REDIS_LAYOUT, chunk_size=REDIS_CHUNK_SIZE):
+    """
+    Reads only the target exchange partitions of the local Parquet dataset and stores
+    them in Redis under the same keys as process_and_store_symbols.
+    """
+    print(f"Loading {', '.join(target_exchanges)} from {os.path.join(output_dir, PARQUET_DIR)}")
+    df = load_symbols(output_dir, exchanges=target_exchanges)
+
+    groups = df.groupby(['exchange', 'securityType'], observed=True)
+    processed_count = store_symbol_groups(redis_client, groups, layout=layout, chunk_size=chunk_size)
+
+    print(f"\nFinished processing. Total symbols stored in Redis: {processed_count}")
+    return processed_count
+
+def process_and_store_symbols_filtered(redis_client, query_filter, base_url=DTN_BASE_URL, workers=DOWNLOAD_WORKERS,
+                                       layout=REDIS_LAYOUT, chunk_size=REDIS_CHUNK_SIZE):
+    """
+    Downloads only the symbols matching query_filter (one cursor per target exchange, flags
+    applied by the server) into its dtn_symbols/filtered/<key>/ directory and stores them in
+    Redis under the same keys as process_and_store_symbols.
+    """
+    from dtn_symbol_downloader import DTNCorrectAPIDownloader
+
+    downloader = DTNCorrectAPIDownloader(output_dir=query_filter.output_dir(LOCAL_OUTPUT_DIR), base_url=base_url)
+    downloader.query_filter = query_filter
+    query_filter.save(downloader.output_dir)
+    print(f"Downloading {query_filter.describe()} into {downloader.output_dir}")
+    df = downloader.download_all_symbols_parallel(workers=workers)
+    if df is None:
+        print("Filtered download failed")
+        return 0
+
+    groups = df.groupby(['exchange', 'securityType'], observed=True)
+    processed_count = store_symbol_groups(redis_client, groups, layout=layout, chunk_size=chunk_size)
 
     print(f"\nFinished processing. Total symbols stored in Redis: {processed_count}")
+    return processed_count
 
 def main():
+    r = connect_redis()
+
+    if DOWNLOAD_FILTERED:
+        process_and_store_symbols_filtered(r, DOWNLOAD_FILTER)
+        return
+
+    # Prefer a local Parquet dataset written by dtn_symbol_downloader.py --parquet, as long as it
+    # matches the local CSV (a later run without --parquet or the refresh daemon leave it behind)
+    if parquet_available() and parquet_is_current(LOCAL_OUTPUT_DIR):
+        process_and_store_symbols_from_dataset(LOCAL_OUTPUT_DIR, r, TARGET_EXCHANGES)
+        return
+
+    if STREAM_ZIP:
+        # Read only the target exchanges straight from the remote zip
+        if LOAD_WORKERS > 1:
+            tasks = split_file_tasks(TARGET_EXCHANGES, zip_source=ZIP_FILE_URL)
+            processed_count = store_serialized_groups(r, iter_serialized_groups(tasks, LOAD_WORKERS))
+        else:
+            groups = iter_symbol_groups_from_zip(ZIP_FILE_URL, TARGET_EXCHANGES)
+            processed_count = store_symbol_groups(r, groups)
+        print(f"\nFinished processing. Total symbols stored in Redis: {processed_count}")
+        return
+
     # 1. Download the file from the URL
     if not download_file(ZIP_FILE_URL, LOCAL_ZIP_PATH):
         return # Exit if download fails
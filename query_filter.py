@@ -0,0 +1,128 @@
+"""
+Server-side query filters for targeted downloads
+A QueryFilter restricts a download to some exchanges and security types and sets the
+QuerySymbolsDD noOptions/noSpreads/onlyFront flags, so the server only sends the symbols a
+consumer needs. Exchanges and security types become one nextKey cursor per (exchange, secType)
+partition. Each filter downloads into its own dtn_symbols/filtered/<key>/ directory, which keeps
+its journal, delta manifest and outputs apart from the full universe.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+FILTERED_DIR = "filtered"
+FILTER_FILE = "filter.json"
+
+# QuerySymbolsDD flag for each boolean filter
+SEARCH_FLAGS = {'no_options': 'noOptions', 'no_spreads': 'noSpreads', 'only_front': 'onlyFront'}
+
+
+def _split_list(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    values = [str(item).strip() for item in value if str(item).strip()]
+    return values or None
+
+
+class QueryFilter:
+    """Exchanges, security types and QuerySymbolsDD flags of a filtered download"""
+
+    def __init__(self, exchanges=None, security_types=None, no_options=False, no_spreads=False, only_front=False):
+        self.exchanges = _split_list(exchanges)
+        self.security_types = _split_list(security_types)
+        self.no_options = bool(no_options)
+        self.no_spreads = bool(no_spreads)
+        self.only_front = bool(only_front)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: data.get(key) for key in ('exchanges', 'security_types', *SEARCH_FLAGS)})
+
+    @classmethod
+    def from_args(cls, args):
+        """Build the filter from --filter-config and the --exchanges/--sec-types/... flags (flags win)"""
+        data = {}
+        if getattr(args, 'filter_config', None):
+            with open(args.filter_config, 'r') as f:
+                data = json.load(f)
+        return cls(exchanges=args.exchanges or data.get('exchanges'),
+                   security_types=args.sec_types or data.get('security_types'),
+                   no_options=args.no_options or data.get('no_options', False),
+                   no_spreads=args.no_spreads or data.get('no_spreads', False),
+                   only_front=args.front_only or data.get('only_front', False))
+
+    def __bool__(self):
+        return bool(self.exchanges or self.security_types or self.no_options or self.no_spreads or self.only_front)
+
+    def __repr__(self):
+        return f"QueryFilter({self.describe()})"
+
+    @property
+    def partitioned(self):
+        """Whether the filter needs one cursor per exchange/secType instead of a single one"""
+        return bool(self.exchanges or self.security_types)
+
+    def to_dict(self):
+        return {'exchanges': self.exchanges, 'security_types': self.security_types,
+                **{name: getattr(self, name) for name in SEARCH_FLAGS}}
+
+    def describe(self):
+        parts = []
+        if self.exchanges:
+            parts.append(f"exchanges {', '.join(self.exchanges)}")
+        if self.security_types:
+            parts.append(f"security types {', '.join(self.security_types)}")
+        parts.extend(name.replace('_', ' ') for name in SEARCH_FLAGS if getattr(self, name))
+        return '; '.join(parts) or 'no filter'
+
+    def key(self):
+        """Stable directory name for this filter, e.g. ex-CME+NYSE_no-options"""
+        parts = []
+        if self.exchanges:
+            parts.append('ex-' + '+'.join(sorted(set(self.exchanges))))
+        if self.security_types:
+            parts.append('type-' + '+'.join(sorted(set(self.security_types))))
+        parts.extend(name.replace('_', '-') for name in SEARCH_FLAGS if getattr(self, name))
+        key = re.sub(r'[^A-Za-z0-9+._-]', '-', '_'.join(parts)) or 'all'
+        if len(key) > 80:
+            key = f"{key[:60]}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]}"
+        return key
+
+    def output_dir(self, base_dir="dtn_symbols"):
+        return os.path.join(base_dir, FILTERED_DIR, self.key())
+
+    def save(self, output_dir):
+        """Record the filter next to its outputs"""
+        path = os.path.join(output_dir, FILTER_FILE)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def search_params(self):
+        """QuerySymbolsDD parameters overriding the downloader's defaults"""
+        return {flag: 'true' for name, flag in SEARCH_FLAGS.items() if getattr(self, name)}
+
+    def partitions(self, exchanges, security_types, partition_by='both'):
+        """(exchange, secType) cursors covering the filter, given the categories the server knows
+
+        A dimension the filter leaves open is split by its known values when partition_by asks
+        for it, like DTNCorrectAPIDownloader.get_partitions(), and left as None otherwise.
+        """
+        def restrict(wanted, known, label, split):
+            if not wanted:
+                return list(known) if split else [None]
+            unknown = [value for value in wanted if value not in known]
+            if unknown:
+                logger.warning(f"Unknown {label} in filter, skipped: {', '.join(unknown)}")
+            return [value for value in wanted if value in known]
+
+        wanted_exchanges = restrict(self.exchanges, exchanges, 'exchanges', partition_by in ('both', 'exchange'))
+        wanted_types = restrict(self.security_types, security_types, 'security types', partition_by in ('both', 'secType'))
+        return [(exchange, sec_type) for exchange in wanted_exchanges for sec_type in wanted_types]
@@ -0,0 +1,169 @@
+"""
+Adaptive request pacing for the DTN symbol search API
+AdaptiveRateController is a token bucket plus a concurrency limit that both follow server
+feedback: they grow while responses come back fast and clean (AIMD additive increase, with a
+slow start until the first sign of trouble) and are cut multiplicatively on 5xx responses,
+timeouts, the "backend search database" error or latency well above the observed baseline.
+The backend error also pauses every caller for a jittered, growing interval.
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+# Request outcomes reported back through release()
+OK = 'ok'
+SERVER_ERROR = 'server_error'
+BACKEND_ERROR = 'backend_error'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+BACKEND_ERROR_TEXT = 'backend search database'
+
+
+def backoff_delay(attempt, base, cap=300.0, rng=random):
+    """Exponential backoff with jitter: uniform in [d/2, d] for d = min(cap, base * 2**attempt)
+
+    Keeping half of the delay fixed still guarantees a real pause, while the random half stops
+    workers that failed together from retrying in lockstep.
+    """
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+class AdaptiveRateController:
+    """Token bucket and concurrency limit shared by all callers, adjusted by AIMD"""
+
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=50.0, initial_concurrency=2,
+                 min_concurrency=1, max_concurrency=8, increase=2.0, decrease=0.7, latency_tolerance=2.0,
+                 latency_slack=0.05, backend_pause=10.0, max_pause=120.0, burst=2.0):
+        self.rate = float(initial_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        # Latency counts as congestion once its moving average exceeds baseline * tolerance + slack
+        self.latency_tolerance = latency_tolerance
+        self.latency_slack = latency_slack
+        self.backend_pause = backend_pause
+        self.max_pause = max_pause
+        self.burst = burst
+
+        self.in_flight = 0
+        self.slow_start = True
+        self.baseline_latency = None
+        self.average_latency = None
+        self.stats = {'requests': 0, OK: 0, SERVER_ERROR: 0, BACKEND_ERROR: 0, TIMEOUT: 0, ERROR: 0,
+                      'decreases': 0, 'pauses': 0, 'peak_rate': self.rate}
+
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._backend_streak = 0
+        self._condition = threading.Condition()
+
+    def _reserve(self):
+        """Take a token and a concurrency slot, or return how long to wait before trying again"""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        if self.in_flight >= int(self.limit):
+            # Woken by release(); the timeout only guards against a missed notify
+            return 0.05
+        if self._tokens < 1.0:
+            return (1.0 - self._tokens) / self.rate
+        self._tokens -= 1.0
+        self.in_flight += 1
+        self.stats['requests'] += 1
+        return 0.0
+
+    def acquire(self):
+        """Block until a request may be sent; returns a ticket to pass to release()"""
+        with self._condition:
+            while True:
+                wait_time = self._reserve()
+                if not wait_time:
+                    return time.monotonic()
+                self._condition.wait(wait_time)
+
+    async def acquire_async(self):
+        """asyncio variant of acquire()"""
+        while True:
+            with self._condition:
+                wait_time = self._reserve()
+            if not wait_time:
+                return time.monotonic()
+            await asyncio.sleep(wait_time)
+
+    def release(self, ticket, outcome, latency=None):
+        """Report the outcome of a request started with acquire() and adapt rate and concurrency"""
+        with self._condition:
+            self.in_flight -= 1
+            self.stats[outcome] += 1
+            now = time.monotonic()
+            if latency is None:
+                latency = now - ticket
+
+            if outcome == OK:
+                self._backend_streak = 0
+                self._observe_latency(latency)
+                if self._congested():
+                    self._decrease(ticket, now, factor=(1 + self.decrease) / 2)
+                else:
+                    self._increase()
+            elif outcome == BACKEND_ERROR:
+                self._decrease(ticket, now)
+                pause = backoff_delay(self._backend_streak, self.backend_pause, self.max_pause)
+                self._backend_streak += 1
+                self._paused_until = max(self._paused_until, now + pause)
+                self.stats['pauses'] += 1
+            elif outcome in (SERVER_ERROR, TIMEOUT):
+                self._decrease(ticket, now)
+            self._condition.notify_all()
+
+    def _observe_latency(self, latency):
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        else:
+            # Drift upwards slowly so a lasting change in network latency is not read as congestion
+            self.baseline_latency = min(latency, self.baseline_latency * 1.001)
+        if self.average_latency is None:
+            self.average_latency = latency
+        else:
+            self.average_latency = 0.8 * self.average_latency + 0.2 * latency
+
+    def _congested(self):
+        if self.baseline_latency is None:
+            return False
+        return self.average_latency > self.baseline_latency * self.latency_tolerance + self.latency_slack
+
+    def _increase(self):
+        if self.slow_start:
+            # Roughly doubles the rate every second of clean responses
+            self.rate += 1.0
+        else:
+            # About `increase` requests/second more per second of clean responses
+            self.rate += self.increase / self.rate
+        self.rate = min(self.max_rate, self.rate)
+        self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+        self.stats['peak_rate'] = max(self.stats['peak_rate'], self.rate)
+
+    def _decrease(self, ticket, now, factor=None):
+        # Requests sent before the last cut were paced at the old rate, so their failures
+        # must not cut it again
+        if ticket < self._last_decrease:
+            return
+        factor = self.decrease if factor is None else factor
+        self.slow_start = False
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.limit = max(self.min_concurrency, self.limit * factor)
+        self._tokens = min(self._tokens, 0.0)
+        self._last_decrease = now
+        self.stats['decreases'] += 1
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Long-running refresh daemon
+Keeps one downloader (and the HTTP sessions of its worker threads), the category list and the
+current universe in memory, and refreshes on a schedule with DeltaSync against that universe,
+so partitions whose first page is unchanged cost one request and nothing is re-read from disk.
+When a refresh changes anything, the new snapshot is swapped into each output atomically:
+all_symbols_latest.csv by os.replace(), the symbol index by directory rename, the SQLite
+store by os.replace() and Redis by process_symbols' MULTI/EXEC swap. A small HTTP endpoint on
+localhost serves status and lookups from the in-memory index.
+"""
+
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from delta_sync import DeltaSync
+from dtn_symbol_downloader import DTNCorrectAPIDownloader
+from run_metrics import REPORT_FILE, RunMetrics
+from symbol_index import INDEX_DIR, SymbolIndex
+
+logger = logging.getLogger(__name__)
+
+DAEMON_PORT = 8765
+REFRESH_INTERVAL = 24 * 3600  # Seconds between refreshes, matching the daily workflow
+CATEGORIES_TTL = 24 * 3600  # Seconds before the exchange/security type list is fetched again
+RETRY_INTERVAL = 15 * 60  # Seconds before a failed refresh is retried
+
+
+class RefreshDaemon:
+    """Refreshes the symbol universe on a schedule and publishes each changed snapshot"""
+
+    def __init__(self, downloader, interval=REFRESH_INTERVAL, workers=4, rate=None, redis_client=None,
+                 redis_exchanges=None, sqlite=False):
+        self.downloader = downloader
+        self.output_dir = downloader.output_dir
+        self.interval = interval
+        self.workers = workers
+        self.rate = rate
+        self.redis = redis_client
+        self.redis_exchanges = redis_exchanges
+        self.sqlite = sqlite
+        # One pool for the daemon's lifetime: its threads keep their sessions between refreshes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresh")
+        self.universe = None
+        self.index = None
+        self._categories = None
+        self._categories_fetched = 0.0
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self.status = {
+            'state': 'starting', 'started': datetime.now().isoformat(timespec='seconds'), 'ready_seconds': None,
+            'version': 0, 'symbols': 0, 'refreshes': 0, 'failures': 0, 'last_refresh': None, 'next_refresh': None,
+        }
+
+    def categories(self):
+        """Exchange/security type list, fetched again after CATEGORIES_TTL"""
+        if self._categories is None or time.monotonic() - self._categories_fetched > CATEGORIES_TTL:
+            categories = self.downloader.get_categories()
+            if categories:
+                self._categories = categories
+                self._categories_fetched = time.monotonic()
+            elif self._categories is not None:
+                logger.warning("Could not refresh categories, keeping the cached ones")
+        return self._categories
+
+    def refresh(self):
+        """Run one refresh and publish its snapshot if anything changed; True on success"""
+        with self._refresh_lock:
+            started = datetime.now()
+            start = time.perf_counter()
+            self.status['state'] = 'refreshing'
+            metrics = self.downloader.metrics = RunMetrics()
+            metrics.set_info(mode='daemon', success=False)
+            outcome = {'started': started.isoformat(timespec='seconds'), 'changed_partitions': 0, 'published': False,
+                       'error': None}
+            try:
+                categories = self.categories()
+                sync = DeltaSync(self.downloader)
+                with metrics.phase('download'):
+                    current_df = sync.run(workers=self.workers, rate=self.rate, previous_df=self.universe,
+                                          categories=categories, executor=self.executor) if categories else None
+                if current_df is None:
+                    raise RuntimeError("delta sync failed" if categories else "could not retrieve categories")
+
+                outcome['changed_partitions'] = len(sync.changed_partitions)
+                if sync.changed_partitions or self.index is None:
+                    self.publish(current_df, metrics)
+                    outcome['published'] = True
+                else:
+                    logger.info("No partition changed, outputs left as they are")
+                self.universe = current_df
+                self.status['refreshes'] += 1
+                metrics.set_info(success=True, total_symbols=len(current_df), changed_partitions=len(sync.changed_partitions),
+                                 version=self.status['version'])
+            except Exception as e:
+                logger.error(f"Refresh failed: {e}")
+                outcome['error'] = str(e)
+                self.status['failures'] += 1
+            finally:
+                outcome['seconds'] = round(time.perf_counter() - start, 3)
+                self.status.update(state='idle', last_refresh=outcome)
+                metrics.write_report(os.path.join(self.output_dir, REPORT_FILE))
+            return outcome['error'] is None
+
+    def publish(self, df, metrics):
+        """Swap the snapshot into every output, each one atomically, then into the lookup endpoint"""
+        with metrics.phase('index'):
+            index = SymbolIndex.from_dataframe(df)
+            index.save(os.path.join(self.output_dir, INDEX_DIR))
+        if self.sqlite:
+            from symbol_db import DB_FILE, build
+            with metrics.phase('sqlite'):
+                build(df, os.path.join(self.output_dir, DB_FILE))
+        if self.redis is not None:
+            from process_symbols import store_symbol_groups
+            groups_df = df if self.redis_exchanges is None else df[df['exchange'].isin(self.redis_exchanges)]
+            with metrics.phase('redis'):
+                stored = store_symbol_groups(self.redis, groups_df.groupby(['exchange', 'securityType'], observed=True))
+            metrics.set_info(redis_symbols=stored)
+        self.index = index
+        self.status.update(version=self.status['version'] + 1, symbols=len(df),
+                           published=datetime.now().isoformat(timespec='seconds'))
+        logger.info(f"Published snapshot {self.status['version']}: {len(df):,} symbols")
+
+    def request_refresh(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def run(self, port=DAEMON_PORT, host="127.0.0.1"):
+        """Serve the HTTP endpoint and refresh until stop() (or SIGTERM/SIGINT)"""
+        server = ThreadingHTTPServer((host, port), DaemonHandler)
+        server.refresh_daemon = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Refresh daemon listening on http://{host}:{server.server_address[1]}")
+        start = time.perf_counter()
+        try:
+            while not self._stopping.is_set():
+                succeeded = self.refresh()
+                if self.status['ready_seconds'] is None and self.index is not None:
+                    self.status['ready_seconds'] = round(time.perf_counter() - start, 3)
+                wait = self.interval if succeeded else min(self.interval, RETRY_INTERVAL)
+                self.status['next_refresh'] = (datetime.now() + timedelta(seconds=wait)).isoformat(timespec='seconds')
+                self._wake.wait(wait)
+                self._wake.clear()
+        finally:
+            server.shutdown()
+            self.executor.shutdown()
+            self.status['state'] = 'stopped'
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """GET /status, /symbols/<symbol>, /prefix/<prefix>, /fuzzy/<query>; POST /refresh"""
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        daemon = self.server.refresh_daemon
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/", 1)
+        if parts == ["status"]:
+            return self._send_json(daemon.status)
+
+        index = daemon.index
+        if len(parts) != 2 or parts[0] not in ("symbols", "prefix", "fuzzy"):
+            return self._send_json({"error": "not found"}, 404)
+        if index is None:
+            return self._send_json({"error": "no snapshot loaded yet"}, 503)
+        term = unquote(parts[1])
+        try:
+            limit = int(query.get("limit", 100))
+        except ValueError:
+            return self._send_json({"error": "limit must be an integer"}, 400)
+        filters = {"exchange": query.get("exchange"), "security_type": query.get("sec_type")}
+        if parts[0] == "symbols":
+            record = index.get(term)
+            return self._send_json(record if record is not None else {"error": f"unknown symbol {term}"},
+                                   200 if record is not None else 404)
+        if parts[0] == "prefix":
+            return self._send_json({"version": daemon.status['version'], "results": index.prefix(term, limit=limit, **filters)})
+        return self._send_json({"version": daemon.status['version'],
+                                "results": index.fuzzy(term, limit=min(limit, 100), **filters)})
+
+    def do_POST(self):
+        if urlparse(self.path).path.strip("/") != "refresh":
+            return self._send_json({"error": "not found"}, 404)
+        self.server.refresh_daemon.request_refresh()
+        self._send_json({"refresh": "requested"}, 202)
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Refresh the symbol universe on a schedule and serve lookups')
+    parser.add_argument('--output-dir', default='dtn_symbols')
+    parser.add_argument('--base-url', help='DTN API base URL (e.g. a fake_dtn_server.py address)', default='https://ws1.dtn.com')
+    parser.add_argument('--interval', type=float, help='Seconds between refreshes', default=REFRESH_INTERVAL)
+    parser.add_argument('--workers', type=int, help='Partition download threads', default=4)
+    parser.add_argument('--rate', type=float, help='Global request rate limit (requests/second)', default=None)
+    parser.add_argument('--port', type=int, help='Local HTTP port for status and lookups', default=DAEMON_PORT)
+    parser.add_argument('--sqlite', action='store_true', help='Also publish each snapshot to the SQLite store')
+    parser.add_argument('--redis', help='Also publish each snapshot to this Redis (redis://host:port/db)', default=None)
+    parser.add_argument('--redis-exchanges', help='Comma-separated exchanges to publish to Redis (default: all)', default=None)
+    args = parser.parse_args()
+
+    redis_client = None
+    if args.redis:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis, decode_responses=True)
+    daemon = RefreshDaemon(DTNCorrectAPIDownloader(output_dir=args.output_dir, base_url=args.base_url),
+                           interval=args.interval, workers=args.workers, rate=args.rate, redis_client=redis_client,
+                           redis_exchanges=args.redis_exchanges.split(',') if args.redis_exchanges else None,
+                           sqlite=args.sqlite)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: daemon.stop())
+    daemon.run(port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Phase timers and counters for one download run
+RunMetrics is shared by the downloader, its worker threads and the streaming writer. Phase times
+are summed over all threads, so with parallel workers a phase can add up to more than the wall
+time of the run. The collected numbers are exported as a JSON run report (which the GitHub
+workflow's summary step reads) and optionally in the Prometheus text exposition format.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_FILE = "run_report.json"
+PROMETHEUS_PREFIX = "dtn_symbols"
+
+# Phases reported in this order; other phases follow alphabetically
+PHASES = ['download', 'rate_wait', 'network', 'decode', 'dataframe_build', 'journal_write', 'dedup',
+          'csv_write', 'stats', 'sleep', 'backoff', 'combine', 'split', 'parquet', 'index', 'chains', 'sqlite', 'snapshot']
+
+
+class RunMetrics:
+    """Thread-safe phase timers, counters and info values for one run"""
+
+    def __init__(self):
+        self.started = datetime.now()
+        self.phases = {}
+        self.counters = {}
+        self.info = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as one call of phase name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            entry = self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            entry['seconds'] += seconds
+            entry['calls'] += 1
+
+    def incr(self, name, kind=None, value=1):
+        """Add value to counter name, or to its kind sub-counter (e.g. incr('errors', 'backend'))"""
+        with self._lock:
+            if kind is None:
+                self.counters[name] = self.counters.get(name, 0) + value
+            else:
+                kinds = self.counters.setdefault(name, {})
+                kinds[kind] = kinds.get(kind, 0) + value
+
+    def set_info(self, **values):
+        with self._lock:
+            self.info.update(values)
+
+    def phase_seconds(self, name):
+        return self.phases.get(name, {}).get('seconds', 0.0)
+
+    def report(self):
+        """The run report as a JSON-serializable dict"""
+        with self._lock:
+            order = {name: i for i, name in enumerate(PHASES)}
+            phases = {name: {'seconds': round(entry['seconds'], 4), 'calls': entry['calls']}
+                      for name, entry in sorted(self.phases.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))}
+            counters = json.loads(json.dumps(self.counters))
+            info = dict(self.info)
+
+        finished = datetime.now()
+        download_seconds = phases.get('download', {}).get('seconds', 0.0)
+        rows = counters.get('rows_received', 0)
+        received = counters.get('bytes_received', 0)
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': finished.isoformat(timespec='seconds'),
+            'wall_seconds': round((finished - self.started).total_seconds(), 3),
+            'rows_per_second': round(rows / download_seconds, 1) if download_seconds else None,
+            'bytes_per_second': round(received / download_seconds, 1) if download_seconds else None,
+            'phases': phases,
+            'counters': counters,
+            **info,
+        }
+
+    def write_report(self, path):
+        """Write the JSON run report atomically"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.report(), f, indent=2, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """The run's metrics in the Prometheus text exposition format"""
+        report = self.report()
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+        metric('run_seconds', 'gauge', 'Wall time of the run', [({}, report['wall_seconds'])])
+        metric('phase_seconds_total', 'counter', 'Time spent per phase, summed over threads',
+               [({'phase': name}, entry['seconds']) for name, entry in report['phases'].items()])
+        metric('phase_calls_total', 'counter', 'Timed calls per phase',
+               [({'phase': name}, entry['calls']) for name, entry in report['phases'].items()])
+        for name, value in sorted(report['counters'].items()):
+            if isinstance(value, dict):
+                metric(f"{name}_total", 'counter', f"{name.replace('_', ' ').capitalize()} by type",
+                       [({'type': kind}, count) for kind, count in sorted(value.items())])
+            else:
+                metric(f"{name}_total", 'counter', name.replace('_', ' ').capitalize(), [({}, value)])
+        if report['rows_per_second'] is not None:
+            metric('rows_per_second', 'gauge', 'Symbols received per second of download',
+                   [({}, report['rows_per_second'])])
+        if 'total_symbols' in report:
+            metric('symbols', 'gauge', 'Unique symbols in the output', [({}, report['total_symbols'])])
+        for column, label in (('security_types', 'security_type'), ('exchanges', 'exchange')):
+            if report.get(column):
+                metric(f"{column}_symbols", 'gauge', f"Symbols per {label.replace('_', ' ')}",
+                       [({label: key}, count) for key, count in report[column].items()])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix=PROMETHEUS_PREFIX):
+        """Write the Prometheus text format atomically (e.g. for node_exporter's textfile collector)"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(tmp_path, path)
+        return path
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
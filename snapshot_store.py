@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store of symbol universe snapshots
+Every exchange/secType partition of a snapshot is stored once under its content hash (the same
+order-independent hash delta_sync keeps in partition_manifest.json), as a gzipped CSV sorted by
+symbol. A small JSON manifest per snapshot maps partitions to hashes, so an unchanged partition
+costs nothing in the next snapshot and the history grows with churn rather than with size.
+Loading a snapshot as of a date is a manifest lookup plus reads of the partitions asked for.
+
+    python snapshot_store.py commit                      # store dtn_symbols/all_symbols_latest.csv
+    python snapshot_store.py list
+    python snapshot_store.py checkout --as-of 2025-06-01 --exchanges CME --output cme.csv
+    python snapshot_store.py gc --keep 60
+"""
+
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, time as day_time
+
+import pandas as pd
+
+import symbol_schema
+from delta_sync import content_hash, partition_key
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = "snapshots"
+OBJECTS_DIR = "objects"
+MANIFESTS_DIR = "manifests"
+SNAPSHOT_ID_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def parse_as_of(as_of):
+    """datetime for an as-of argument; a bare date means the end of that day"""
+    if as_of is None or isinstance(as_of, datetime):
+        return as_of
+    text = str(as_of).strip()
+    try:
+        return datetime.strptime(text, SNAPSHOT_ID_FORMAT)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(text)
+    if len(text) <= len("YYYY-MM-DD"):
+        parsed = datetime.combine(parsed.date(), day_time.max)
+    return parsed
+
+
+class SnapshotStore:
+    """Snapshots of the symbol universe with partitions deduplicated by content hash"""
+
+    def __init__(self, root=os.path.join("dtn_symbols", SNAPSHOT_DIR)):
+        self.root = root
+        self.objects_dir = os.path.join(root, OBJECTS_DIR)
+        self.manifests_dir = os.path.join(root, MANIFESTS_DIR)
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.csv.gz")
+
+    def manifest_path(self, snapshot_id):
+        return os.path.join(self.manifests_dir, f"{snapshot_id}.json")
+
+    def snapshots(self):
+        """Snapshot ids, oldest first"""
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        return sorted(name[:-len(".json")] for name in os.listdir(self.manifests_dir) if name.endswith(".json"))
+
+    def manifest(self, snapshot_id):
+        with open(self.manifest_path(snapshot_id), 'r') as f:
+            return json.load(f)
+
+    def resolve(self, as_of=None):
+        """Id of the latest snapshot taken at or before as_of (the latest overall without it)"""
+        snapshots = self.snapshots()
+        as_of = parse_as_of(as_of)
+        if as_of is not None:
+            snapshots = [s for s in snapshots if datetime.strptime(s, SNAPSHOT_ID_FORMAT) <= as_of]
+        if not snapshots:
+            raise LookupError(f"No snapshot in {self.root}" + (f" as of {as_of}" if as_of else ""))
+        return snapshots[-1]
+
+    def _write_object(self, digest, df):
+        """Store one partition unless an identical one is already there, return bytes written"""
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Canonical bytes: rows sorted by symbol, fixed gzip header (mtime=0)
+        data = df.sort_values('symbol', kind='stable').to_csv(index=False).encode('utf-8')
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=6, mtime=0))
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    def commit(self, df, snapshot_id=None):
+        """Store a snapshot of the universe and return its manifest"""
+        snapshot_id = snapshot_id or datetime.now().strftime(SNAPSHOT_ID_FORMAT)
+        partitions = {}
+        new_objects = 0
+        bytes_written = 0
+        for (exchange, sec_type), group in df.groupby(['exchange', 'securityType'], sort=True, observed=True, dropna=False):
+            key = partition_key(exchange, sec_type)
+            digest = content_hash(group)
+            written = self._write_object(digest, group)
+            new_objects += bool(written)
+            bytes_written += written
+            partitions[key] = {'exchange': exchange, 'security_type': sec_type, 'hash': digest, 'rows': len(group)}
+
+        manifest = {
+            'id': snapshot_id,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'columns': list(df.columns),
+            'total': int(sum(entry['rows'] for entry in partitions.values())),
+            'partitions': partitions,
+        }
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        tmp_path = self.manifest_path(snapshot_id) + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, default=str)
+        os.replace(tmp_path, self.manifest_path(snapshot_id))
+
+        logger.info(f"Snapshot {snapshot_id}: {len(partitions)} partitions, {new_objects} new "
+                    f"({bytes_written / (1024 * 1024):.2f} MB written), {manifest['total']:,} symbols")
+        return manifest
+
+    def load(self, as_of=None, exchanges=None, security_types=None, columns=None):
+        """Load the snapshot as of a date, reading only the partitions that match the filters"""
+        manifest = self.manifest(self.resolve(as_of))
+        wanted = [entry for entry in manifest['partitions'].values()
+                  if (exchanges is None or entry['exchange'] in exchanges)
+                  and (security_types is None or entry['security_type'] in security_types)]
+        usecols = None if columns is None else list(columns)
+        parts = [symbol_schema.read_csv(self.object_path(entry['hash']), usecols=usecols) for entry in wanted]
+        if not parts:
+            return pd.DataFrame(columns=usecols or manifest['columns'])
+        df = pd.concat(parts, ignore_index=True)
+        df = df[[column for column in (usecols or manifest['columns']) if column in df.columns]]
+        return symbol_schema.apply_schema(df)
+
+    def gc(self, keep=None):
+        """Drop all but the newest keep snapshots, then every object no snapshot refers to"""
+        snapshots = self.snapshots()
+        if keep is not None and len(snapshots) > keep:
+            for snapshot_id in snapshots[:len(snapshots) - keep]:
+                os.remove(self.manifest_path(snapshot_id))
+            snapshots = snapshots[len(snapshots) - keep:]
+
+        referenced = {entry['hash'] for snapshot_id in snapshots
+                      for entry in self.manifest(snapshot_id)['partitions'].values()}
+        removed = 0
+        if os.path.isdir(self.objects_dir):
+            for root, _, files in os.walk(self.objects_dir):
+                for name in files:
+                    if name.split('.')[0] not in referenced:
+                        os.remove(os.path.join(root, name))
+                        removed += 1
+        logger.info(f"Kept {len(snapshots)} snapshots, removed {removed} unreferenced objects")
+        return removed
+
+    def size(self):
+        """Bytes used by the objects and manifests"""
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, files in os.walk(self.root) for name in files)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Content-addressed symbol snapshot store')
+    parser.add_argument('--root', help='Store directory', default=os.path.join("dtn_symbols", SNAPSHOT_DIR))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commit = commands.add_parser('commit', help='Store a CSV of the universe as a new snapshot')
+    commit.add_argument('--csv', help='Universe to store', default=os.path.join("dtn_symbols", "all_symbols_latest.csv"))
+
+    commands.add_parser('list', help='List snapshots')
+
+    checkout = commands.add_parser('checkout', help='Write (part of) a snapshot as CSV')
+    checkout.add_argument('--as-of', help='Date or time (YYYY-MM-DD[ HH:MM:SS]); the latest snapshot by default', default=None)
+    checkout.add_argument('--exchanges', help='Comma-separated exchanges', default=None)
+    checkout.add_argument('--sec-types', help='Comma-separated security types', default=None)
+    checkout.add_argument('--output', help='CSV to write', default=os.path.join("dtn_symbols", "all_symbols_latest.csv"))
+
+    gc = commands.add_parser('gc', help='Drop old snapshots and unreferenced objects')
+    gc.add_argument('--keep', type=int, help='Snapshots to keep', default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = SnapshotStore(args.root)
+
+    if args.command == 'commit':
+        store.commit(symbol_schema.read_csv(args.csv))
+        print(f"Store size: {store.size() / (1024 * 1024):.2f} MB")
+    elif args.command == 'list':
+        for snapshot_id in store.snapshots():
+            manifest = store.manifest(snapshot_id)
+            print(f"{snapshot_id}  {manifest['total']:>10,} symbols  {len(manifest['partitions']):>5} partitions")
+        print(f"Store size: {store.size() / (1024 * 1024):.2f} MB")
+    elif args.command == 'checkout':
+        split = lambda value: value.split(',') if value else None
+        df = store.load(args.as_of, exchanges=split(args.exchanges), security_types=split(args.sec_types))
+        tmp_path = args.output + ".tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, args.output)
+        print(f"Wrote {len(df):,} symbols from snapshot {store.resolve(args.as_of)} to {args.output}")
+    elif args.command == 'gc':
+        store.gc(keep=args.keep)
+        print(f"Store size: {store.size() / (1024 * 1024):.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
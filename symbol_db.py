@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+SQLite store of the symbol universe with full-text search over descriptions
+Each run is bulk-loaded into a fresh database file next to the live one, in large transactions
+with WAL and indexes built after the rows are in, then swapped in with os.replace(): readers keep
+the snapshot they opened and the next connection sees the new one. symbol, exchange/securityType
+and securityType are indexed and descriptions go into an FTS5 table, so lookups like "which
+symbols mention crude oil" or "CME futures" need neither a CSV parse nor a full scan.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+import symbol_schema
+
+DB_FILE = "symbols.db"
+BATCH_ROWS = 200000
+FORMAT_VERSION = 1
+
+INDEXES = {
+    "idx_symbols_symbol": "symbol",
+    "idx_symbols_exchange_type": "exchange, securityType",
+}
+
+
+def _column_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _rows(df):
+    """Row tuples of plain Python values (NaN and NA become NULL)"""
+    columns = []
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Indexing the few categories by code is much faster than converting every value
+            categories = np.append(values.cat.categories.to_numpy(dtype=object), None)
+            columns.append(categories[values.cat.codes.to_numpy()].tolist())
+            continue
+        if values.hasnans:
+            values = values.astype(object).where(values.notna(), None)
+        columns.append(values.tolist())
+    return list(zip(*columns))
+
+
+def fts_query(text):
+    """FTS5 MATCH expression requiring every word of text; a trailing * keeps a word a prefix"""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*')
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ('*' if prefix else ''))
+    if not terms:
+        raise ValueError("Empty search")
+    return " ".join(terms)
+
+
+def build(source, path, batch_rows=BATCH_ROWS):
+    """Load a symbol DataFrame, or a CSV of one (read in chunks), into a new database at path
+
+    The database is written to path + '.tmp' and moved over path only once it is complete.
+    A DataFrame is loaded in symbol order, so search results (which come in load order) are sorted
+    by symbol; a CSV is loaded in file order. Returns the number of rows loaded.
+    """
+    tmp_path = path + ".tmp"
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+
+    if isinstance(source, str):
+        chunks = symbol_schema.read_csv(source, chunksize=batch_rows)
+    else:
+        source = source.sort_values([c for c in ('exchange', 'securityType', 'symbol') if c in source.columns], kind='stable')
+        chunks = (source.iloc[start:start + batch_rows] for start in range(0, len(source), batch_rows))
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        # The file is thrown away if the load does not finish, so there is nothing to fsync for
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.execute("PRAGMA cache_size=-262144")
+        connection.execute("PRAGMA temp_store=MEMORY")
+
+        rows = 0
+        insert = None
+        for chunk in chunks:
+            if insert is None:
+                columns = list(chunk.columns)
+                if 'symbol' not in columns:
+                    raise ValueError("Symbol table has no symbol column")
+                definitions = ", ".join(f"{_quote(c)} {_column_type(chunk[c].dtype)}" for c in columns)
+                connection.execute(f"CREATE TABLE symbols ({definitions})")
+                insert = (f"INSERT INTO symbols ({', '.join(_quote(c) for c in columns)}) "
+                          f"VALUES ({', '.join('?' * len(columns))})")
+            with connection:
+                connection.executemany(insert, _rows(chunk[columns]))
+            rows += len(chunk)
+        if insert is None:
+            raise ValueError(f"No symbols to load from {source if isinstance(source, str) else 'DataFrame'}")
+
+        with connection:
+            for name, indexed in INDEXES.items():
+                if all(column.strip() in columns for column in indexed.split(',')):
+                    connection.execute(f"CREATE INDEX {name} ON symbols ({indexed})")
+            if 'description' in columns:
+                connection.execute("CREATE VIRTUAL TABLE symbols_fts USING fts5(description, content='symbols', "
+                                   "content_rowid='rowid')")
+                connection.execute("INSERT INTO symbols_fts (rowid, description) SELECT rowid, description FROM symbols")
+            connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('version', str(FORMAT_VERSION)), ('created', datetime.now().isoformat(timespec='seconds')),
+                ('rows', str(rows)), ('columns', json.dumps(columns))])
+        connection.execute("ANALYZE")
+
+        # Back to a rollback journal, so the published file is self-contained and can be opened read-only
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        connection.close()
+
+    os.replace(tmp_path, path)
+    return rows
+
+
+class SymbolDB:
+    """Read-only queries against a database written by build()"""
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No symbol database at {path}")
+        self.path = path
+        self.connection = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True,
+                                          check_same_thread=False)
+        meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        if meta.get('version') != str(FORMAT_VERSION):
+            raise ValueError(f"Unsupported symbol database version {meta.get('version')} in {path}")
+        self.columns = json.loads(meta['columns'])
+        self.created = meta['created']
+        self.rows = int(meta['rows'])
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sql(self, query, params=()):
+        """Run any read-only SQL and return the result as a DataFrame"""
+        return pd.read_sql_query(query, self.connection, params=params)
+
+    def _select(self, where, params, columns=None, limit=None, order="s.symbol", source="symbols s"):
+        selected = ", ".join(f"s.{_quote(c)}" for c in (columns or self.columns))
+        query = f"SELECT {selected} FROM {source}"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        if order:
+            query += f" ORDER BY {order}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params = list(params) + [int(limit)]
+        return symbol_schema.apply_schema(self.sql(query, params))
+
+    @staticmethod
+    def _filters(exchange, security_type):
+        where, params = [], []
+        for column, values in (("exchange", exchange), ("securityType", security_type)):
+            if values is None:
+                continue
+            values = [values] if isinstance(values, str) else list(values)
+            where.append(f"s.{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        return where, params
+
+    def get(self, symbol):
+        """Row of one symbol as a dict, or None"""
+        found = self._select(["s.symbol = ?"], [symbol], limit=1, order=None)
+        return found.iloc[0].to_dict() if len(found) else None
+
+    def select(self, exchange=None, security_type=None, prefix=None, columns=None, limit=None):
+        """Symbols of the given exchange(s)/security type(s), optionally starting with prefix"""
+        where, params = self._filters(exchange, security_type)
+        if prefix:
+            # A range rather than LIKE, so the symbol index is used
+            where.append("s.symbol >= ? AND s.symbol < ?")
+            params.extend([prefix, prefix + "\U0010ffff"])
+        return self._select(where, params, columns=columns, limit=limit)
+
+    def search(self, text, exchange=None, security_type=None, columns=None, limit=100):
+        """Symbols whose description contains every word of text, in load order
+
+        Matches are not ranked: ordering by bm25 needs every match first, which turns a
+        sub-millisecond lookup of a common word into a scan. Use sql() with ORDER BY rank for that.
+        """
+        where, params = self._filters(exchange, security_type)
+        return self._select(["symbols_fts MATCH ?"] + where, [fts_query(text)] + params, columns=columns, limit=limit,
+                            order="f.rowid", source="symbols_fts f JOIN symbols s ON s.rowid = f.rowid")
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or query the SQLite symbol store')
+    parser.add_argument('--output-dir', help='Directory holding the downloaded symbols', default='dtn_symbols')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help='Load all_symbols_latest.csv into the database')
+    search = subparsers.add_parser('search', help='Full-text search over descriptions')
+    search.add_argument('text', help='Words that must all appear, e.g. "crude oil" (word* for a prefix)')
+    select = subparsers.add_parser('select', help='Symbols by exchange/security type/prefix')
+    select.add_argument('--prefix', default=None)
+    for command in (search, select):
+        command.add_argument('--exchange', action='append', default=None)
+        command.add_argument('--type', action='append', default=None)
+        command.add_argument('--limit', type=int, default=100)
+    sql = subparsers.add_parser('sql', help='Run a read-only SQL query against the symbols table')
+    sql.add_argument('query')
+    args = parser.parse_args()
+
+    db_path = os.path.join(args.output_dir, DB_FILE)
+    if args.command == 'build':
+        start = time.perf_counter()
+        rows = build(os.path.join(args.output_dir, "all_symbols_latest.csv"), db_path)
+        print(f"Loaded {rows:,} symbols into {db_path} in {time.perf_counter() - start:.1f} seconds")
+        return
+
+    with SymbolDB(db_path) as db:
+        start = time.perf_counter()
+        if args.command == 'search':
+            results = db.search(args.text, exchange=args.exchange, security_type=args.type, limit=args.limit)
+        elif args.command == 'select':
+            results = db.select(exchange=args.exchange, security_type=args.type, prefix=args.prefix, limit=args.limit)
+        else:
+            results = db.sql(args.query)
+        elapsed = time.perf_counter() - start
+
+    if len(results):
+        print(results.to_string(index=False))
+    else:
+        print("No matches")
+    print(f"\n{len(results)} result(s) in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
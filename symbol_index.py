@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+In-process symbol lookup index
+Symbols are kept in one sorted fixed-width byte array, so exact and prefix lookups are a binary
+search (np.searchsorted), with exchange/securityType/listedMarket stored as small integer codes
+and descriptions as one byte blob plus offsets. The index is saved as plain .npy files that are
+memory-mapped on load instead of re-parsing the CSV.
+"""
+
+import difflib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+INDEX_DIR = "symbol_index"
+CATEGORY_COLUMNS = ["exchange", "securityType", "listedMarket"]
+FORMAT_VERSION = 1
+
+
+class SymbolIndex:
+    """Sorted-array index over the symbol universe with exact, prefix and fuzzy lookups"""
+
+    def __init__(self, symbols, codes, categories, description_offsets=None, description_blob=None):
+        self.symbols = symbols
+        self.codes = codes
+        self.categories = categories
+        self.description_offsets = description_offsets
+        self.description_blob = description_blob
+        self._category_lookup = {column: {value: i for i, value in enumerate(values)}
+                                 for column, values in categories.items()}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Build an index from a DataFrame with at least a symbol column"""
+        df = df.drop_duplicates(subset=['symbol'])
+        encoded = df['symbol'].astype(str).str.encode('utf-8').to_numpy()
+        symbols = np.array(encoded, dtype=f"S{max(1, max((len(s) for s in encoded), default=1))}")
+        order = np.argsort(symbols, kind='stable')
+        symbols = symbols[order]
+
+        codes, categories = {}, {}
+        for column in CATEGORY_COLUMNS:
+            if column in df.columns:
+                values = df[column].astype(str).to_numpy()[order]
+                column_codes, uniques = pd.factorize(values, sort=True)
+                dtype = np.uint8 if len(uniques) < 256 else np.uint16 if len(uniques) < 65536 else np.uint32
+                codes[column] = column_codes.astype(dtype)
+                categories[column] = [str(value) for value in uniques]
+
+        description_offsets = description_blob = None
+        if 'description' in df.columns:
+            encoded = df['description'].fillna('').astype(str).str.encode('utf-8').to_numpy()[order]
+            lengths = np.fromiter((len(d) for d in encoded), dtype=np.int64, count=len(encoded))
+            description_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=description_offsets[1:])
+            description_blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+        return cls(symbols, codes, categories, description_offsets, description_blob)
+
+    @classmethod
+    def from_csv(cls, output_dir="dtn_symbols"):
+        """Build an index from the downloaded universe (Parquet dataset if present, else CSV)"""
+        from symbol_io import load_symbols
+        return cls.from_dataframe(load_symbols(output_dir))
+
+    def save(self, directory):
+        """Persist the index as .npy files plus a small JSON header, replacing any previous one"""
+        tmp_dir = directory + ".tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        np.save(os.path.join(tmp_dir, "symbols.npy"), self.symbols)
+        for column, column_codes in self.codes.items():
+            np.save(os.path.join(tmp_dir, f"codes_{column}.npy"), column_codes)
+        if self.description_offsets is not None:
+            np.save(os.path.join(tmp_dir, "description_offsets.npy"), self.description_offsets)
+            np.save(os.path.join(tmp_dir, "description_blob.npy"), self.description_blob)
+        with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'count': len(self), 'categories': self.categories}, f)
+
+        old_dir = directory + ".old"
+        if os.path.exists(directory):
+            os.rename(directory, old_dir)
+        os.rename(tmp_dir, directory)
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a saved index; with mmap=True the arrays are memory-mapped, not read"""
+        mode = 'r' if mmap else None
+        with open(os.path.join(directory, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported symbol index version {meta.get('version')} in {directory}")
+
+        symbols = np.load(os.path.join(directory, "symbols.npy"), mmap_mode=mode)
+        codes = {column: np.load(os.path.join(directory, f"codes_{column}.npy"), mmap_mode=mode)
+                 for column in meta['categories']}
+        description_offsets = description_blob = None
+        if os.path.exists(os.path.join(directory, "description_offsets.npy")):
+            description_offsets = np.load(os.path.join(directory, "description_offsets.npy"), mmap_mode=mode)
+            description_blob = np.load(os.path.join(directory, "description_blob.npy"), mmap_mode=mode)
+        return cls(symbols, codes, meta['categories'], description_offsets, description_blob)
+
+    def _record(self, position):
+        record = {'symbol': self.symbols[position].decode('utf-8')}
+        if self.description_offsets is not None:
+            start, end = self.description_offsets[position], self.description_offsets[position + 1]
+            record['description'] = self.description_blob[start:end].tobytes().decode('utf-8')
+        for column, column_codes in self.codes.items():
+            record[column] = self.categories[column][column_codes[position]]
+        return record
+
+    def _matches_filters(self, positions, exchange=None, security_type=None):
+        """Mask of positions whose exchange/securityType match the given filters"""
+        mask = np.ones(len(positions), dtype=bool)
+        for column, value in (('exchange', exchange), ('securityType', security_type)):
+            if value is None:
+                continue
+            code = self._category_lookup.get(column, {}).get(value)
+            if code is None:
+                return np.zeros(len(positions), dtype=bool)
+            mask &= self.codes[column][positions] == code
+        return mask
+
+    def get(self, symbol):
+        """Exact lookup, returns the symbol's record or None"""
+        key = symbol.encode('utf-8')
+        if len(key) > self.symbols.dtype.itemsize:
+            return None
+        position = np.searchsorted(self.symbols, key)
+        if position < len(self.symbols) and self.symbols[position] == key:
+            return self._record(position)
+        return None
+
+    def prefix_range(self, prefix):
+        """[start, end) positions of all symbols starting with prefix"""
+        key = prefix.encode('utf-8')
+        start = int(np.searchsorted(self.symbols, key, side='left'))
+        # Smallest byte string greater than every string with this prefix
+        while key and key[-1] == 0xFF:
+            key = key[:-1]
+        if not key:
+            return start, len(self.symbols)
+        upper = key[:-1] + bytes([key[-1] + 1])
+        end = int(np.searchsorted(self.symbols, upper, side='left'))
+        return start, end
+
+    def prefix(self, prefix, limit=100, exchange=None, security_type=None):
+        """Symbols starting with prefix, in sorted order, optionally filtered"""
+        start, end = self.prefix_range(prefix)
+        if exchange is None and security_type is None:
+            return [self._record(position) for position in range(start, min(end, start + limit))]
+
+        results = []
+        # Filter in blocks so a selective filter over a large range stays vectorized
+        block = max(limit * 4, 1024)
+        for block_start in range(start, end, block):
+            positions = np.arange(block_start, min(end, block_start + block))
+            for position in positions[self._matches_filters(positions, exchange, security_type)]:
+                results.append(self._record(position))
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def fuzzy(self, query, limit=10, cutoff=0.6, exchange=None, security_type=None, max_candidates=5000):
+        """Closest symbols to query, scored with difflib over a prefix-narrowed candidate window"""
+        # Use the longest prefix of the query that still leaves enough candidates
+        start, end = 0, len(self.symbols)
+        for length in range(len(query), 0, -1):
+            start, end = self.prefix_range(query[:length])
+            if end - start >= limit:
+                break
+        if end - start > max_candidates:
+            center = int(np.searchsorted(self.symbols, query.encode('utf-8')))
+            start = max(start, center - max_candidates // 2)
+            end = min(end, start + max_candidates)
+
+        positions = np.arange(start, end)
+        positions = positions[self._matches_filters(positions, exchange, security_type)]
+        candidates = {self.symbols[position].decode('utf-8'): position for position in positions}
+        matches = difflib.get_close_matches(query, list(candidates), n=limit, cutoff=cutoff)
+        return [self._record(candidates[match]) for match in matches]
+
+
+def main():
+    """Main function"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or query the symbol lookup index')
+    parser.add_argument('--output-dir', help='Directory holding the downloaded symbols', default='dtn_symbols')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help='Build the index from the downloaded universe')
+    for name in ('get', 'prefix', 'fuzzy'):
+        command = subparsers.add_parser(name, help=f'{name} lookup')
+        command.add_argument('query')
+        command.add_argument('--exchange', default=None)
+        command.add_argument('--sec-type', default=None)
+        command.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    index_dir = os.path.join(args.output_dir, INDEX_DIR)
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = SymbolIndex.from_csv(args.output_dir)
+        index.save(index_dir)
+        print(f"Indexed {len(index):,} symbols into {index_dir} in {time.perf_counter() - start:.1f} seconds")
+        return
+
+    index = SymbolIndex.load(index_dir)
+    start = time.perf_counter()
+    if args.command == 'get':
+        results = [r for r in [index.get(args.query)] if r]
+    elif args.command == 'prefix':
+        results = index.prefix(args.query, args.limit, args.exchange, args.sec_type)
+    else:
+        results = index.fuzzy(args.query, args.limit, exchange=args.exchange, security_type=args.sec_type)
+    elapsed = time.perf_counter() - start
+
+    if results:
+        print(pd.DataFrame(results).to_string(index=False))
+    else:
+        print("No matches")
+    print(f"\n{len(results)} result(s) in {elapsed * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
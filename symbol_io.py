@@ -0,0 +1,170 @@
+"""
+Reading and writing the downloaded symbol universe
+Besides all_symbols_latest.csv the universe can be written as a Parquet dataset partitioned by
+exchange/securityType, which lets consumers read only the columns and partitions they need. The
+dataset records the CSV it was written with, and readers only use it while the CSV is still that
+file: the refresh daemon, runs without --parquet and snapshot checkouts rewrite the CSV alone.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import logging
+
+import pandas as pd
+
+import symbol_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as ds
+except ImportError:  # optional dependency, CSV is used when it is missing
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+CSV_FILE = "all_symbols_latest.csv"
+PARQUET_DIR = "all_symbols_parquet"
+SOURCE_FILE = "_source.json"  # Leading underscore: skipped by pyarrow dataset discovery
+PARTITION_COLUMNS = ["exchange", "securityType"]
+
+
+def parquet_available():
+    return pa is not None
+
+
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _csv_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {'csv_size': stat.st_size, 'csv_mtime_ns': stat.st_mtime_ns, 'csv_sha1': _file_sha1(csv_path)}
+
+
+def parquet_is_current(output_dir="dtn_symbols"):
+    """Whether the Parquet dataset holds the same snapshot as all_symbols_latest.csv
+
+    True when the dataset exists and either there is no CSV or the CSV is the one recorded when
+    the dataset was written (same size and modification time, or else same content, as after a
+    git checkout). A dataset without a readable record, such as git-lfs pointer files, is stale.
+    """
+    dataset_dir = os.path.join(output_dir, PARQUET_DIR)
+    if not os.path.isdir(dataset_dir):
+        return False
+    csv_path = os.path.join(output_dir, CSV_FILE)
+    if not os.path.exists(csv_path):
+        return True
+    try:
+        with open(os.path.join(dataset_dir, SOURCE_FILE), 'r') as f:
+            source = json.load(f)
+    except (OSError, ValueError):
+        return False
+    stat = os.stat(csv_path)
+    if stat.st_size != source.get('csv_size'):
+        return False
+    return stat.st_mtime_ns == source.get('csv_mtime_ns') or _file_sha1(csv_path) == source.get('csv_sha1')
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]), flavor="hive")
+
+
+def write_parquet_dataset(source, output_dir, compression="zstd"):
+    """Write the universe as a Parquet dataset partitioned by exchange/securityType
+
+    source is either a DataFrame or the path of a combined CSV, which is then streamed through
+    in record batches instead of being loaded whole. The dataset is built next to the live one
+    and swapped in at the end, so readers never see a half-written dataset.
+    """
+    if pa is None:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+
+    dataset_dir = os.path.join(output_dir, PARQUET_DIR)
+    tmp_dir = dataset_dir + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+
+    if isinstance(source, pd.DataFrame):
+        data = pa.Table.from_pandas(source, preserve_index=False)
+    else:
+        column_types = {column: pa.string() for column in pd.read_csv(source, nrows=0).columns}
+        data = pa_csv.open_csv(source, convert_options=pa_csv.ConvertOptions(
+            column_types=column_types, strings_can_be_null=False))
+
+    # The dataset stays in step with the CSV it is written alongside; a CSV source is that CSV
+    csv_path = source if not isinstance(source, pd.DataFrame) else os.path.join(output_dir, CSV_FILE)
+    stamp = _csv_stamp(csv_path) if os.path.exists(csv_path) else None
+
+    ds.write_dataset(
+        data, tmp_dir, format="parquet",
+        partitioning=_partitioning(),
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        # use_dictionary defaults to True, so low-cardinality columns such as listedMarket
+        # are dictionary-encoded on disk
+        file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+    )
+    if stamp is not None:
+        with open(os.path.join(tmp_dir, SOURCE_FILE), 'w') as f:
+            json.dump(stamp, f)
+
+    old_dir = dataset_dir + ".old"
+    if os.path.exists(dataset_dir):
+        os.rename(dataset_dir, old_dir)
+    os.rename(tmp_dir, dataset_dir)
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir)
+
+    size = sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(dataset_dir) for name in files)
+    logger.info(f"Saved Parquet dataset to {dataset_dir} ({size / (1024 * 1024):.2f} MB)")
+    return dataset_dir
+
+
+def load_symbols(output_dir="dtn_symbols", columns=None, exchanges=None, security_types=None, prefer_parquet=True):
+    """Load the symbol universe, preferring the Parquet dataset over the CSV
+
+    Only the requested columns are read, and with the Parquet dataset only the partitions for the
+    requested exchanges/security types are opened. Columns come back with the symbol_schema dtypes
+    from either source. The dataset is only used while it matches the CSV (see parquet_is_current).
+    """
+    dataset_dir = os.path.join(output_dir, PARQUET_DIR)
+    if prefer_parquet and pa is not None and os.path.isdir(dataset_dir):
+        if parquet_is_current(output_dir):
+            dataset = ds.dataset(dataset_dir, format="parquet", partitioning=_partitioning())
+            filters = None
+            if exchanges is not None:
+                filters = ds.field("exchange").isin(list(exchanges))
+            if security_types is not None:
+                type_filter = ds.field("securityType").isin(list(security_types))
+                filters = type_filter if filters is None else filters & type_filter
+            table = dataset.to_table(columns=columns, filter=filters)
+            return symbol_schema.apply_schema(table.to_pandas(types_mapper=symbol_schema.arrow_types_mapper()))
+        logger.info(f"{dataset_dir} was not written with the current {CSV_FILE}, reading the CSV")
+
+    csv_path = os.path.join(output_dir, CSV_FILE)
+    usecols = columns
+    if columns is not None:
+        # Filter columns have to be read even if they are not returned
+        usecols = list(dict.fromkeys(list(columns) + [c for c, values in
+                                                        (("exchange", exchanges), ("securityType", security_types))
+                                                        if values is not None]))
+    df = symbol_schema.read_csv(csv_path, usecols=usecols)
+    if exchanges is not None:
+        df = df[df["exchange"].isin(list(exchanges))]
+    if security_types is not None:
+        df = df[df["securityType"].isin(list(security_types))]
+    if columns is not None:
+        df = df[list(columns)]
+    if exchanges is not None or security_types is not None:
+        for column in symbol_schema.CATEGORY_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].cat.remove_unused_categories()
+    return df.reset_index(drop=True)
@@ -0,0 +1,184 @@
+"""
+Cached reader for the symbols:{exchange}:{secType} keys written by process_symbols.py
+Decoded groups are kept in an in-process LRU cache with a TTL, tagged with the snapshot version
+(symbols:version) they were read under. process_symbols.py sets that version and publishes it on
+symbols:reloaded in the same MULTI/EXEC that swaps a new snapshot in, so a subscribed reader drops
+its cache as soon as a reload commits; without the subscription (or until it is connected) the
+reader polls the version key at most every max_staleness seconds instead.
+
+A group can be read as the stored records, as a DataFrame with the symbol_schema dtypes, or as a
+dict of numpy column arrays; each form is decoded once per snapshot and then served from memory.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import symbol_schema
+from page_codec import loads, page_rows
+from process_symbols import GROUPS_KEY, VERSION_CHANNEL, VERSION_KEY
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENTRIES = 256
+CACHE_TTL = 300.0  # Seconds an entry is served without a reload
+MAX_STALENESS = 1.0  # Seconds between version polls when no invalidation message can arrive
+FORMS = ("records", "frame", "columns")
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def decode_records(blob):
+    return loads(blob)
+
+
+def decode_frame(blob):
+    columns, rows = page_rows(loads(blob))
+    return symbol_schema.apply_schema(pd.DataFrame.from_records(rows, columns=columns))
+
+
+def decode_columns(blob):
+    """{column: numpy array}; strings become fixed-width unicode arrays for vectorized comparisons"""
+    columns, rows = page_rows(loads(blob))
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return {column: np.array(column_values) for column, column_values in zip(columns, values)}
+
+
+DECODERS = {"records": decode_records, "frame": decode_frame, "columns": decode_columns}
+
+
+class SymbolReader:
+    """Reads symbol groups from Redis through a snapshot-versioned LRU/TTL cache
+
+    Cached values are shared between callers; treat them as read-only.
+    """
+
+    def __init__(self, redis_client, max_entries=CACHE_ENTRIES, ttl=CACHE_TTL, max_staleness=MAX_STALENESS,
+                 subscribe=True):
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "version_polls": 0}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+        self._missed_messages = False
+        self._pubsub = None
+        self._listener = None
+        if subscribe:
+            self._subscribe()
+
+    def _subscribe(self):
+        """Listen for reload messages in a background thread"""
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{VERSION_CHANNEL: self._on_reload})
+        self._listener = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True,
+                                                    exception_handler=self._on_listener_error)
+
+    def _on_reload(self, message):
+        self._set_version(_text(message['data']))
+
+    def _on_listener_error(self, error, pubsub, thread):
+        # Messages may have been missed while disconnected, so fall back to polling until the
+        # listener reconnects (run_in_thread keeps retrying)
+        logger.warning(f"Reload subscription failed ({error}), polling {VERSION_KEY}")
+        with self._lock:
+            self._missed_messages = True
+        pubsub.connection.disconnect()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener.join(timeout=2)
+            self._listener = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _set_version(self, version):
+        """Adopt the snapshot version, dropping the cache if it changed"""
+        with self._lock:
+            if version is not None and self._version is not None and int(version) < int(self._version):
+                # A late message from before a version this reader has already read
+                return
+            if version != self._version:
+                if self._version is not None or self._cache:
+                    self.stats["invalidations"] += 1
+                self._cache.clear()
+                self._version = version
+            self._version_checked = time.monotonic()
+
+    def _subscribed(self):
+        return self._listener is not None and self._listener.is_alive() and self._pubsub.subscribed
+
+    def version(self):
+        """Snapshot version the cache is serving, polling Redis when it may be out of date"""
+        with self._lock:
+            fresh = self._version is not None and not self._missed_messages and (
+                self._subscribed() or time.monotonic() - self._version_checked < self.max_staleness)
+            if fresh:
+                return self._version
+            self._missed_messages = False
+            self.stats["version_polls"] += 1
+        self._set_version(_text(self.redis.get(VERSION_KEY)))
+        return self._version
+
+    def get(self, exchange, sec_type, form="records"):
+        """Decoded symbols:{exchange}:{sec_type} group in the given form, or None if there is no such group"""
+        if form not in DECODERS:
+            raise ValueError(f"Unknown form {form!r}, expected one of {', '.join(FORMS)}")
+        key = f"symbols:{exchange}:{sec_type}"
+        version = self.version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get((key, form))
+            if entry is not None and entry[0] == version and now - entry[1] < self.ttl:
+                self._cache.move_to_end((key, form))
+                self.stats["hits"] += 1
+                return entry[2]
+            self.stats["misses"] += 1
+
+        # The blob and the version it belongs to are read in one transaction, so a reload between
+        # the two reads can never file new data under the old version or the other way round
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.get(VERSION_KEY)
+        pipe.get(key)
+        read_version, blob = pipe.execute()
+        read_version = _text(read_version)
+        value = DECODERS[form](blob) if blob is not None else None
+        if read_version != version:
+            self._set_version(read_version)
+
+        with self._lock:
+            if read_version == self._version:
+                self._cache[(key, form)] = (read_version, now, value)
+                self._cache.move_to_end((key, form))
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return value
+
+    def groups(self):
+        """(exchange, secType) pairs of the loaded groups (not cached, one SMEMBERS)"""
+        pairs = []
+        for key in self.redis.smembers(GROUPS_KEY):
+            _, exchange, sec_type = _text(key).split(":", 2)
+            pairs.append((exchange, sec_type))
+        return sorted(pairs)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,82 @@
+"""
+Declared dtypes for the symbol table
+Shared by the writers and every reader of all_symbols_latest.csv, the split files and the
+Parquet dataset, so nothing has to infer dtypes. exchange, listedMarket and securityType have a
+few dozen distinct values over millions of rows and are categoricals, symbol and description are
+pyarrow-backed strings, and integer columns are downcast to the smallest type that holds them.
+Undeclared string columns become categoricals when they are low-cardinality.
+"""
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional dependency, strings stay object columns when it is missing
+    pa = None
+
+CATEGORY_COLUMNS = ["exchange", "listedMarket", "securityType"]
+STRING_COLUMNS = ["symbol", "description"]
+
+# Undeclared string columns with at most this many distinct values per row become categoricals
+CATEGORY_MAX_RATIO = 0.05
+
+
+def string_dtype():
+    """pyarrow-backed string dtype, or object without pyarrow"""
+    return pd.StringDtype("pyarrow") if pa is not None else object
+
+
+def csv_dtypes(columns=None):
+    """read_csv dtype mapping for the declared columns (restricted to columns when given)"""
+    dtypes = {column: "category" for column in CATEGORY_COLUMNS}
+    dtypes.update({column: string_dtype() for column in STRING_COLUMNS})
+    if columns is not None:
+        dtypes = {column: dtype for column, dtype in dtypes.items() if column in columns}
+    return dtypes
+
+
+def read_csv(source, usecols=None, chunksize=None, **kwargs):
+    """pd.read_csv with the declared dtypes and '' (not NaN) for empty fields
+
+    Whole-file reads also get apply_schema() for undeclared columns. Chunks only get the declared
+    dtypes, since a chunk's cardinality says little about the file's; note that each chunk's
+    categoricals have their own categories.
+    """
+    kwargs.setdefault("keep_default_na", False)
+    reader = pd.read_csv(source, usecols=usecols, chunksize=chunksize, dtype=csv_dtypes(), **kwargs)
+    if chunksize is not None:
+        return reader
+    return apply_schema(reader)
+
+
+def apply_schema(df):
+    """Cast a symbol DataFrame to the declared dtypes, in place where possible, and return it"""
+    declared = csv_dtypes(df.columns)
+    for column, dtype in declared.items():
+        if df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+
+    for column in df.columns:
+        if column in declared:
+            continue
+        values = df[column]
+        if pd.api.types.is_integer_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype):
+            df[column] = pd.to_numeric(values, downcast="integer")
+        elif (pd.api.types.is_object_dtype(values.dtype) or pd.api.types.is_string_dtype(values.dtype)) \
+                and len(values) and values.nunique(dropna=False) <= CATEGORY_MAX_RATIO * len(values):
+            df[column] = values.astype("category")
+    return df
+
+
+def arrow_types_mapper():
+    """types_mapper for pyarrow Table.to_pandas() that keeps strings pyarrow-backed"""
+    dtype = string_dtype()
+    if pa is None or dtype is object:
+        return None
+    mapping = {pa.string(): dtype, pa.large_string(): dtype}
+    return mapping.get
+
+
+def memory_bytes(df):
+    """Deep memory footprint of a DataFrame in bytes"""
+    return int(df.memory_usage(index=True, deep=True).sum())
@@ -0,0 +1,203 @@
+"""
+Summary statistics of the symbol universe, collected while it is written
+SymbolStats counts symbols per security type and exchange and classifies every symbol once as an
+option, a future or something else. The streaming writer feeds it each page after dedup, the
+in-memory combine feeds it the combined frame in one pass, and the result is saved next to the
+output as symbol_stats.json so reporting never has to rescan the CSV.
+"""
+
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from operator import itemgetter
+
+import pandas as pd
+
+import symbol_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # optional dependency, pandas string methods are used when it is missing
+    pa = None
+
+STATS_FILE = "symbol_stats.json"
+
+# Options carry a C/P strike marker ("@ESH25C5000", "AAPL2515C190"), futures start with @
+OPTION_PATTERN = r"[CP]\d"
+FUTURE_PREFIX = "@"
+
+COUNT_COLUMNS = {'securityType': 'security_types', 'exchange': 'exchanges'}
+SAMPLE_COLUMNS = ['symbol', 'description', 'exchange']
+SAMPLE_SIZE = 10
+
+
+def classify_symbols(symbols):
+    """Return (futures, options, others, futures options) counts for a sequence or array of symbols
+
+    Every symbol lands in exactly one of the first three classes: options first (so futures options
+    count as options), then futures by the @ prefix, and everything else. The fourth count is the
+    options with the @ prefix, so futures + futures options is every @ symbol.
+    """
+    if pa is not None:
+        array = symbols if isinstance(symbols, (pa.Array, pa.ChunkedArray)) else pa.array(symbols, type=pa.string())
+        if not len(array):
+            return 0, 0, 0, 0
+        is_option = pc.fill_null(pc.match_substring_regex(array, OPTION_PATTERN), False)
+        is_at = pc.fill_null(pc.starts_with(array, FUTURE_PREFIX), False)
+        options = pc.sum(is_option).as_py() or 0
+        at_symbols = pc.sum(is_at).as_py() or 0
+        futures_options = pc.sum(pc.and_(is_at, is_option)).as_py() or 0
+    else:
+        values = pd.Series(symbols, dtype=object).fillna('').astype(str)
+        is_option = values.str.contains(OPTION_PATTERN, regex=True)
+        is_at = values.str.startswith(FUTURE_PREFIX)
+        options = int(is_option.sum())
+        at_symbols = int(is_at.sum())
+        futures_options = int((is_at & is_option).sum())
+    futures = at_symbols - futures_options
+    return futures, options, len(symbols) - futures - options, futures_options
+
+
+def _arrow_symbols(series):
+    """The symbol column as a pyarrow array (zero-copy for pyarrow-backed strings) or as is"""
+    if pa is None:
+        return series
+    try:
+        return pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(series.astype(str), type=pa.string())
+
+
+class SymbolStats:
+    """Incrementally maintained counts over the deduplicated symbol universe"""
+
+    def __init__(self):
+        self.total = 0
+        self.columns = []
+        self.counts = {key: Counter() for key in COUNT_COLUMNS.values()}
+        self.present = set()
+        self.futures = 0
+        self.options = 0
+        self.others = 0
+        self.futures_options = 0
+        self.sample = []
+
+    def add_rows(self, columns, rows):
+        """Count one page of row tuples (page_codec.page_rows() output)"""
+        if not rows:
+            return
+        if not self.columns:
+            self.columns = list(columns)
+        positions = {column: i for i, column in enumerate(columns)}
+        self.total += len(rows)
+        for column, key in COUNT_COLUMNS.items():
+            if column in positions:
+                self.present.add(key)
+                self.counts[key].update(map(itemgetter(positions[column]), rows))
+        if 'symbol' in positions:
+            self._add_classes(classify_symbols(list(map(itemgetter(positions['symbol']), rows))))
+        if len(self.sample) < SAMPLE_SIZE:
+            picks = [(column, positions[column]) for column in SAMPLE_COLUMNS if column in positions]
+            for row in rows[:SAMPLE_SIZE - len(self.sample)]:
+                self.sample.append({column: row[i] for column, i in picks})
+
+    def add_frame(self, df):
+        """Count a DataFrame of symbols in one vectorized pass"""
+        if not len(df):
+            return
+        if not self.columns:
+            self.columns = list(df.columns)
+        self.total += len(df)
+        for column, key in COUNT_COLUMNS.items():
+            if column in df.columns:
+                self.present.add(key)
+                counts = df[column].value_counts()
+                self.counts[key].update({value: int(count) for value, count in counts.items() if count})
+        if 'symbol' in df.columns:
+            self._add_classes(classify_symbols(_arrow_symbols(df['symbol'])))
+        if len(self.sample) < SAMPLE_SIZE:
+            sample_columns = [column for column in SAMPLE_COLUMNS if column in df.columns]
+            self.sample.extend(df[sample_columns].head(SAMPLE_SIZE - len(self.sample)).to_dict(orient='records'))
+
+    @classmethod
+    def from_frame(cls, df):
+        stats = cls()
+        stats.add_frame(df)
+        return stats
+
+    @classmethod
+    def from_csv(cls, csv_path, chunksize=500000):
+        """Compute the statistics of an existing CSV a chunk at a time"""
+        stats = cls()
+        for chunk in symbol_schema.read_csv(csv_path, chunksize=chunksize):
+            stats.add_frame(chunk)
+        return stats
+
+    def _add_classes(self, classes):
+        futures, options, others, futures_options = classes
+        self.futures += futures
+        self.options += options
+        self.others += others
+        self.futures_options += futures_options
+        self.present.add('classes')
+
+    def _sorted_counts(self, key):
+        # Descending by count, ties in first-seen order like a stable sort_values
+        return dict(sorted(self.counts[key].items(), key=lambda item: -item[1]))
+
+    def to_dict(self):
+        classified = 'classes' in self.present
+        return {
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'total': self.total,
+            'columns': self.columns,
+            'security_types': self._sorted_counts('security_types') if 'security_types' in self.present else None,
+            'exchanges': self._sorted_counts('exchanges') if 'exchanges' in self.present else None,
+            'futures': self.futures if classified else None,
+            'options': self.options if classified else None,
+            'others': self.others if classified else None,
+            'futures_options': self.futures_options if classified else None,
+            'sample': self.sample,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.total = data['total']
+        stats.columns = list(data['columns'])
+        for key in COUNT_COLUMNS.values():
+            if data.get(key) is not None:
+                stats.present.add(key)
+                stats.counts[key].update(data[key])
+        if data.get('futures') is not None:
+            stats._add_classes((data['futures'], data['options'], data['others'], data.get('futures_options') or 0))
+        stats.sample = list(data['sample'])
+        return stats
+
+    def save(self, output_dir):
+        """Write symbol_stats.json atomically and return its path"""
+        path = os.path.join(output_dir, STATS_FILE)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(self.to_dict(), f, indent=1, default=str)
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, output_dir):
+        """Read symbol_stats.json, or return None when there is none"""
+        path = os.path.join(output_dir, STATS_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    def summary(self):
+        """The statistics printed by main(): counts as Series sorted by size, the sample as a DataFrame"""
+        data = self.to_dict()
+        for key in COUNT_COLUMNS.values():
+            if data[key] is not None:
+                data[key] = pd.Series(data[key], dtype='int64')
+        data['sample'] = pd.DataFrame(self.sample, columns=[c for c in SAMPLE_COLUMNS if c in self.columns])
+        return data